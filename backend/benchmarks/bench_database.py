@@ -0,0 +1,25 @@
+"""
+init_db startup time, on a fresh database file and on one that already has
+the schema and seed rows (the normal restart).
+"""
+import itertools
+
+from dasher.config import settings
+from dasher.database import close_db, init_db
+
+
+async def test_init_db(tmp_path, monkeypatch, bench):
+    counter = itertools.count()
+
+    async def fresh() -> None:
+        monkeypatch.setattr(settings, "database_url", f"sqlite+aiosqlite:///{tmp_path}/fresh-{next(counter)}.db")
+        await init_db()
+        await close_db()
+
+    async def restart() -> None:
+        await init_db()
+        await close_db()
+
+    await bench.run("db.init.fresh", fresh, 30, warmup=1)
+    monkeypatch.setattr(settings, "database_url", f"sqlite+aiosqlite:///{tmp_path}/existing.db")
+    await bench.run("db.init.restart", restart, 50, warmup=1)
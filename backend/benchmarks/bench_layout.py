@@ -0,0 +1,53 @@
+"""
+GET /widgets/instances with 10 to 10,000 widgets: served from the
+materialized document, revalidated with If-None-Match, and rebuilt after
+every write.
+"""
+import json
+import uuid
+
+import pytest
+from httpx import AsyncClient
+
+from dasher.database import db_connect
+from dasher.services import layout_service
+
+
+async def _fill(count: int) -> None:
+    config = json.dumps({"feeds": ["https://example.com/rss.xml"], "limit": 5, "title": "Uutiset"})
+    async with db_connect() as db:
+        await db.execute("DELETE FROM widget_instances")
+        await db.executemany(
+            "INSERT INTO widget_instances (id, widget_type, name, config, grid_x, grid_y, grid_w, grid_h)"
+            " VALUES (?, 'rss', ?, ?, ?, ?, 2, 2)",
+            [(str(uuid.uuid4()), f"Widget {i}", config, (i % 6) * 2, (i // 6) * 2) for i in range(count)],
+        )
+        await db.commit()
+    layout_service.invalidate()
+
+
+@pytest.mark.parametrize("widgets", [10, 100, 1000, 10000])
+async def test_list_instances(client: AsyncClient, bench, widgets: int):
+    await _fill(widgets)
+    first = await client.get("/widgets/instances")
+    assert len(first.json()["widgets"]) == widgets
+    etag = first.headers["etag"]
+    # Keep each case to roughly the same amount of work
+    iterations = max(20, 20000 // widgets)
+
+    async def cached() -> None:
+        assert (await client.get("/widgets/instances")).status_code == 200
+
+    async def revalidate() -> None:
+        r = await client.get("/widgets/instances", headers={"If-None-Match": etag})
+        assert r.status_code == 304
+
+    async def rebuild() -> None:
+        layout_service.invalidate()
+        assert (await client.get("/widgets/instances")).status_code == 200
+
+    params = {"widgets": widgets}
+    await bench.run(f"layout.list.cached[{widgets}]", cached, iterations, concurrency=10, params=params,
+                    body_bytes=len(first.content))
+    await bench.run(f"layout.list.304[{widgets}]", revalidate, 500, concurrency=10, params=params)
+    await bench.run(f"layout.list.rebuild[{widgets}]", rebuild, max(5, iterations // 5), params=params)
@@ -0,0 +1,184 @@
+"""
+Proxy endpoints under concurrent load, against in-process fake upstreams.
+
+Caches keep their configured TTLs, so these measure what clients see: most
+requests are served from memory and concurrent misses share one upstream
+call. Results record the upstream requests made by the fixture so far
+(``extra.upstream_requests``).
+"""
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from dasher import http
+from dasher.cache import ResponseCache
+from dasher.config import settings
+from dasher.services import gmail_service, hass_service, llm_service, sabnzbd_service, unifi_service
+from tests.test_gmail import FakeGmail
+from tests.test_llm import ollama  # noqa: F401  (fake Ollama server fixture)
+from tests.test_sabnzbd import FakeSab
+
+CONCURRENCY = [1, 10, 50]
+
+
+def _mock(monkeypatch, name: str, handler, **kwargs) -> None:
+    monkeypatch.setitem(
+        http._clients, name, httpx.AsyncClient(transport=httpx.MockTransport(handler), **kwargs),
+    )
+
+
+async def _ok(client: AsyncClient, url: str, **kwargs) -> None:
+    r = await client.get(url, **kwargs)
+    assert r.status_code == 200, r.text
+
+
+# ── Fake upstreams ─────────────────────────────────────────────────────────────
+
+@pytest.fixture
+def sab(monkeypatch):
+    fake = FakeSab()
+    fake.queue = [
+        {"nzo_id": f"n{i}", "filename": f"file {i}", "status": "Downloading" if i < 2 else "Queued",
+         "percentage": "0"}
+        for i in range(50)
+    ]
+    monkeypatch.setattr(settings, "sabnzbd_url", "http://sab.test")
+    monkeypatch.setattr(settings, "sabnzbd_api_key", "key")
+    monkeypatch.setattr(sabnzbd_service, "tracker", sabnzbd_service.QueueTracker())
+    monkeypatch.setattr(
+        sabnzbd_service, "_poll_cache",
+        ResponseCache("sabnzbd.bench", ttl=settings.sabnzbd_cache_ttl, stale_ttl=settings.sabnzbd_cache_ttl),
+    )
+    _mock(monkeypatch, "sabnzbd", fake.handler)
+    return fake
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    clients = [
+        {"mac": f"aa:bb:cc:{i:06x}", "hostname": f"host-{i}", "ip": f"10.0.{i // 250}.{i % 250}",
+         "is_wired": i % 3 == 0}
+        for i in range(500)
+    ]
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path == "/api/auth/login":
+            return httpx.Response(200, headers={"Set-Cookie": "TOKEN=t; Path=/"})
+        return httpx.Response(200, json={"data": clients})
+
+    monkeypatch.setattr(settings, "unifi_url", "https://unifi.test")
+    monkeypatch.setattr(settings, "unifi_user", "u")
+    monkeypatch.setattr(settings, "unifi_pass", "p")
+    monkeypatch.setattr(unifi_service, "_cookies", {})
+    monkeypatch.setattr(unifi_service, "_site_reads", {})
+    monkeypatch.setattr(
+        unifi_service, "_tables",
+        ResponseCache("unifi.bench", ttl=settings.unifi_cache_ttl, stale_ttl=settings.unifi_cache_ttl),
+    )
+    _mock(monkeypatch, "unifi", handler, base_url="https://unifi.test")
+    return calls
+
+
+@pytest.fixture
+def hass(monkeypatch):
+    """HA REST API only: the websocket state cache stays unsynced, so every read is proxied."""
+    states = {
+        f"sensor.s{i}": {"entity_id": f"sensor.s{i}", "state": str(i), "attributes": {"unit_of_measurement": "W"}}
+        for i in range(200)
+    }
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path == "/api/states":
+            return httpx.Response(200, json=list(states.values()))
+        return httpx.Response(200, json=states[request.url.path.rsplit("/", 1)[-1]])
+
+    monkeypatch.setattr(settings, "hass_url", "http://hass.test")
+    monkeypatch.setattr(settings, "hass_token", "token")
+    monkeypatch.setattr(hass_service, "state_cache", hass_service.HassStateCache())
+    _mock(monkeypatch, "hass", handler)
+    return calls
+
+
+@pytest.fixture
+def gmail(monkeypatch):
+    fake = FakeGmail()
+    for n in range(4, 60):
+        fake.add(f"m{n}", unread=n % 2 == 0, record=False)
+    monkeypatch.setattr(settings, "google_client_id", "id")
+    monkeypatch.setattr(settings, "google_refresh_token", "refresh")
+    monkeypatch.setattr(gmail_service, "_access_token", None)
+    monkeypatch.setattr(gmail_service, "_sync", gmail_service.InboxSync())
+    monkeypatch.setattr(
+        gmail_service, "_sync_cache",
+        ResponseCache("gmail.sync.bench", ttl=settings.gmail_cache_ttl, stale_ttl=settings.gmail_cache_ttl),
+    )
+    _mock(monkeypatch, "google", fake.handler)
+    return fake
+
+
+# ── Benchmarks ─────────────────────────────────────────────────────────────────
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY)
+async def test_sabnzbd_queue(client: AsyncClient, bench, sab, concurrency: int):
+    result = await bench.run(
+        f"proxy.sabnzbd.queue[c={concurrency}]", lambda: _ok(client, "/sabnzbd/queue?limit=20"),
+        1000, concurrency, params={"concurrency": concurrency},
+    )
+    result.extra["upstream_requests"] = len(sab.requests)
+
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY)
+async def test_unifi_devices(client: AsyncClient, bench, controller, concurrency: int):
+    result = await bench.run(
+        f"proxy.unifi.devices[c={concurrency}]", lambda: _ok(client, "/unifi/devices?limit=100"),
+        1000, concurrency, params={"concurrency": concurrency, "clients": 500},
+    )
+    result.extra["upstream_requests"] = len(controller)
+    await bench.run(
+        f"proxy.unifi.search[c={concurrency}]", lambda: _ok(client, "/unifi/devices?q=host-4&wired=false"),
+        1000, concurrency, params={"concurrency": concurrency, "clients": 500},
+    )
+
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY)
+async def test_hass_state(client: AsyncClient, bench, hass, concurrency: int):
+    await bench.run(
+        f"proxy.hass.state[c={concurrency}]", lambda: _ok(client, "/hass/state/sensor.s7"),
+        500, concurrency, params={"concurrency": concurrency},
+    )
+
+    async def batch() -> None:
+        r = await client.post("/hass/states", json={"entity_ids": [f"sensor.s{i}" for i in range(20)]})
+        assert r.status_code == 200
+
+    result = await bench.run(
+        f"proxy.hass.states[c={concurrency}]", batch, 500, concurrency,
+        params={"concurrency": concurrency, "entities": 20},
+    )
+    result.extra["upstream_requests"] = len(hass)
+
+
+@pytest.mark.parametrize("concurrency", CONCURRENCY)
+async def test_gmail_inbox(client: AsyncClient, bench, gmail, concurrency: int):
+    result = await bench.run(
+        f"proxy.gmail.inbox[c={concurrency}]", lambda: _ok(client, "/gmail/inbox?limit=10"),
+        1000, concurrency, params={"concurrency": concurrency},
+    )
+    result.extra["upstream_requests"] = len(gmail.calls)
+
+
+async def test_llm_generate(client: AsyncClient, bench, ollama):  # noqa: F811
+    counter = iter(range(10**9))
+
+    async def miss() -> None:
+        await llm_service.generate("summarize", f"content {next(counter)}")
+
+    async def hit() -> None:
+        await llm_service.generate("summarize", "content 0")
+
+    await bench.run("llm.generate.miss", miss, 100, concurrency=4, params={"concurrency": 4})
+    await bench.run("llm.generate.cache_hit", hit, 500, concurrency=10, params={"concurrency": 10})
@@ -0,0 +1,107 @@
+"""
+The JSON paths touched by ``dasher.serialization``, old way against new:
+
+* layout — building the GET /widgets/instances body by parsing every stored
+  config and re-encoding the whole document with ``json``, against splicing
+  the stored config text into encoded rows;
+* websocket — encoding one channel snapshot with ``json`` against ``dumps``;
+* proxy — a full GET through the ASGI stack for a UniFi-sized payload, with
+  FastAPI's default response handling and with ``serialization.JSONResponse``.
+
+Results carry the active backend (``params.backend``): orjson or json.
+"""
+import json
+from collections.abc import Callable
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from dasher import serialization
+
+FIELDS = ("id", "widget_type", "name", "grid_x", "grid_y", "grid_w", "grid_h", "background_color")
+
+
+def _rows(n: int) -> list[dict]:
+    return [
+        {
+            "id": f"00000000-0000-0000-0000-{i:012d}",
+            "widget_type": "rss",
+            "name": f"Widget {i}",
+            "config": json.dumps({"feeds": [f"https://example.com/{i}.xml"], "limit": 5, "title": "Uutiset"}),
+            "grid_x": i % 12, "grid_y": i // 12, "grid_w": 2, "grid_h": 2, "background_color": None,
+        }
+        for i in range(n)
+    ]
+
+
+def layout_old(rows: list[dict]) -> bytes:
+    widgets = [{**{f: r[f] for f in FIELDS}, "config": json.loads(r["config"])} for r in rows]
+    return json.dumps({"widgets": widgets}).encode()
+
+
+def layout_new(rows: list[dict]) -> bytes:
+    widgets = [
+        serialization.splice(serialization.dumps({f: r[f] for f in FIELDS}), "config", r["config"].encode())
+        for r in rows
+    ]
+    return b'{"widgets":[' + b",".join(widgets) + b"]}"
+
+
+def _devices(n: int) -> dict:
+    return {
+        "configured": True,
+        "devices": [
+            {"mac": f"aa:bb:cc:dd:{i:04x}", "name": f"host-{i}", "ip": f"10.0.{i // 250}.{i % 250}",
+             "is_wired": i % 3 == 0, "online": True}
+            for i in range(n)
+        ],
+        "total": n,
+    }
+
+
+def _op(fn: Callable[[], object]):
+    """A synchronous encode as a ``bench.run`` operation."""
+    async def op() -> None:
+        fn()
+    return op
+
+
+@pytest.mark.parametrize("widgets", [10, 100, 1000])
+async def test_layout_body(bench, widgets: int):
+    rows = _rows(widgets)
+    assert json.loads(layout_old(rows)) == json.loads(layout_new(rows))
+    iterations = max(20, 20000 // widgets)
+    params = {"widgets": widgets, "backend": serialization.BACKEND}
+    await bench.run(f"serialization.layout.json[{widgets}]", _op(lambda: layout_old(rows)), iterations, params=params)
+    await bench.run(f"serialization.layout.splice[{widgets}]", _op(lambda: layout_new(rows)), iterations, params=params)
+
+
+async def test_ws_snapshot(bench):
+    snapshot = {"channel": "unifi:clients", "seq": 42, "data": _devices(100)}
+    params = {"clients": 100, "backend": serialization.BACKEND}
+    await bench.run("serialization.ws_snapshot.json", _op(lambda: json.dumps(snapshot)), 2000, params=params)
+    await bench.run(
+        "serialization.ws_snapshot.dumps", _op(lambda: serialization.dumps(snapshot).decode()), 2000, params=params,
+    )
+
+
+@pytest.mark.parametrize("response", ["default", "serialization"])
+async def test_proxy_response(bench, response: str):
+    payload = _devices(500)
+    app = FastAPI(**({"default_response_class": serialization.JSONResponse} if response == "serialization" else {}))
+
+    @app.get("/unifi/devices")
+    async def devices() -> dict:
+        return payload
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        async def get() -> None:
+            assert (await client.get("/unifi/devices")).status_code == 200
+
+        chosen = serialization.default_response_class()
+        await bench.run(
+            f"serialization.proxy.{response}", get, 500, warmup=50,
+            params={"devices": 500, "backend": serialization.BACKEND},
+            app_default=getattr(chosen, "__name__", "FastAPI default"),
+        )
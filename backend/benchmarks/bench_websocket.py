@@ -0,0 +1,84 @@
+"""
+ConnectionManager fan-out to 1 to 1,000 simulated sockets: time from
+``broadcast``/``publish`` until every socket's writer task has sent the frame.
+"""
+import asyncio
+
+import pytest
+
+from dasher.config import settings
+from dasher.ws_manager import ConnectionManager
+
+CHANNEL = "bench:clients"
+
+
+class CountingSocket:
+    """Stands in for a websocket; counts sends against the current round."""
+
+    def __init__(self, round_: "Round") -> None:
+        self.round = round_
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        self.round.received()
+
+    async def send_bytes(self, data: bytes) -> None:
+        self.round.received()
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+class Round:
+    def __init__(self) -> None:
+        self.expected = 0
+        self.done = asyncio.Event()
+
+    def start(self, expected: int) -> None:
+        self.expected = expected
+        self.done.clear()
+
+    def received(self) -> None:
+        self.expected -= 1
+        if self.expected == 0:
+            self.done.set()
+
+
+def _payload(seq: int) -> dict:
+    return {"devices": [{"mac": f"aa:{i:04x}", "name": f"host-{i}", "rx": seq * i} for i in range(50)]}
+
+
+@pytest.mark.parametrize("sockets", [1, 10, 100, 1000])
+async def test_fanout(bench, sockets: int, monkeypatch):
+    monkeypatch.setattr(settings, "ws_send_queue_size", 64)
+    manager = ConnectionManager()
+    round_ = Round()
+    for _ in range(sockets):
+        ws = CountingSocket(round_)
+        await manager.connect(ws)
+        manager.subscribe(ws, [CHANNEL])
+    seq = 0
+
+    async def broadcast() -> None:
+        round_.start(sockets)
+        await manager.broadcast(CHANNEL, {"channel": CHANNEL, "data": _payload(0)})
+        await round_.done.wait()
+
+    async def publish() -> None:
+        # A changed payload each round: snapshot or delta, as clients would see it
+        nonlocal seq
+        seq += 1
+        round_.start(sockets)
+        await manager.publish(CHANNEL, _payload(seq))
+        await round_.done.wait()
+
+    iterations = max(20, 5000 // sockets)
+    params = {"sockets": sockets}
+    try:
+        await bench.run(f"ws.broadcast[{sockets}]", broadcast, iterations, params=params)
+        await bench.run(f"ws.publish[{sockets}]", publish, iterations, params=params)
+    finally:
+        for ws in list(manager._connections):
+            manager.disconnect(ws)
@@ -0,0 +1,205 @@
+"""
+Benchmark harness for the Dasher backend.
+
+Benchmarks are pytest tests that drive the real app through the same
+ASGITransport ``client`` fixture as the test suite, against in-process fake
+upstreams, and report throughput and latency percentiles through the
+``bench`` fixture. They are not collected by the normal test run.
+
+    cd backend
+    PYTHONPATH=src python -m pytest benchmarks -q
+    PYTHONPATH=src python -m pytest benchmarks --bench-json=results.json
+    PYTHONPATH=src python -m pytest benchmarks --bench-baseline=benchmarks/baseline.json
+
+``--bench-json`` writes every result as JSON (a file in that format is also a
+valid baseline). ``--bench-baseline`` compares each result with the entry of
+the same name and fails the session when p50 latency grew, or throughput fell,
+by more than ``--bench-tolerance`` (default 0.5, i.e. 50%; timings on shared
+machines are noisy). ``--bench-scale`` multiplies iteration counts.
+"""
+import asyncio
+import json
+import math
+import os
+import platform
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import asdict, dataclass, field
+
+import pytest
+
+from dasher import serialization
+from tests.conftest import client  # noqa: F401  (shared app client fixture)
+
+_results: dict[str, "BenchResult"] = {}
+# (result, baseline entry, verdict), filled when --bench-baseline is given
+_compared: list[tuple["BenchResult", dict | None, str]] = []
+_regressions: list[str] = []
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("dasher benchmarks")
+    group.addoption("--bench-json", default=None, help="write results as JSON to this path")
+    group.addoption("--bench-baseline", default=None, help="compare results with this JSON file")
+    group.addoption("--bench-tolerance", type=float, default=0.5, help="allowed relative slowdown")
+    group.addoption("--bench-scale", type=float, default=1.0, help="multiply iteration counts")
+
+
+@dataclass
+class BenchResult:
+    name: str
+    params: dict
+    iterations: int
+    concurrency: int
+    wall_seconds: float
+    throughput: float  # operations per second of wall time
+    p50_ms: float
+    p99_ms: float
+    mean_ms: float
+    max_ms: float
+    extra: dict = field(default_factory=dict)
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(
+    name: str,
+    latencies: list[float],
+    wall_seconds: float,
+    concurrency: int = 1,
+    params: dict | None = None,
+    **extra,
+) -> BenchResult:
+    ordered = sorted(latencies)
+    return BenchResult(
+        name=name,
+        params=params or {},
+        iterations=len(ordered),
+        concurrency=concurrency,
+        wall_seconds=wall_seconds,
+        throughput=len(ordered) / wall_seconds if wall_seconds else 0.0,
+        p50_ms=_percentile(ordered, 50) * 1000,
+        p99_ms=_percentile(ordered, 99) * 1000,
+        mean_ms=sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+        max_ms=ordered[-1] * 1000 if ordered else 0.0,
+        extra=extra,
+    )
+
+
+class Bench:
+    """Runs and records measurements; one instance per benchmark test."""
+
+    def __init__(self, scale: float) -> None:
+        self.scale = scale
+
+    def iterations(self, n: int) -> int:
+        return max(1, round(n * self.scale))
+
+    async def run(
+        self,
+        name: str,
+        op: Callable[[], Awaitable[object]],
+        iterations: int,
+        concurrency: int = 1,
+        warmup: int = 5,
+        params: dict | None = None,
+        **extra,
+    ) -> BenchResult:
+        """Call *op* ``iterations`` times from ``concurrency`` workers, timing each call."""
+        for _ in range(warmup):
+            await op()
+        total = self.iterations(iterations)
+        latencies: list[float] = []
+        remaining = total
+
+        async def worker() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                await op()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+        return self.record(summarize(name, latencies, wall, concurrency, params, **extra))
+
+    def record(self, result: BenchResult) -> BenchResult:
+        _results[result.name] = result
+        return result
+
+
+@pytest.fixture
+def bench(request: pytest.FixtureRequest) -> Bench:
+    return Bench(request.config.getoption("--bench-scale"))
+
+
+# ── Reporting ──────────────────────────────────────────────────────────────────
+
+def _compare(baseline: dict, tolerance: float) -> list[tuple[BenchResult, dict | None, str]]:
+    rows = []
+    for name, result in _results.items():
+        base = baseline.get(name)
+        verdict = "new"
+        if base is not None:
+            slower = base["p50_ms"] and result.p50_ms > base["p50_ms"] * (1 + tolerance)
+            fewer = base["throughput"] and result.throughput < base["throughput"] / (1 + tolerance)
+            verdict = "REGRESSION" if slower or fewer else "ok"
+            if verdict == "REGRESSION":
+                _regressions.append(name)
+        rows.append((result, base, verdict))
+    return rows
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int) -> None:
+    config = session.config
+    if not _results:
+        return
+    path = config.getoption("--bench-json")
+    if path:
+        document = {
+            "meta": {
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "serialization": serialization.BACKEND,
+                "scale": config.getoption("--bench-scale"),
+            },
+            "results": {name: asdict(result) for name, result in sorted(_results.items())},
+        }
+        with open(path, "w") as f:
+            json.dump(document, f, indent=2)
+            f.write("\n")
+    baseline_path = config.getoption("--bench-baseline")
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)["results"]
+        _compared[:] = _compare(baseline, config.getoption("--bench-tolerance"))
+        if _regressions:
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus: int, config: pytest.Config) -> None:
+    if not _results:
+        return
+    tr = terminalreporter
+    tr.section("benchmarks")
+    rows = _compared or [(r, None, "") for r in _results.values()]
+    tr.write_line(f"{'name':<48} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9}  {'baseline p50':>12}  verdict")
+    for result, base, verdict in sorted(rows, key=lambda row: row[0].name):
+        base_p50 = f"{base['p50_ms']:.3f}" if base else ""
+        tr.write_line(
+            f"{result.name:<48} {result.throughput:>10.1f} {result.p50_ms:>9.3f} {result.p99_ms:>9.3f}"
+            f"  {base_p50:>12}  {verdict}"
+        )
+    if _regressions:
+        tr.write_line(f"{len(_regressions)} benchmark(s) regressed beyond tolerance", red=True)
@@ -0,0 +1,370 @@
+"""Cross-worker delivery of websocket channel messages and shared session state.
+
+Each uvicorn worker has its own ``ConnectionManager`` and its own sockets. A
+backplane carries what has to reach every worker:
+
+* channel messages — the encoded frame plus, for ``publish``, the channel's
+  seq and payload, so every worker can serve snapshots and resyncs;
+* channel seqs — allocated by the backplane, not by each worker, so two
+  workers never publish the same seq with different payloads;
+* channel interest — which channels have subscribers on any worker, so a
+  poller in one worker fetches for clients connected to another;
+* signals — named notifications such as "the layout changed", for caches
+  each worker keeps in memory;
+* shared state — small values such as upstream session cookies and OAuth
+  tokens, so N workers don't log in N times.
+
+The manager always fans a message out to its own sockets itself; the
+backplane only carries it to the *other* workers. ``LocalBackplane``
+(``WS_BACKPLANE=local``, the default) is for a single worker, where there
+are none: every method is a no-op. ``SQLiteBackplane`` (``WS_BACKPLANE=sqlite``)
+uses a separate SQLite file in WAL mode as the broker, so it needs no extra
+service: messages are appended to a table and every worker polls
+``PRAGMA data_version``, which only changes when another connection commits,
+and reads new rows only then.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+import aiosqlite
+
+from dasher import serialization
+from dasher.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Workers not seen for this long are dead; their channel interest is dropped
+_WORKER_TIMEOUT_SECONDS = 10.0
+_HEARTBEAT_SECONDS = 2.0
+# Messages are only needed until every live worker has polled them
+_MESSAGE_RETENTION_SECONDS = 30.0
+
+
+@dataclass(frozen=True, slots=True)
+class Message:
+    """One channel message; ``channel`` None means every socket."""
+    channel: str | None
+    frame: bytes
+    seq: int | None = None
+    data: bytes | None = None  # encoded payload of a ``publish``, for snapshots
+
+
+class Backplane:
+    """In-process backplane: a single worker, nothing to carry anywhere."""
+
+    # Whether other workers may be listening; when False callers can skip
+    # preparing what only they would need
+    shared = False
+
+    def __init__(self) -> None:
+        self._deliver: Callable[[Message], None] | None = None
+        self._signal_handlers: dict[str, list[Callable[[], Any]]] = {}
+
+    def bind(self, deliver: Callable[[Message], None]) -> None:
+        """Set the callback that fans other workers' messages out to this worker's sockets."""
+        self._deliver = deliver
+
+    def on_signal(self, name: str, handler: Callable[[], Any]) -> None:
+        """Call *handler* whenever another worker sends signal *name*."""
+        self._signal_handlers.setdefault(name, []).append(handler)
+
+    def _dispatch_signal(self, name: str) -> None:
+        for handler in self._signal_handlers.get(name, ()):
+            try:
+                handler()
+            except Exception as exc:
+                logger.warning("Backplane signal %s handler failed: %s", name, exc)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def publish(self, message: Message) -> None:
+        """Deliver *message* to the sockets of every other worker."""
+
+    async def signal(self, name: str) -> None:
+        """Notify every other worker's handlers for *name*."""
+
+    async def next_seq(self, channel: str, current: int) -> int:
+        """Allocate the next seq of *channel*; *current* is the last one this worker knows."""
+        return current + 1
+
+    def set_channels(self, channels: set[str]) -> None:
+        """Record the channels this worker's sockets are subscribed to."""
+
+    def remote_channels(self) -> set[str]:
+        """Channels with subscribers on other workers."""
+        return set()
+
+    async def get_state(self, key: str) -> Any | None:
+        """Shared value for *key*, or None if unset or expired."""
+        return None
+
+    async def set_state(self, key: str, value: Any, ttl: float | None = None) -> None:
+        pass
+
+    async def delete_state(self, key: str) -> None:
+        pass
+
+
+LocalBackplane = Backplane
+
+
+_SCHEMA = """
+PRAGMA journal_mode = WAL;
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    channel TEXT,
+    seq INT,
+    data BLOB,
+    frame BLOB,
+    signal TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    seen_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS channels (
+    worker TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    PRIMARY KEY (worker, channel)
+);
+CREATE TABLE IF NOT EXISTS seqs (
+    channel TEXT PRIMARY KEY,
+    seq INT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL
+)
+"""
+
+
+class SQLiteBackplane(Backplane):
+    """Backplane through a shared SQLite file (see the module docstring)."""
+
+    shared = True
+
+    def __init__(self, path: str, poll_interval: float = 0.05) -> None:
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._db: aiosqlite.Connection | None = None
+        self._connect_lock = asyncio.Lock()
+        self._poller: asyncio.Task | None = None
+        self._last_id = 0
+        self._data_version: int | None = None
+        self._remote: set[str] = set()
+        self._channels: set[str] = set()
+        self._channels_dirty = False
+        self._heartbeat_at = 0.0
+
+    async def _connection(self) -> aiosqlite.Connection:
+        if self._db is not None:
+            return self._db
+        async with self._connect_lock:
+            if self._db is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                db = await aiosqlite.connect(self.path)
+                await db.execute("PRAGMA busy_timeout = 5000")
+                await db.execute("PRAGMA synchronous = NORMAL")
+                for statement in _SCHEMA.strip().split(";"):
+                    await db.execute(statement)
+                await db.commit()
+                self._db = db
+        return self._db
+
+    # ── Lifecycle ──────────────────────────────────────────────────────────────
+
+    async def start(self) -> None:
+        if self._poller is not None:
+            return
+        db = await self._connection()
+        async with db.execute("SELECT COALESCE(MAX(id), 0) FROM messages") as cursor:
+            self._last_id = (await cursor.fetchone())[0]
+        await self._heartbeat(db)
+        self._poller = asyncio.create_task(self._poll_loop())
+
+    async def stop(self) -> None:
+        if self._poller is not None:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+        if self._db is not None:
+            await self._db.execute("DELETE FROM channels WHERE worker=?", (self.worker_id,))
+            await self._db.execute("DELETE FROM workers WHERE id=?", (self.worker_id,))
+            await self._db.commit()
+            await self._db.close()
+            self._db = None
+
+    # ── Messages ───────────────────────────────────────────────────────────────
+
+    async def publish(self, message: Message) -> None:
+        await self._append(message.channel, message.seq, message.data, message.frame, None)
+
+    async def signal(self, name: str) -> None:
+        await self._append(None, None, None, None, name)
+
+    async def next_seq(self, channel: str, current: int) -> int:
+        db = await self._connection()
+        # Never behind what this worker has seen, e.g. if the file was recreated
+        async with db.execute(
+            "INSERT INTO seqs (channel, seq) VALUES (?, ?)"
+            " ON CONFLICT(channel) DO UPDATE SET seq = MAX(seqs.seq + 1, excluded.seq) RETURNING seq",
+            (channel, current + 1),
+        ) as cursor:
+            seq = (await cursor.fetchone())[0]
+        await db.commit()
+        return seq
+
+    async def _append(self, channel, seq, data, frame, signal) -> None:
+        db = await self._connection()
+        await db.execute(
+            "INSERT INTO messages (origin, channel, seq, data, frame, signal, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.worker_id, channel, seq, data, frame, signal, time.time()),
+        )
+        await db.commit()
+
+    async def _poll_loop(self) -> None:
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Backplane poll failed: %s", exc)
+            await asyncio.sleep(self.poll_interval)
+
+    async def poll(self) -> None:
+        """Deliver other workers' new messages and refresh channel interest."""
+        db = await self._connection()
+        now = time.time()
+        if self._channels_dirty:
+            self._channels_dirty = False
+            await self._write_channels(db)
+        if now - self._heartbeat_at >= _HEARTBEAT_SECONDS:
+            await self._heartbeat(db)
+        async with db.execute("PRAGMA data_version") as cursor:
+            version = (await cursor.fetchone())[0]
+        if version == self._data_version:
+            return
+        self._data_version = version
+        async with db.execute(
+            "SELECT id, channel, seq, data, frame, signal FROM messages WHERE id > ? AND origin != ? ORDER BY id",
+            (self._last_id, self.worker_id),
+        ) as cursor:
+            rows = await cursor.fetchall()
+        for id_, channel, seq, data, frame, signal in rows:
+            self._last_id = id_
+            if signal is not None:
+                self._dispatch_signal(signal)
+            elif self._deliver is not None:
+                self._deliver(Message(channel, bytes(frame), seq, bytes(data) if data is not None else None))
+        await self._read_channels(db, now)
+
+    # ── Channel interest ───────────────────────────────────────────────────────
+
+    def set_channels(self, channels: set[str]) -> None:
+        if channels != self._channels:
+            self._channels = set(channels)
+            self._channels_dirty = True
+
+    def remote_channels(self) -> set[str]:
+        return self._remote
+
+    async def _write_channels(self, db: aiosqlite.Connection) -> None:
+        await db.execute("DELETE FROM channels WHERE worker=?", (self.worker_id,))
+        await db.executemany(
+            "INSERT INTO channels (worker, channel) VALUES (?, ?)",
+            [(self.worker_id, channel) for channel in self._channels],
+        )
+        await db.commit()
+
+    async def _read_channels(self, db: aiosqlite.Connection, now: float) -> None:
+        async with db.execute(
+            "SELECT DISTINCT c.channel FROM channels c JOIN workers w ON w.id = c.worker"
+            " WHERE c.worker != ? AND w.seen_at > ?",
+            (self.worker_id, now - _WORKER_TIMEOUT_SECONDS),
+        ) as cursor:
+            self._remote = {row[0] for row in await cursor.fetchall()}
+
+    async def _heartbeat(self, db: aiosqlite.Connection) -> None:
+        now = time.time()
+        self._heartbeat_at = now
+        await db.execute("INSERT OR REPLACE INTO workers (id, seen_at) VALUES (?, ?)", (self.worker_id, now))
+        # Housekeeping rides along: dead workers and delivered messages
+        await db.execute(
+            "DELETE FROM channels WHERE worker IN (SELECT id FROM workers WHERE seen_at < ?)",
+            (now - _WORKER_TIMEOUT_SECONDS,),
+        )
+        await db.execute("DELETE FROM workers WHERE seen_at < ?", (now - _WORKER_TIMEOUT_SECONDS,))
+        await db.execute("DELETE FROM messages WHERE created_at < ?", (now - _MESSAGE_RETENTION_SECONDS,))
+        await db.execute("DELETE FROM state WHERE expires_at < ?", (now,))
+        await db.commit()
+        # A worker that stops heartbeating drops out of everyone's interest set
+        await self._read_channels(db, now)
+
+    # ── Shared state ───────────────────────────────────────────────────────────
+
+    async def get_state(self, key: str) -> Any | None:
+        db = await self._connection()
+        async with db.execute(
+            "SELECT value FROM state WHERE key=? AND (expires_at IS NULL OR expires_at > ?)", (key, time.time()),
+        ) as cursor:
+            row = await cursor.fetchone()
+        return serialization.loads(row[0]) if row else None
+
+    async def set_state(self, key: str, value: Any, ttl: float | None = None) -> None:
+        db = await self._connection()
+        await db.execute(
+            "INSERT OR REPLACE INTO state (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, serialization.dumps(value), time.time() + ttl if ttl is not None else None),
+        )
+        await db.commit()
+
+    async def delete_state(self, key: str) -> None:
+        db = await self._connection()
+        await db.execute("DELETE FROM state WHERE key=?", (key,))
+        await db.commit()
+
+
+def _default_path() -> str:
+    from dasher.database import db_path
+
+    return os.path.join(os.path.dirname(db_path()), "backplane.db")
+
+
+def create_backplane() -> Backplane:
+    """The backplane selected by ``ws_backplane``."""
+    if settings.ws_backplane == "sqlite":
+        return SQLiteBackplane(settings.ws_backplane_path or _default_path(), settings.ws_backplane_poll_interval)
+    if settings.ws_backplane != "local":
+        raise ValueError(f"unknown WS_BACKPLANE {settings.ws_backplane!r} (expected 'local' or 'sqlite')")
+    return LocalBackplane()
+
+
+_backplane: Backplane | None = None
+
+
+def get_backplane() -> Backplane:
+    """The process-wide backplane, shared by the websocket manager and the services."""
+    global _backplane
+    if _backplane is None:
+        _backplane = create_backplane()
+    return _backplane
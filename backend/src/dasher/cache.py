@@ -0,0 +1,149 @@
+"""Single-flight TTL cache for upstream responses.
+
+Concurrent callers asking for the same key share one in-flight fetch, and the
+result is reused for ``ttl`` seconds. After that it is served stale for up to
+``stale_ttl`` more seconds while one background refresh runs
+(stale-while-revalidate), and for up to ``stale_if_error`` seconds if the
+upstream fails. Entries are bounded by ``max_entries`` with LRU eviction.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from typing import Any
+
+from dasher import metrics
+
+logger = logging.getLogger(__name__)
+
+# name → cache, so stats can be reported in one place
+caches: dict[str, "ResponseCache"] = {}
+
+
+def _cache_samples(field: str):
+    return lambda: [({"cache": name}, cache.stats()[field]) for name, cache in caches.items()]
+
+
+for _field in ("hits", "stale_hits", "misses", "coalesced", "errors"):
+    metrics.Callback(
+        f"dasher_cache_{_field}_total", f"Response cache {_field.replace('_', ' ')}.",
+        _cache_samples(_field), kind="counter",
+    )
+metrics.Callback(
+    "dasher_cache_hit_ratio", "Fresh plus stale hits over all lookups.", _cache_samples("hit_ratio"),
+)
+metrics.Callback("dasher_cache_entries", "Entries held per response cache.", _cache_samples("entries"))
+
+
+@dataclass
+class _Entry:
+    value: Any
+    stored_at: float
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        stale_ttl: float = 0.0,
+        stale_if_error: float = 300.0,
+        max_entries: int = 128,
+    ) -> None:
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stale_if_error = stale_if_error
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self.coalesced = 0
+        self.errors = 0
+        caches[name] = self
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for *key*, calling *fetch* when it is missing or expired."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            age = time.monotonic() - entry.stored_at
+            if age < self.ttl:
+                self.hits += 1
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                self._refresh(key, fetch)
+                return entry.value
+
+        self.misses += 1
+        task = self._refresh(key, fetch)
+        try:
+            # shield: one caller going away must not cancel the shared fetch
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.stored_at < self.ttl + self.stale_if_error:
+                logger.warning("%s: upstream error, serving stale entry for %r", self.name, key)
+                self.stale_hits += 1
+                return entry.value
+            raise
+
+    def _refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+        task = asyncio.create_task(self._fetch(key, fetch))
+        task.add_done_callback(self._log_failure)
+        self._inflight[key] = task
+        return task
+
+    def _log_failure(self, task: asyncio.Task) -> None:
+        # Marks the exception as retrieved for background refreshes nobody awaits.
+        # Debug only: callers that await the fetch log the error themselves, and
+        # it is counted in ``errors`` either way.
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug("%s: refresh failed: %s", self.name, task.exception())
+
+    async def _fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await fetch()
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        self.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = _Entry(value, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable | None = None) -> None:
+        """Drop one entry, or every entry when *key* is None."""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "hit_ratio": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+        }
@@ -9,8 +9,17 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8", extra="ignore")
 
     database_url: str = "sqlite+aiosqlite:///./data/dasher.db"
+    # Read-only connections kept open next to the single writer
+    db_pool_size: int = 4
     secret_key: str = "changeme"
 
+    # Logging: root level, "json" or "text" output, and how many identical
+    # upstream/service records may be written per minute after a burst
+    log_level: str = "INFO"
+    log_format: str = "json"
+    log_rate_limit_per_minute: float = 6.0
+    log_rate_limit_burst: int = 5
+
     # Comma-separated origins for CORS, e.g. "http://localhost,http://localhost:80"
     cors_origins: list[str] = ["http://localhost", "http://localhost:80"]
 
@@ -19,16 +28,68 @@ class Settings(BaseSettings):
 
     sabnzbd_url: str = ""
     sabnzbd_api_key: str = ""
+    # Speed/ETA samples kept for sparklines (one per queue poll)
+    sabnzbd_series_size: int = 120
 
     unifi_url: str = ""
     unifi_user: str = ""
     unifi_pass: str = ""
+    # Site used when /unifi/devices is called without ?site=
+    unifi_site: str = "default"
+
+    # Feeds fetched at once by the RSS ingestion engine
+    rss_fetch_concurrency: int = 8
+
+    # Crawler: pages fetched at once overall, per host, and the minimum gap
+    # between two requests to the same host (seconds)
+    crawler_fetch_concurrency: int = 8
+    crawler_per_host_concurrency: int = 1
+    crawler_host_delay: float = 1.0
 
     ollama_url: str = "http://host.docker.internal:11434"
+    ollama_model: str = "llama3.2"
+    # Generations run at once (a local GPU usually handles one), the overall
+    # time limit per generation in seconds, and how long Ollama keeps the
+    # model loaded after a call
+    ollama_concurrency: int = 1
+    ollama_timeout: float = 300.0
+    ollama_keep_alive: str = "30m"
 
     google_client_id:     str = ""
     google_client_secret: str = ""
     google_refresh_token: str = ""
+    # Newest inbox messages kept in the local sync cache, and the default
+    # page size of /gmail/inbox
+    gmail_inbox_window: int = 20
+    gmail_inbox_limit:  int = 5
+
+    # Upstream response cache freshness windows, in seconds
+    sabnzbd_cache_ttl: float = 2.0
+    unifi_cache_ttl:   float = 10.0
+    gmail_cache_ttl:   float = 30.0
+
+    # Per-websocket outbound queue length, and how many frames a client may
+    # have dropped (without catching up) before it is disconnected
+    ws_send_queue_size: int = 32
+    ws_max_dropped:     int = 64
+    # Channel deltas sent before a full snapshot is forced
+    ws_snapshot_every:  int = 20
+    # Send frames as binary (UTF-8 JSON) instead of text, skipping the
+    # bytes → str decode; clients must read them as ArrayBuffer/Blob
+    ws_binary_frames:   bool = False
+    # How websocket messages, layout changes and upstream sessions reach the
+    # other uvicorn workers: "local" (single worker) or "sqlite", a broker
+    # file (default: backplane.db next to the database) polled every
+    # ws_backplane_poll_interval seconds. Required when WEB_CONCURRENCY > 1;
+    # the file holds the shared UniFi cookie and Gmail access token.
+    ws_backplane:               str = "local"
+    ws_backplane_path:          str = ""
+    ws_backplane_poll_interval: float = 0.05
+    # Only one worker (the holder of a lease row in the database) runs the
+    # scheduler; it renews the lease every leader_heartbeat_interval seconds,
+    # and a follower takes over once it is leader_lease_ttl seconds old
+    leader_lease_ttl:          float = 10.0
+    leader_heartbeat_interval: float = 2.0
 
 
 settings = Settings()
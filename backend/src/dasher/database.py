@@ -1,29 +1,50 @@
+import asyncio
 import json
 import logging
 import os
+import time
 import uuid
+from collections.abc import Awaitable, Callable
 from contextlib import asynccontextmanager
 from urllib.parse import urlparse
 
 import aiosqlite
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
-from sqlalchemy.orm import DeclarativeBase
 
+from dasher import metrics
 from dasher.config import settings
 
 logger = logging.getLogger(__name__)
 
-engine = create_async_engine(settings.database_url, echo=False)
-async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
 
+def _sqlalchemy() -> dict:
+    # SQLAlchemy costs about a third of the app's import time and nothing
+    # queries through it yet, so the engine is only built when first asked for.
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from sqlalchemy.orm import DeclarativeBase
 
-class Base(DeclarativeBase):
-    pass
+    engine = create_async_engine(settings.database_url, echo=False)
+    async_session_factory = async_sessionmaker(engine, expire_on_commit=False)
 
+    class Base(DeclarativeBase):
+        pass
 
-async def get_session() -> AsyncSession:
-    async with async_session_factory() as session:
-        yield session
+    async def get_session() -> AsyncSession:
+        async with async_session_factory() as session:
+            yield session
+
+    return {
+        "engine": engine,
+        "async_session_factory": async_session_factory,
+        "Base": Base,
+        "get_session": get_session,
+    }
+
+
+def __getattr__(name: str):
+    if name in ("engine", "async_session_factory", "Base", "get_session"):
+        globals().update(_sqlalchemy())
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def db_path() -> str:
@@ -35,15 +56,129 @@ def db_path() -> str:
     return os.path.abspath(raw)
 
 
+# Applied once per pooled connection rather than on every request
+_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -16000",  # KiB, i.e. 16 MB
+    "PRAGMA mmap_size = 67108864",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+async def _open_connection(path: str, readonly: bool) -> aiosqlite.Connection:
+    # cached_statements: sqlite3's per-connection prepared-statement cache,
+    # which only pays off because pooled connections live for the whole process
+    db = await aiosqlite.connect(path, cached_statements=256)
+    for pragma in _PRAGMAS:
+        await db.execute(pragma)
+    if readonly:
+        await db.execute("PRAGMA query_only = ON")
+    db.row_factory = aiosqlite.Row
+    return db
+
+
+class ConnectionPool:
+    """Pre-configured connections to one SQLite file.
+
+    Reads share ``size`` read-only connections (WAL lets them run alongside a
+    write); all writes go through a single connection serialized by a lock.
+    """
+
+    def __init__(self, path: str, size: int) -> None:
+        self.path = path
+        self.size = size
+        self._readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._all_readers: list[aiosqlite.Connection] = []
+        self._writer: aiosqlite.Connection | None = None
+        self._write_lock = asyncio.Lock()
+
+    async def open(self) -> None:
+        self._writer = await _open_connection(self.path, readonly=False)
+        for _ in range(self.size):
+            db = await _open_connection(self.path, readonly=True)
+            self._all_readers.append(db)
+            self._readers.put_nowait(db)
+
+    async def close(self) -> None:
+        for db in [self._writer, *self._all_readers]:
+            if db is not None:
+                await db.close()
+        self._writer = None
+        self._all_readers.clear()
+
+    @asynccontextmanager
+    async def reader(self):
+        db = await self._readers.get()
+        try:
+            yield db
+        finally:
+            if db.in_transaction:
+                await db.rollback()
+            self._readers.put_nowait(db)
+
+    @asynccontextmanager
+    async def writer(self):
+        async with self._write_lock:
+            try:
+                yield self._writer
+            finally:
+                # Anything the caller didn't commit (e.g. it raised) is discarded
+                if self._writer.in_transaction:
+                    await self._writer.rollback()
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_pool() -> ConnectionPool:
+    """Return the pool for the configured database, opening it on first use."""
+    global _pool
+    path = db_path()
+    if _pool is not None and _pool.path == path:
+        return _pool
+    async with _pool_lock:
+        if _pool is None or _pool.path != path:
+            if _pool is not None:
+                await _pool.close()
+            pool = ConnectionPool(path, settings.db_pool_size)
+            await pool.open()
+            _pool = pool
+    return _pool
+
+
+async def close_db() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
 @asynccontextmanager
-async def db_connect():
-    """Open a DB connection with foreign keys enabled and row_factory set."""
-    async with aiosqlite.connect(db_path()) as db:
-        await db.execute("PRAGMA foreign_keys = ON")
-        db.row_factory = aiosqlite.Row
-        yield db
+async def db_connect(readonly: bool = False):
+    """Borrow a pooled connection (foreign keys on, row_factory set).
+
+    Read-only callers share the reader connections; everyone else gets the
+    single writer connection, one at a time.
+    """
+    mode = "read" if readonly else "write"
+    requested_at = time.perf_counter()
+    pool = await get_pool()
+    conn = pool.reader() if readonly else pool.writer()
+    async with conn as db:
+        acquired_at = time.perf_counter()
+        metrics.db_wait_seconds.observe(acquired_at - requested_at, mode)
+        try:
+            yield db
+        finally:
+            metrics.db_hold_seconds.observe(time.perf_counter() - acquired_at, mode)
 
 
+# Schema of migration 1. Later changes go in MIGRATIONS as new steps, not here:
+# databases that already ran migration 1 never see edits to this text.
 DDL = """
 PRAGMA foreign_keys = ON;
 
@@ -64,15 +199,44 @@ CREATE TABLE IF NOT EXISTS rss_feeds (
     id TEXT PRIMARY KEY,
     url TEXT NOT NULL,
     label TEXT,
-    refresh_interval_minutes INT DEFAULT 15
+    refresh_interval_minutes INT DEFAULT 15,
+    etag TEXT DEFAULT NULL,
+    last_modified TEXT DEFAULT NULL,
+    last_fetched_at REAL DEFAULT NULL,
+    last_error TEXT DEFAULT NULL,
+    next_fetch_at REAL DEFAULT NULL,
+    interval_seconds REAL DEFAULT NULL,
+    error_count INT NOT NULL DEFAULT 0,
+    hit_count INT NOT NULL DEFAULT 0,
+    skip_count INT NOT NULL DEFAULT 0,
+    backoff_count INT NOT NULL DEFAULT 0
 );
 
+CREATE TABLE IF NOT EXISTS rss_items (
+    id TEXT PRIMARY KEY,
+    feed_id TEXT NOT NULL REFERENCES rss_feeds(id) ON DELETE CASCADE,
+    title TEXT NOT NULL DEFAULT '',
+    link TEXT,
+    summary TEXT,
+    published_at REAL,
+    fetched_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_rss_items_published ON rss_items (published_at DESC);
+CREATE INDEX IF NOT EXISTS idx_rss_items_feed ON rss_items (feed_id, published_at DESC);
+
 CREATE TABLE IF NOT EXISTS crawler_rules (
     id TEXT PRIMARY KEY,
     url TEXT NOT NULL,
     selector TEXT,
     llm_prompt TEXT,
-    check_interval_minutes INT DEFAULT 60
+    check_interval_minutes INT DEFAULT 60,
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT,
+    last_checked_at REAL,
+    last_changed_at REAL,
+    last_error TEXT
 );
 
 CREATE TABLE IF NOT EXISTS crawler_alerts (
@@ -84,6 +248,13 @@ CREATE TABLE IF NOT EXISTS crawler_alerts (
     dismissed BOOL DEFAULT FALSE
 );
 
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+
 CREATE TABLE IF NOT EXISTS settings (
     key TEXT PRIMARY KEY,
     value TEXT
@@ -104,52 +275,133 @@ _SEED_CRAWLER_ALERT_ID    = "00000000-0000-0000-0000-000000000010"
 _SEED_WIDGET_DIRECTORY_ID = "00000000-0000-0000-0000-000000000011"
 
 
+# Columns added to existing tables before the schema was versioned. Databases
+# created since then get them from DDL; older ones are patched by migration 2.
+_LEGACY_COLUMNS = {
+    "widget_instances": [
+        ("name", "TEXT NOT NULL DEFAULT ''"),
+        ("background_color", "TEXT DEFAULT NULL"),
+    ],
+    "rss_feeds": [
+        ("etag", "TEXT DEFAULT NULL"),
+        ("last_modified", "TEXT DEFAULT NULL"),
+        ("last_fetched_at", "REAL DEFAULT NULL"),
+        ("last_error", "TEXT DEFAULT NULL"),
+        ("next_fetch_at", "REAL DEFAULT NULL"),
+        ("interval_seconds", "REAL DEFAULT NULL"),
+        ("error_count", "INT NOT NULL DEFAULT 0"),
+        ("hit_count", "INT NOT NULL DEFAULT 0"),
+        ("skip_count", "INT NOT NULL DEFAULT 0"),
+        ("backoff_count", "INT NOT NULL DEFAULT 0"),
+    ],
+    "crawler_rules": [
+        ("etag", "TEXT DEFAULT NULL"),
+        ("last_modified", "TEXT DEFAULT NULL"),
+        ("content_hash", "TEXT DEFAULT NULL"),
+        ("last_checked_at", "REAL DEFAULT NULL"),
+        ("last_changed_at", "REAL DEFAULT NULL"),
+        ("last_error", "TEXT DEFAULT NULL"),
+    ],
+}
+
+
+async def _create_tables(db: aiosqlite.Connection) -> None:
+    for statement in DDL.strip().split(";"):
+        stmt = statement.strip()
+        if stmt:
+            await db.execute(stmt)
+
+
+async def _add_legacy_columns(db: aiosqlite.Connection) -> None:
+    for table, columns in _LEGACY_COLUMNS.items():
+        async with db.execute(f"PRAGMA table_info({table})") as cursor:
+            existing = {row[1] for row in await cursor.fetchall()}
+        for column, definition in columns:
+            if column not in existing:
+                await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+async def _seed_widgets(db: aiosqlite.Connection) -> None:
+    # fmt: off
+    await db.executemany(
+        "INSERT OR IGNORE INTO widget_instances (id, widget_type, config, grid_x, grid_y, grid_w, grid_h) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            # Row 0 — y=0
+            (_SEED_DUMMY_ID,         "dummy",          json.dumps({"nimi": "Dasher"}), 0, 0,  3, 2),
+            (_SEED_TECH_ID,          "tech_about",     json.dumps({}),                 3, 0,  9, 6),
+            # Row 1 — y=6 (four equal-ish columns across 12)
+            (_SEED_CLOCK_ID,         "clock",          json.dumps({}),                 0, 6,  2, 2),
+            (_SEED_GMAIL_ID,         "gmail",          json.dumps({}),                 2, 6,  2, 2),
+            (_SEED_RSS_ID,           "rss",            json.dumps({}),                 4, 6,  4, 2),
+            (_SEED_HASS_ID,          "hass",           json.dumps({}),                 8, 6,  4, 2),
+            # Row 2 — y=8 (four equal columns)
+            (_SEED_SABNZBD_ID,       "sabnzbd",        json.dumps({}),                 0, 8,  3, 2),
+            (_SEED_UNIFI_ID,         "unifi",          json.dumps({}),                 3, 8,  3, 2),
+            (_SEED_HTML_ID,          "html",           json.dumps({}),                 6, 8,  3, 2),
+            (_SEED_CRAWLER_ALERT_ID,    "crawler_alert",    json.dumps({}),                 9, 8,  3, 2),
+            # Row 3
+            (_SEED_WIDGET_DIRECTORY_ID, "widget_directory", json.dumps({}),                 0, 10, 4, 5),
+        ],
+    )
+    # fmt: on
+
+
+async def _create_leases(db: aiosqlite.Connection) -> None:
+    # One row per elected role; see dasher.leader
+    await db.execute(
+        "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, holder TEXT NOT NULL, expires_at REAL NOT NULL)"
+    )
+
+
+# Ordered, run-once schema changes: (version, description, step). Append new
+# ones with the next version number; never edit or reorder applied ones.
+MIGRATIONS: list[tuple[int, str, Callable[[aiosqlite.Connection], Awaitable[None]]]] = [
+    (1, "create tables", _create_tables),
+    (2, "add columns from before schema versioning", _add_legacy_columns),
+    (3, "seed default widgets", _seed_widgets),
+    (4, "create leader leases", _create_leases),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+async def _current_version(db: aiosqlite.Connection) -> int:
+    async with db.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version") as cursor:
+        return (await cursor.fetchone())[0]
+
+
 async def init_db() -> None:
+    """Bring the database up to ``SCHEMA_VERSION``; a no-op query when it already is.
+
+    Each pending migration runs in its own write transaction together with
+    its ``schema_version`` row, so a failed step is retried on the next start
+    and concurrent starters apply it only once.
+    """
     path = db_path()
     os.makedirs(os.path.dirname(path) if os.path.dirname(path) else ".", exist_ok=True)
 
     try:
-        async with aiosqlite.connect(path) as db:
-            for statement in DDL.strip().split(";"):
-                stmt = statement.strip()
-                if stmt:
-                    await db.execute(stmt)
-            await db.commit()
-
-            # Idempotent column migrations for databases created before these columns were added
-            for migration_sql in [
-                "ALTER TABLE widget_instances ADD COLUMN name TEXT NOT NULL DEFAULT ''",
-                "ALTER TABLE widget_instances ADD COLUMN background_color TEXT DEFAULT NULL",
-            ]:
-                try:
-                    await db.execute(migration_sql)
-                    await db.commit()
-                except aiosqlite.OperationalError:
-                    pass  # column already exists
-
-            # fmt: off
-            await db.executemany(
-                "INSERT OR IGNORE INTO widget_instances (id, widget_type, config, grid_x, grid_y, grid_w, grid_h) VALUES (?, ?, ?, ?, ?, ?, ?)",
-                [
-                    # Row 0 — y=0
-                    (_SEED_DUMMY_ID,         "dummy",          json.dumps({"nimi": "Dasher"}), 0, 0,  3, 2),
-                    (_SEED_TECH_ID,          "tech_about",     json.dumps({}),                 3, 0,  9, 6),
-                    # Row 1 — y=6 (four equal-ish columns across 12)
-                    (_SEED_CLOCK_ID,         "clock",          json.dumps({}),                 0, 6,  2, 2),
-                    (_SEED_GMAIL_ID,         "gmail",          json.dumps({}),                 2, 6,  2, 2),
-                    (_SEED_RSS_ID,           "rss",            json.dumps({}),                 4, 6,  4, 2),
-                    (_SEED_HASS_ID,          "hass",           json.dumps({}),                 8, 6,  4, 2),
-                    # Row 2 — y=8 (four equal columns)
-                    (_SEED_SABNZBD_ID,       "sabnzbd",        json.dumps({}),                 0, 8,  3, 2),
-                    (_SEED_UNIFI_ID,         "unifi",          json.dumps({}),                 3, 8,  3, 2),
-                    (_SEED_HTML_ID,          "html",           json.dumps({}),                 6, 8,  3, 2),
-                    (_SEED_CRAWLER_ALERT_ID,    "crawler_alert",    json.dumps({}),                 9, 8,  3, 2),
-                    # Row 3
-                    (_SEED_WIDGET_DIRECTORY_ID, "widget_directory", json.dumps({}),                 0, 10, 4, 5),
-                ],
+        async with aiosqlite.connect(path, isolation_level=None) as db:
+            await db.execute(
+                "CREATE TABLE IF NOT EXISTS schema_version"
+                " (version INTEGER PRIMARY KEY, description TEXT NOT NULL, applied_at REAL NOT NULL)"
             )
-            # fmt: on
-            await db.commit()
+            if await _current_version(db) >= SCHEMA_VERSION:
+                return
+            await db.execute("PRAGMA busy_timeout = 5000")
+            for version, description, step in MIGRATIONS:
+                await db.execute("BEGIN IMMEDIATE")
+                try:
+                    if await _current_version(db) < version:
+                        await step(db)
+                        await db.execute(
+                            "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                            (version, description, time.time()),
+                        )
+                        logger.info("Applied schema migration %d: %s", version, description)
+                    await db.execute("COMMIT")
+                except BaseException:
+                    await db.execute("ROLLBACK")
+                    raise
     except Exception:
         logger.exception("Failed to initialise database at %s", path)
         raise
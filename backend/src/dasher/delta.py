@@ -0,0 +1,106 @@
+"""Compact diffs between successive payloads published on a websocket channel.
+
+A delta for two dict payloads looks like::
+
+    {
+        "set":    {"speed": "4.1 MB/s"},            # changed or added top-level fields
+        "unset":  ["error"],                        # removed top-level fields
+        "lists":  {                                 # keyed lists, diffed item by item
+            "slots": {
+                "key":    "id",
+                "upsert": [{"id": "SABnzbd_nzo_1", "percentage": "42", ...}],
+                "remove": ["SABnzbd_nzo_0"],
+                "order":  ["SABnzbd_nzo_1", ...],   # only when ordering changed
+            },
+        },
+    }
+
+Lists of dicts that all carry a unique string or integer key field
+(``KEY_FIELDS``) are diffed by key; any other changed value is sent whole
+under ``set``.
+"""
+from typing import Any
+
+# Tried in order; UniFi clients are keyed by MAC, SABnzbd slots by nzo id
+KEY_FIELDS = ("id", "mac", "nzo_id", "entity_id")
+
+
+def _key_field(*lists: list) -> str | None:
+    items = [item for lst in lists for item in lst]
+    if not items or not all(isinstance(item, dict) for item in items):
+        return None
+    for field in KEY_FIELDS:
+        # Only scalar keys: a list or dict id can't be looked up (or hashed)
+        if all(isinstance(item.get(field), (str, int)) for item in items) and all(
+            len({item[field] for item in lst}) == len(lst) for lst in lists
+        ):
+            return field
+    return None
+
+
+def _list_diff(old: list, new: list) -> dict | None:
+    key = _key_field(old, new)
+    if key is None:
+        return None
+    old_by_key = {item[key]: item for item in old}
+    new_keys = [item[key] for item in new]
+    new_key_set = set(new_keys)
+
+    result: dict[str, Any] = {"key": key}
+    upsert = [item for item in new if old_by_key.get(item[key]) != item]
+    remove = [k for k in old_by_key if k not in new_key_set]
+    if upsert:
+        result["upsert"] = upsert
+    if remove:
+        result["remove"] = remove
+    # Order implied by "keep survivors in place, append new items"
+    implied = [k for k in old_by_key if k in new_key_set] + [k for k in new_keys if k not in old_by_key]
+    if implied != new_keys:
+        result["order"] = new_keys
+    return result
+
+
+def diff(old: Any, new: Any) -> dict | None:
+    """Return a delta turning *old* into *new*, or None if only a full snapshot will do."""
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return None
+    set_: dict[str, Any] = {}
+    lists: dict[str, dict] = {}
+    for k, v in new.items():
+        if k in old and old[k] == v:
+            continue
+        if isinstance(v, list) and isinstance(old.get(k), list):
+            list_delta = _list_diff(old[k], v)
+            if list_delta is not None:
+                lists[k] = list_delta
+                continue
+        set_[k] = v
+
+    delta: dict[str, Any] = {}
+    if set_:
+        delta["set"] = set_
+    unset = [k for k in old if k not in new]
+    if unset:
+        delta["unset"] = unset
+    if lists:
+        delta["lists"] = lists
+    return delta
+
+
+def apply(old: dict, delta: dict) -> dict:
+    """Apply *delta* to *old* and return the new payload (reference for clients)."""
+    new = {k: v for k, v in old.items() if k not in delta.get("unset", ())}
+    new.update(delta.get("set", {}))
+    for field, list_delta in delta.get("lists", {}).items():
+        key = list_delta["key"]
+        removed = set(list_delta.get("remove", ()))
+        by_key = {item[key]: item for item in old.get(field, []) if item[key] not in removed}
+        order = list(by_key)
+        for item in list_delta.get("upsert", ()):
+            if item[key] not in by_key:
+                order.append(item[key])
+            by_key[item[key]] = item
+        if "order" in list_delta:
+            order = list_delta["order"]
+        new[field] = [by_key[k] for k in order]
+    return new
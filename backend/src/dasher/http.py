@@ -1,10 +1,53 @@
-"""Shared httpx client factory with request/response logging."""
+"""Shared httpx client factory with request/response logging.
+
+Upstream integrations should use ``get_client(name)`` rather than building a
+client per request: each upstream gets one long-lived AsyncClient with its own
+keep-alive pool, limits and timeouts, so repeated dashboard polls reuse open
+TCP/TLS connections. ``close_clients()`` is called from ``main.lifespan``.
+"""
+import importlib.util
 import logging
+import time
+from dataclasses import dataclass
 
 import httpx
 
+from dasher import metrics
+from dasher.log import Lazy
+
 logger = logging.getLogger(__name__)
 
+# HTTP/2 needs the optional "h2" package; httpx negotiates it via ALPN and
+# falls back to HTTP/1.1 for upstreams that don't offer it.
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@dataclass(frozen=True)
+class Upstream:
+    timeout: float = 10.0
+    max_connections: int = 10
+    max_keepalive: int = 5
+    keepalive_expiry: float = 60.0
+    http2: bool = False
+    verify: bool = True
+
+
+UPSTREAMS: dict[str, Upstream] = {
+    "hass":    Upstream(timeout=10.0),
+    "sabnzbd": Upstream(timeout=5.0, max_connections=4, max_keepalive=2),
+    # verify=False: UniFi controllers commonly use self-signed TLS certs
+    "unifi":   Upstream(timeout=10.0, max_connections=4, max_keepalive=2, verify=False),
+    "google":  Upstream(timeout=10.0, max_connections=20, max_keepalive=10, http2=True),
+    # Feeds live on many hosts; the pool is shared across all of them
+    "rss":     Upstream(timeout=15.0, max_connections=20, max_keepalive=10, http2=True),
+    "crawler": Upstream(timeout=20.0, max_connections=20, max_keepalive=10, http2=True),
+    # Responses are streamed, so this is the gap allowed between tokens (and
+    # for model load); llm_service bounds the whole generation separately
+    "ollama":  Upstream(timeout=60.0, max_connections=4, max_keepalive=2),
+}
+
+_clients: dict[str, httpx.AsyncClient] = {}
+
 
 async def _log_request(request: httpx.Request) -> None:
     logger.debug("→ %s %s", request.method, request.url)
@@ -17,17 +60,63 @@ async def _log_response(response: httpx.Response) -> None:
         logger.debug("← %s %s", response.status_code, response.url)
 
 
-def make_client(**kwargs) -> httpx.AsyncClient:
-    """Return an AsyncClient with request/response logging pre-configured."""
-    hooks: dict = {"request": [_log_request], "response": [_log_response]}
+def _metric_hooks(upstream: str) -> tuple:
+    async def start(request: httpx.Request) -> None:
+        request.extensions["dasher_started_at"] = time.perf_counter()
+        metrics.upstream_requests.inc(upstream)
+
+    async def finish(response: httpx.Response) -> None:
+        started_at = response.request.extensions.get("dasher_started_at")
+        if started_at is not None:
+            metrics.upstream_seconds.observe(time.perf_counter() - started_at, upstream)
+        metrics.upstream_responses.inc(upstream, str(response.status_code))
+
+    return start, finish
+
+
+def make_client(upstream: str = "other", **kwargs) -> httpx.AsyncClient:
+    """Return an AsyncClient with request/response logging and metrics pre-configured."""
+    start, finish = _metric_hooks(upstream)
+    hooks: dict = {"request": [_log_request, start], "response": [_log_response, finish]}
     return httpx.AsyncClient(event_hooks=hooks, **kwargs)
 
 
+def get_client(name: str) -> httpx.AsyncClient:
+    """Return the shared, pooled client for upstream *name*, creating it on first use."""
+    client = _clients.get(name)
+    if client is None or client.is_closed:
+        up = UPSTREAMS[name]
+        client = make_client(
+            name,
+            timeout=up.timeout,
+            verify=up.verify,
+            http2=up.http2 and _HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=up.max_connections,
+                max_keepalive_connections=up.max_keepalive,
+                keepalive_expiry=up.keepalive_expiry,
+            ),
+        )
+        _clients[name] = client
+    return client
+
+
+async def close_clients() -> None:
+    """Close every shared upstream client. Safe to call more than once."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        try:
+            await client.aclose()
+        except Exception:
+            logger.exception("Error closing upstream client")
+
+
 def log_response_error(exc: httpx.HTTPStatusError) -> None:
-    """Log status-error response body. Call from an except httpx.HTTPStatusError block."""
-    logger.error(
-        "← %s %s\n%s",
-        exc.response.status_code,
-        exc.response.url,
-        exc.response.text[:2000],
-    )
+    """Log status-error response body. Call from an except httpx.HTTPStatusError block.
+
+    The body is decoded and truncated on the logging thread, and only if the
+    record survives rate limiting.
+    """
+    response = exc.response
+    logger.error("← %s %s\n%s", response.status_code, response.url, Lazy(lambda: response.text[:2000]))
@@ -0,0 +1,86 @@
+"""Optional upstream integrations and their lazily mounted routers.
+
+An integration whose settings are filled in has its router imported and
+mounted at startup. One that is not configured costs nothing at import time:
+``LazyRouters`` imports and mounts its router on the first request under its
+prefix (where the router answers ``{"configured": False, ...}`` as before).
+Until then its routes are missing from ``/openapi.json``.
+
+The ``*_configured`` predicates are shared with the scheduler, which also
+never imports the service module of an unconfigured integration.
+"""
+import importlib
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from dasher.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def hass_configured() -> bool:
+    return bool(settings.hass_url and settings.hass_token)
+
+
+def sabnzbd_configured() -> bool:
+    return bool(settings.sabnzbd_url and settings.sabnzbd_api_key)
+
+
+def unifi_configured() -> bool:
+    return bool(settings.unifi_url and settings.unifi_user and settings.unifi_pass)
+
+
+def gmail_configured() -> bool:
+    return bool(settings.google_client_id and settings.google_refresh_token)
+
+
+@dataclass(frozen=True)
+class Integration:
+    prefix: str   # URL prefix of its router
+    module: str   # module with a ``router`` attribute
+    configured: Callable[[], bool]
+
+
+INTEGRATIONS = [
+    Integration("/hass", "dasher.routers.hass", hass_configured),
+    Integration("/sabnzbd", "dasher.routers.sabnzbd", sabnzbd_configured),
+    Integration("/unifi", "dasher.routers.unifi", unifi_configured),
+    Integration("/gmail", "dasher.routers.gmail", gmail_configured),
+]
+
+
+def mount(app: Any, integration: Integration) -> None:
+    app.include_router(importlib.import_module(integration.module).router)
+    app.openapi_schema = None  # regenerate /openapi.json with the new routes
+
+
+def mount_configured(app: Any) -> list[Integration]:
+    """Mount configured integrations now; return the rest for ``LazyRouters``."""
+    pending = []
+    for integration in INTEGRATIONS:
+        if integration.configured():
+            mount(app, integration)
+        else:
+            pending.append(integration)
+    return pending
+
+
+class LazyRouters:
+    """ASGI middleware mounting a pending integration on the first request to its prefix."""
+
+    def __init__(self, app: Any, target: Any, pending: list[Integration]) -> None:
+        self.app = app
+        self.target = target  # the FastAPI app the routers are added to
+        self.pending = list(pending)
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if self.pending and scope["type"] in ("http", "websocket"):
+            path = scope["path"]
+            for integration in list(self.pending):
+                if path == integration.prefix or path.startswith(integration.prefix + "/"):
+                    self.pending.remove(integration)
+                    mount(self.target, integration)
+                    logger.debug("Mounted %s on first use", integration.module)
+        await self.app(scope, receive, send)
@@ -0,0 +1,109 @@
+"""Leader election across uvicorn workers through a lease row in SQLite.
+
+Every worker runs the same ``LeaderElection``. Each heartbeat is one
+conditional upsert on the ``leases`` table: it renews the row if this worker
+holds it, takes it over if it has expired, and otherwise changes nothing. So
+at most one worker holds an unexpired lease. A worker considers itself leader
+only until the expiry it last wrote, which is never later than what the
+others see. A leader that crashes is replaced within ``leader_lease_ttl``
+plus one heartbeat. A leader that shuts down cleanly deletes its row, so a
+follower takes over on its next heartbeat.
+
+Only the leader runs the scheduler's jobs (bar the per-worker UniFi table
+refresh) and pushes Home Assistant changes.
+Every worker still serves requests from its own caches and the shared
+database.
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections.abc import Callable
+from typing import Any
+
+from dasher.config import settings
+from dasher.database import db_connect
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderElection:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.holder = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # Wall-clock end of the lease this worker last wrote; 0 when not leader
+        self._expires_at = 0.0
+        self._task: asyncio.Task | None = None
+        self._on_elected: list[Callable[[], Any]] = []
+
+    @property
+    def is_leader(self) -> bool:
+        return time.time() < self._expires_at
+
+    def on_elected(self, callback: Callable[[], Any]) -> None:
+        """Call *callback* each time this worker becomes the leader."""
+        self._on_elected.append(callback)
+
+    async def renew(self) -> bool:
+        """Renew or take over the lease; return whether this worker now holds it."""
+        was_leader = self.is_leader
+        now = time.time()
+        expires_at = now + settings.leader_lease_ttl
+        async with db_connect() as db:
+            cursor = await db.execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at"
+                " WHERE leases.holder = excluded.holder OR leases.expires_at < ?",
+                (self.name, self.holder, expires_at, now),
+            )
+            acquired = cursor.rowcount > 0
+            await db.commit()
+        self._expires_at = expires_at if acquired else 0.0
+        if acquired and not was_leader:
+            logger.info("Worker %s is now the %s leader", self.holder, self.name)
+            for callback in self._on_elected:
+                callback()
+        elif was_leader and not acquired:
+            logger.warning("Worker %s lost the %s lease", self.holder, self.name)
+        return acquired
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        try:
+            await self.renew()
+        except Exception as exc:
+            logger.warning("Leader lease renewal failed: %s", exc)
+        self._task = asyncio.create_task(self._heartbeat())
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(settings.leader_heartbeat_interval)
+            try:
+                await self.renew()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # Leadership lapses by itself when the lease runs out
+                logger.warning("Leader lease renewal failed: %s", exc)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._expires_at:
+            self._expires_at = 0.0
+            try:
+                async with db_connect() as db:
+                    await db.execute("DELETE FROM leases WHERE name=? AND holder=?", (self.name, self.holder))
+                    await db.commit()
+            except Exception as exc:
+                logger.warning("Could not release the %s lease: %s", self.name, exc)
+
+
+election = LeaderElection("scheduler")
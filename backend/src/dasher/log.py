@@ -0,0 +1,144 @@
+"""Logging pipeline: records are queued on the event loop, written by a thread.
+
+``configure_logging()`` installs a single ``QueueHandler`` on the root logger.
+The calling thread only does the level check, the rate-limit filter and an
+enqueue; message interpolation, exception formatting, JSON encoding and the
+stream write all happen on the ``QueueListener`` thread. Pass expensive
+values as ``%s`` arguments (or wrap them in ``Lazy``) so nothing is computed
+for records that are filtered out or below the logger's level.
+
+``RateLimitFilter`` is a token bucket per (logger, message template, level)
+for warnings and errors from the loggers in ``RATE_LIMITED``, so a failing
+upstream produces a few lines per minute plus a ``suppressed`` count instead
+of a line per poll.
+"""
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+from collections.abc import Callable
+from typing import Any
+
+from dasher.config import settings
+
+# Logger name prefixes whose repeated records are rate limited
+RATE_LIMITED = ("dasher.http", "dasher.services", "httpx")
+
+_listener: logging.handlers.QueueListener | None = None
+_handler: logging.Handler | None = None
+
+
+class Lazy:
+    """Defers an expensive value until the record is actually formatted."""
+
+    __slots__ = ("_fn",)
+
+    def __init__(self, fn: Callable[[], Any]) -> None:
+        self._fn = fn
+
+    def __str__(self) -> str:
+        return str(self._fn())
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per (logger, template, level): ``burst`` records, then ``per_minute``."""
+
+    def __init__(
+        self,
+        per_minute: float,
+        burst: int,
+        prefixes: tuple[str, ...] = RATE_LIMITED,
+        min_level: int = logging.WARNING,
+    ) -> None:
+        super().__init__()
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.prefixes = prefixes
+        self.min_level = min_level
+        # key → [tokens, last refill (monotonic), suppressed since last pass]
+        self._buckets: dict[tuple, list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate <= 0 or record.levelno < self.min_level or not record.name.startswith(self.prefixes):
+            return True
+        key = (record.name, record.msg, record.levelno)
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now, 0]
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False
+        bucket[0] -= 1
+        if bucket[2]:
+            record.suppressed = bucket[2]
+            bucket[2] = 0
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues the record untouched; the stock handler formats it first."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text} [{suppressed} similar suppressed]" if suppressed else text
+
+
+def configure_logging() -> None:
+    """Route all logging through the queue. Safe to call more than once."""
+    global _listener, _handler
+    if _listener is not None:
+        return
+    if settings.log_format == "json":
+        formatter: logging.Formatter = JsonFormatter()
+    else:
+        formatter = _TextFormatter("%(asctime)s %(levelname)s %(name)s — %(message)s", datefmt="%H:%M:%S")
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(formatter)
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _handler = _DeferredQueueHandler(records)
+    _handler.addFilter(RateLimitFilter(settings.log_rate_limit_per_minute, settings.log_rate_limit_burst))
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(settings.log_level.upper())
+
+    _listener = logging.handlers.QueueListener(records, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener, _handler
+    if _handler is not None:
+        logging.getLogger().removeHandler(_handler)
+        _handler = None
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
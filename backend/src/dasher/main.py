@@ -1,26 +1,42 @@
-import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
+from dasher import integrations, metrics, serialization
 from dasher.config import settings
-from dasher.database import init_db
-from dasher.routers import crawler, gmail, hass, layout, rss, sabnzbd, unifi, websocket
+from dasher.database import close_db, init_db
+from dasher.http import close_clients
+from dasher.leader import election
+from dasher.log import configure_logging, stop_logging
+from dasher.routers import crawler, layout, rss, websocket
+from dasher.services import scheduler
+from dasher.ws_manager import manager
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(name)s — %(message)s",
-    datefmt="%H:%M:%S",
-)
-# Show outgoing request/response logs from our http module
-logging.getLogger("dasher.http").setLevel(logging.DEBUG)
+configure_logging()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    hass_service = None
+    if integrations.hass_configured():
+        from dasher.services import hass_service
+
+        hass_service.state_cache.start()
+    await manager.start()
+    await election.start()
+    scheduler.start()
     yield
+    await election.stop()
+    scheduler.shutdown()
+    await manager.stop()
+    if hass_service is not None:
+        await hass_service.state_cache.stop()
+    await close_clients()
+    await close_db()
+    stop_logging()
 
 
 app = FastAPI(
@@ -28,6 +44,7 @@ app = FastAPI(
     description="Backend for the Dasher customizable dashboard",
     version="0.1.0",
     lifespan=lifespan,
+    default_response_class=serialization.default_response_class(),
 )
 
 app.add_middleware(
@@ -37,15 +54,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Unconfigured integrations (Home Assistant, SABnzbd, UniFi, Gmail) are only
+# imported when something first requests their routes
+app.add_middleware(integrations.LazyRouters, target=app, pending=integrations.mount_configured(app))
+# Outermost, so the timing includes CORS handling
+app.add_middleware(metrics.MetricsMiddleware)
 
 app.include_router(websocket.router)
 app.include_router(layout.router)
 app.include_router(rss.router)
-app.include_router(hass.router)
-app.include_router(sabnzbd.router)
-app.include_router(unifi.router)
 app.include_router(crawler.router)
-app.include_router(gmail.router)
 
 
 @app.get("/health")
@@ -53,6 +71,12 @@ async def health() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint() -> PlainTextResponse:
+    """Prometheus text exposition format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/")
 async def root() -> dict:
     return {"message": "Dasher API", "docs": "/docs"}
@@ -0,0 +1,217 @@
+"""In-process metrics, rendered at ``GET /metrics`` in Prometheus text format.
+
+Counters and histograms are plain Python lists updated from the event loop:
+each label combination gets its bucket array allocated on first use, and an
+observation is a bisect plus a few integer increments, with no locks. Values
+that already live elsewhere (cache counters, websocket connections, LLM
+stats) are read at scrape time through ``Callback`` collectors instead of
+being mirrored on every update.
+
+Instrumented here and in the modules that import this one:
+
+* HTTP routes — ``MetricsMiddleware``, added in ``main``
+* upstream calls — the ``make_client`` event hooks in ``dasher.http``
+* SQLite — pool wait and hold time in ``database.db_connect``
+"""
+import bisect
+import math
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+# Seconds; tuned for ~1 ms local handlers up to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Sample = tuple[str, dict[str, str], float]  # (suffix, labels, value)
+
+_registry: list["_Metric"] = []
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        _registry.append(self)
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        cell = self._values.get(labels)
+        if cell is None:
+            cell = self._values[labels] = [0.0]
+        cell[0] += amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, [0.0])[0]
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, cell in self._values.items():
+            yield "", dict(zip(self.labelnames, labels)), cell[0]
+
+
+class _HistogramChild:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size  # last slot is +Inf
+        self.sum = 0.0
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: dict[tuple[str, ...], _HistogramChild] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children[labels] = _HistogramChild(len(self.buckets) + 1)
+        child.counts[bisect.bisect_left(self.buckets, value)] += 1
+        child.sum += value
+
+    def count(self, *labels: str) -> int:
+        child = self._children.get(labels)
+        return sum(child.counts) if child else 0
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, child in self._children.items():
+            base = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, n in zip((*self.buckets, math.inf), child.counts):
+                cumulative += n
+                yield "_bucket", {**base, "le": _format_value(bound)}, cumulative
+            yield "_sum", base, child.sum
+            yield "_count", base, cumulative
+
+
+class Callback(_Metric):
+    """Metric whose samples are computed at scrape time: ``fn() -> [(labels, value)]``."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        fn: Callable[[], Iterable[tuple[dict[str, str], float]]],
+        kind: str = "gauge",
+    ) -> None:
+        super().__init__(name, help)
+        self.kind = kind
+        self._fn = fn
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self._fn():
+            yield "", labels, value
+
+
+# ── Rendering ──────────────────────────────────────────────────────────────────
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for suffix, labels, value in metric.samples():
+            label_text = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+            label_text = f"{{{label_text}}}" if label_text else ""
+            lines.append(f"{metric.name}{suffix}{label_text} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ── Shared metrics ─────────────────────────────────────────────────────────────
+
+http_request_seconds = Histogram(
+    "dasher_http_request_duration_seconds",
+    "Time to handle an HTTP request, by route template.",
+    ("method", "route"),
+)
+http_requests = Counter(
+    "dasher_http_requests_total", "HTTP requests handled, by route template and status.",
+    ("method", "route", "status"),
+)
+
+upstream_seconds = Histogram(
+    "dasher_upstream_request_duration_seconds",
+    "Time from sending an upstream request to receiving its response headers.",
+    ("upstream",),
+)
+upstream_requests = Counter(
+    "dasher_upstream_requests_started_total",
+    "Upstream requests sent; started minus responses counts transport errors and timeouts.",
+    ("upstream",),
+)
+upstream_responses = Counter(
+    "dasher_upstream_responses_total", "Upstream responses received, by status code.",
+    ("upstream", "status"),
+)
+
+db_wait_seconds = Histogram(
+    "dasher_db_acquire_duration_seconds", "Time spent waiting for a pooled SQLite connection.", ("mode",),
+)
+db_hold_seconds = Histogram(
+    "dasher_db_connection_hold_seconds", "Time a pooled SQLite connection was held.", ("mode",),
+)
+
+
+# ── ASGI middleware ────────────────────────────────────────────────────────────
+
+class MetricsMiddleware:
+    """Times HTTP requests; the route label is the matched path template."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners can't blow up cardinality
+            template = getattr(route, "path", None) or "<unmatched>"
+            method = scope["method"]
+            http_request_seconds.observe(time.perf_counter() - start, method, template)
+            http_requests.inc(method, template, str(status))
@@ -1,13 +1,84 @@
-from fastapi import APIRouter
+import uuid
+
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field, field_validator
+
+from dasher.database import db_connect
+from dasher.services import crawler_service
 
 router = APIRouter(prefix="/crawler", tags=["crawler"])
 
 
+class RuleCreate(BaseModel):
+    url: str = Field(min_length=1)
+    selector: str | None = None
+    llm_prompt: str | None = None
+    check_interval_minutes: int = Field(default=60, ge=1)
+
+    @field_validator("selector")
+    @classmethod
+    def validate_selector(cls, v: str | None) -> str | None:
+        if v:
+            crawler_service.validate_selector(v)
+        return v
+
+
 @router.get("/rules")
 async def list_rules() -> dict:
-    return {"rules": []}
+    async with db_connect(readonly=True) as db:
+        async with db.execute(
+            "SELECT id, url, selector, llm_prompt, check_interval_minutes,"
+            " last_checked_at, last_changed_at, last_error"
+            " FROM crawler_rules ORDER BY url"
+        ) as cursor:
+            rows = await cursor.fetchall()
+    return {"rules": [dict(r) for r in rows]}
+
+
+@router.post("/rules", status_code=201)
+async def create_rule(body: RuleCreate) -> dict:
+    rule_id = str(uuid.uuid4())
+    async with db_connect() as db:
+        await db.execute(
+            "INSERT INTO crawler_rules (id, url, selector, llm_prompt, check_interval_minutes)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (rule_id, body.url, body.selector, body.llm_prompt, body.check_interval_minutes),
+        )
+        await db.commit()
+    return {"id": rule_id}
+
+
+@router.delete("/rules/{rule_id}", status_code=204)
+async def delete_rule(rule_id: str) -> None:
+    async with db_connect() as db:
+        await db.execute("DELETE FROM crawler_alerts WHERE rule_id=?", (rule_id,))
+        await db.execute("DELETE FROM crawler_rules WHERE id=?", (rule_id,))
+        await db.commit()
 
 
 @router.get("/alerts")
-async def list_alerts() -> dict:
-    return {"alerts": []}
+async def list_alerts(
+    limit: int = Query(default=20, ge=1, le=200),
+    include_dismissed: bool = False,
+) -> dict:
+    query = (
+        "SELECT a.id, a.rule_id, r.url, a.content_snapshot, a.llm_analysis, a.triggered_at, a.dismissed"
+        " FROM crawler_alerts a JOIN crawler_rules r ON r.id = a.rule_id"
+    )
+    if not include_dismissed:
+        query += " WHERE NOT a.dismissed"
+    query += " ORDER BY a.triggered_at DESC, a.rowid DESC LIMIT ?"
+    async with db_connect(readonly=True) as db:
+        async with db.execute(query, (limit,)) as cursor:
+            rows = await cursor.fetchall()
+    return {"alerts": [{**dict(r), "dismissed": bool(r["dismissed"])} for r in rows]}
+
+
+@router.post("/alerts/{alert_id}/dismiss")
+async def dismiss_alert(alert_id: str) -> dict:
+    async with db_connect() as db:
+        cursor = await db.execute("UPDATE crawler_alerts SET dismissed=TRUE WHERE id=?", (alert_id,))
+        await db.commit()
+    if cursor.rowcount == 0:
+        raise HTTPException(status_code=404, detail="Alert not found")
+    return {"id": alert_id, "dismissed": True}
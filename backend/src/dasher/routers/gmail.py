@@ -1,5 +1,5 @@
 import logging
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from dasher.config import settings
 from dasher.services import gmail_service
 
@@ -20,12 +20,17 @@ async def get_unread() -> dict:
 
 
 @router.get("/inbox")
-async def get_inbox() -> dict:
+async def get_inbox(
+    limit: int | None = Query(default=None, ge=1, le=100),
+    offset: int = Query(default=0, ge=0, le=gmail_service.MAX_INBOX_DEPTH - 100),
+) -> dict:
+    """Inbox messages newest first; ``limit`` defaults to GMAIL_INBOX_LIMIT."""
     if not settings.google_client_id or not settings.google_refresh_token:
         return {"configured": False, "messages": []}
+    limit = limit or settings.gmail_inbox_limit
     try:
-        messages = await gmail_service.get_inbox_messages(limit=5)
-        return {"configured": True, "messages": messages}
+        messages = await gmail_service.get_inbox_messages(limit=limit, offset=offset)
+        return {"configured": True, "messages": messages, "limit": limit, "offset": offset}
     except Exception as exc:
         logger.exception("Gmail inbox error")
         raise HTTPException(status_code=502, detail="Gmail API error") from exc
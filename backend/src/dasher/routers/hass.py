@@ -2,6 +2,7 @@ import logging
 
 import httpx
 from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel, Field
 
 from dasher.config import settings
 from dasher.http import log_response_error
@@ -11,17 +12,17 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/hass", tags=["home-assistant"])
 
 
+class StatesRequest(BaseModel):
+    entity_ids: list[str] = Field(max_length=500)
+
+
 @router.get("/state/{entity_id:path}")
 async def get_state(entity_id: str) -> dict:
     if not settings.hass_url or not settings.hass_token:
         return {"configured": False, "state": None, "attributes": {}}
     try:
         data = await hass_service.get_state(entity_id)
-        return {
-            "configured": True,
-            "state":      data.get("state"),
-            "attributes": data.get("attributes", {}),
-        }
+        return hass_service.state_payload(data)
     except httpx.HTTPStatusError as exc:
         if exc.response.status_code == 404:
             return {"configured": True, "state": None, "attributes": {},
@@ -30,3 +31,30 @@ async def get_state(entity_id: str) -> dict:
         raise HTTPException(status_code=502, detail="Home Assistant error") from exc
     except httpx.HTTPError as exc:
         raise HTTPException(status_code=502, detail=f"Home Assistant unreachable: {exc}") from exc
+
+
+@router.post("/states")
+async def get_states(body: StatesRequest) -> dict:
+    """Batch form of GET /state/{entity_id}: one response for many entities."""
+    if not settings.hass_url or not settings.hass_token:
+        return {
+            "configured": False,
+            "states": {
+                entity_id: {"configured": False, "state": None, "attributes": {}}
+                for entity_id in body.entity_ids
+            },
+        }
+    try:
+        found = await hass_service.get_states(body.entity_ids)
+    except httpx.HTTPStatusError as exc:
+        log_response_error(exc)
+        raise HTTPException(status_code=502, detail="Home Assistant error") from exc
+    except httpx.HTTPError as exc:
+        raise HTTPException(status_code=502, detail=f"Home Assistant unreachable: {exc}") from exc
+
+    states = {}
+    for entity_id, data in found.items():
+        states[entity_id] = hass_service.state_payload(data)
+        if data is None:
+            states[entity_id]["error"] = f"Entity '{entity_id}' not found"
+    return {"configured": True, "states": states}
@@ -1,11 +1,12 @@
-import json
 import uuid
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel, Field, field_validator
 
+from dasher import serialization
 from dasher.database import db_connect
 from dasher.routers.widgets import WIDGET_TYPES
+from dasher.services import layout_service
 
 router = APIRouter(prefix="/widgets", tags=["widgets"])
 
@@ -38,6 +39,12 @@ class WidgetPositionUpdate(BaseModel):
     name: str | None = None
 
 
+class WidgetBulkUpdate(WidgetPositionUpdate):
+    id: str
+    # Omitted → unchanged; explicit null clears the stored color
+    background_color: str | None = None
+
+
 class WidgetNameUpdate(BaseModel):
     name: str
 
@@ -49,29 +56,14 @@ class WidgetColorUpdate(BaseModel):
 # --- Endpoints ---
 
 @router.get("/instances")
-async def list_instances() -> dict:
-    async with db_connect() as db:
-        async with db.execute(
-            "SELECT id, widget_type, name, config, grid_x, grid_y, grid_w, grid_h, background_color"
-            " FROM widget_instances ORDER BY grid_y, grid_x"
-        ) as cursor:
-            rows = await cursor.fetchall()
-    return {
-        "widgets": [
-            {
-                "id": r["id"],
-                "widget_type": r["widget_type"],
-                "name": r["name"],
-                "config": json.loads(r["config"]),
-                "grid_x": r["grid_x"],
-                "grid_y": r["grid_y"],
-                "grid_w": r["grid_w"],
-                "grid_h": r["grid_h"],
-                "background_color": r["background_color"],
-            }
-            for r in rows
-        ]
-    }
+async def list_instances(request: Request) -> Response:
+    document = await layout_service.get_layout()
+    # no-cache: browsers may keep the body but must revalidate with If-None-Match
+    headers = {"ETag": document.etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match.strip() == "*" or document.etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=document.body, media_type="application/json", headers=headers)
 
 
 @router.post("/instances", status_code=201)
@@ -83,14 +75,47 @@ async def create_instance(body: WidgetConfig) -> dict:
             " (id, widget_type, name, config, grid_x, grid_y, grid_w, grid_h, background_color)"
             " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
             (
-                widget_id, body.widget_type, body.name, json.dumps(body.config),
+                widget_id, body.widget_type, body.name, serialization.dumps(body.config).decode(),
                 body.grid_x, body.grid_y, body.grid_w, body.grid_h, body.background_color,
             ),
         )
         await db.commit()
+    await layout_service.layout_changed()
     return {"id": widget_id}
 
 
+@router.patch("/instances")
+async def update_instances(body: list[WidgetBulkUpdate]) -> dict:
+    """Apply many position/name/color changes in one all-or-nothing transaction."""
+    if not body:
+        # Nothing changed, so no write and no layout invalidation
+        return {"ok": True, "results": []}
+    ids = [u.id for u in body]
+    async with db_connect() as db:
+        placeholders = ",".join("?" * len(ids))
+        async with db.execute(
+            f"SELECT id FROM widget_instances WHERE id IN ({placeholders})", ids
+        ) as cursor:
+            found = {r["id"] for r in await cursor.fetchall()}
+        if len(found) < len(set(ids)):
+            raise HTTPException(status_code=404, detail={
+                "message": "Widget not found",
+                "results": [{"id": i, "ok": i in found} for i in ids],
+            })
+
+        await db.executemany(
+            "UPDATE widget_instances SET grid_x=?, grid_y=?, grid_w=?, grid_h=?, name=COALESCE(?, name) WHERE id=?",
+            [(u.grid_x, u.grid_y, u.grid_w, u.grid_h, u.name, u.id) for u in body],
+        )
+        await db.executemany(
+            "UPDATE widget_instances SET background_color=? WHERE id=?",
+            [(u.background_color, u.id) for u in body if "background_color" in u.model_fields_set],
+        )
+        await db.commit()
+    await layout_service.layout_changed()
+    return {"ok": True, "results": [{"id": i, "ok": True} for i in ids]}
+
+
 @router.patch("/instances/{widget_id}")
 async def update_instance(widget_id: str, body: WidgetPositionUpdate) -> dict:
     async with db_connect() as db:
@@ -107,6 +132,7 @@ async def update_instance(widget_id: str, body: WidgetPositionUpdate) -> dict:
         await db.commit()
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Widget not found")
+    await layout_service.layout_changed()
     return {"ok": True}
 
 
@@ -120,6 +146,7 @@ async def update_instance_name(widget_id: str, body: WidgetNameUpdate) -> dict:
         await db.commit()
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Widget not found")
+    await layout_service.layout_changed()
     return {"ok": True}
 
 
@@ -133,11 +160,14 @@ async def update_instance_color(widget_id: str, body: WidgetColorUpdate) -> dict
         await db.commit()
         if result.rowcount == 0:
             raise HTTPException(status_code=404, detail="Widget not found")
+    await layout_service.layout_changed()
     return {"ok": True}
 
 
 @router.delete("/instances/{widget_id}", status_code=204)
 async def delete_instance(widget_id: str) -> None:
     async with db_connect() as db:
-        await db.execute("DELETE FROM widget_instances WHERE id=?", (widget_id,))
+        result = await db.execute("DELETE FROM widget_instances WHERE id=?", (widget_id,))
         await db.commit()
+    if result.rowcount:
+        await layout_service.layout_changed()
@@ -1,8 +1,80 @@
-from fastapi import APIRouter
+import uuid
+
+from fastapi import APIRouter, Query
+from pydantic import BaseModel, Field
+
+from dasher.database import db_connect
+from dasher.services import rss_service
 
 router = APIRouter(prefix="/rss", tags=["rss"])
 
 
+class FeedCreate(BaseModel):
+    url: str = Field(min_length=1)
+    label: str | None = None
+    refresh_interval_minutes: int = Field(default=15, ge=1)
+
+
 @router.get("/feeds")
 async def list_feeds() -> dict:
-    return {"feeds": []}
+    async with db_connect(readonly=True) as db:
+        async with db.execute(
+            "SELECT id, url, label, refresh_interval_minutes, last_fetched_at, last_error,"
+            " next_fetch_at, interval_seconds, error_count, hit_count, skip_count, backoff_count"
+            " FROM rss_feeds ORDER BY label, url"
+        ) as cursor:
+            rows = await cursor.fetchall()
+    return {
+        "feeds": [
+            {
+                "id": r["id"],
+                "url": r["url"],
+                "label": r["label"],
+                "refresh_interval_minutes": r["refresh_interval_minutes"],
+                "last_fetched_at": r["last_fetched_at"],
+                "last_error": r["last_error"],
+                # Adaptive scheduler state: learned interval plus outcome counters
+                "stats": {
+                    "next_fetch_at": r["next_fetch_at"],
+                    "interval_seconds": r["interval_seconds"],
+                    "consecutive_errors": r["error_count"],
+                    "hits": r["hit_count"],
+                    "skips": r["skip_count"],
+                    "backoffs": r["backoff_count"],
+                },
+            }
+            for r in rows
+        ]
+    }
+
+
+@router.post("/feeds", status_code=201)
+async def create_feed(body: FeedCreate) -> dict:
+    feed_id = str(uuid.uuid4())
+    async with db_connect() as db:
+        await db.execute(
+            "INSERT INTO rss_feeds (id, url, label, refresh_interval_minutes) VALUES (?, ?, ?, ?)",
+            (feed_id, body.url, body.label, body.refresh_interval_minutes),
+        )
+        await db.commit()
+    await rss_service.feed_added(feed_id)
+    return {"id": feed_id}
+
+
+@router.delete("/feeds/{feed_id}", status_code=204)
+async def delete_feed(feed_id: str) -> None:
+    async with db_connect() as db:
+        await db.execute("DELETE FROM rss_feeds WHERE id=?", (feed_id,))
+        await db.commit()
+    await rss_service.feed_removed(feed_id)
+
+
+@router.get("/items")
+async def list_items(
+    limit: int = Query(default=20, ge=1, le=200),
+    offset: int = Query(default=0, ge=0),
+    feed_id: str | None = None,
+) -> dict:
+    """Stored items, newest first. Never fetches upstream."""
+    items = await rss_service.list_items(limit=limit, offset=offset, feed_id=feed_id)
+    return {"items": items, "limit": limit, "offset": offset}
@@ -1,58 +1,49 @@
-from fastapi import APIRouter, HTTPException
+from collections.abc import Awaitable
+
+from fastapi import APIRouter, HTTPException, Query
 import httpx
 
-from ..config import settings
-from ..http import make_client, log_response_error
+from ..http import log_response_error
+from ..integrations import sabnzbd_configured
+from ..services import sabnzbd_service
 
 router = APIRouter(prefix="/sabnzbd", tags=["sabnzbd"])
 
 
-@router.get("/queue")
-async def get_queue() -> dict:
-    if not settings.sabnzbd_url or not settings.sabnzbd_api_key:
-        return {"configured": False, "slots": []}
-
-    url = f"{settings.sabnzbd_url.rstrip('/')}/api"
-    params = {
-        "mode": "queue",
-        "output": "json",
-        "apikey": settings.sabnzbd_api_key,
-        "start": 0,
-        "limit": 5,
-    }
-
+async def _call(result: Awaitable[dict]) -> dict:
     try:
-        async with make_client(timeout=5.0) as client:
-            resp = await client.get(url, params=params)
-            resp.raise_for_status()
-            data = resp.json()
+        return await result
     except httpx.HTTPStatusError as exc:
         log_response_error(exc)
         raise HTTPException(status_code=502, detail=f"SABnzbd error: {exc}") from exc
     except httpx.HTTPError as exc:
         raise HTTPException(status_code=502, detail=f"SABnzbd unreachable: {exc}") from exc
 
-    queue = data.get("queue", {})
-    slots = [
-        {
-            "id": s.get("nzo_id"),
-            "filename": s.get("filename"),
-            "status": s.get("status"),
-            "mb": s.get("mb"),
-            "mbleft": s.get("mbleft"),
-            "percentage": s.get("percentage"),
-            "timeleft": s.get("timeleft"),
-            "cat": s.get("cat"),
-        }
-        for s in queue.get("slots", [])
-    ]
-
-    return {
-        "configured": True,
-        "slots": slots,
-        "speed": queue.get("speed", ""),
-        "sizeleft": queue.get("sizeleft", ""),
-        "timeleft": queue.get("timeleft", ""),
-        "noofslots": queue.get("noofslots_total", 0),
-        "paused": queue.get("paused", False),
-    }
+
+@router.get("/queue")
+async def get_queue(
+    limit: int = Query(default=5, ge=1, le=500),
+    offset: int = Query(default=0, ge=0),
+) -> dict:
+    if not sabnzbd_configured():
+        return {"configured": False, "slots": []}
+    return await _call(sabnzbd_service.get_queue(limit=limit, offset=offset))
+
+
+@router.get("/history")
+async def get_history(
+    limit: int = Query(default=20, ge=1, le=sabnzbd_service.HISTORY_KEEP),
+    offset: int = Query(default=0, ge=0),
+) -> dict:
+    """Recently completed jobs, newest first."""
+    if not sabnzbd_configured():
+        return {"configured": False, "items": []}
+    return await _call(sabnzbd_service.get_history(limit=limit, offset=offset))
+
+
+@router.get("/series")
+async def get_series() -> dict:
+    """Download speed and ETA samples, oldest first, for sparklines."""
+    if not sabnzbd_configured():
+        return {"configured": False, "samples": []}
+    return await _call(sabnzbd_service.get_series())
@@ -1,7 +1,7 @@
-import json
-
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
+from dasher import serialization
+from dasher.services import scheduler
 from dasher.ws_manager import manager
 
 router = APIRouter()
@@ -14,14 +14,26 @@ async def websocket_endpoint(ws: WebSocket) -> None:
         while True:
             raw = await ws.receive_text()
             try:
-                msg = json.loads(raw)
-            except json.JSONDecodeError:
+                msg = serialization.loads(raw)
+            except serialization.JSONDecodeError:
+                continue
+            if not isinstance(msg, dict):
                 continue
 
             action = msg.get("action")
             if action == "subscribe":
                 channels = msg.get("channels", [])
                 manager.subscribe(ws, channels)
-                await ws.send_text(json.dumps({"action": "subscribed", "channels": channels}))
+                await manager.send(ws, {"action": "subscribed", "channels": channels})
+                # Latest data right away instead of waiting for the next poll
+                missing = [c for c in channels if not await manager.send_snapshot(ws, c)]
+                await scheduler.publish_now(missing, ws)
+            elif action == "resync":
+                # Client saw a gap in a channel's seq numbers and wants a full snapshot
+                for channel in msg.get("channels", []):
+                    await manager.send_snapshot(ws, channel)
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Also on unexpected errors, so the client's queue and writer task don't leak
         manager.disconnect(ws)
@@ -0,0 +1,79 @@
+"""JSON encoding for API responses, websocket frames and stored blobs.
+
+orjson is used when it is installed (``pip install dasher[fast]``), the
+stdlib ``json`` module otherwise. Both paths produce the same compact UTF-8
+bytes, so callers never branch on which one is active:
+
+* ``dumps`` / ``loads`` — bytes out, str or bytes in;
+* ``JSONResponse`` — a response rendered with ``dumps``; see
+  ``default_response_class`` for when the app uses it;
+* ``splice`` — appends an already-serialized JSON value to an encoded object,
+  for blobs that were validated when they were stored and so never need a
+  decode/re-encode round trip on the way out.
+"""
+import inspect
+import json
+from typing import Any
+
+import fastapi.responses
+import fastapi.routing
+from fastapi.datastructures import Default
+from starlette.responses import JSONResponse as _StarletteJSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised only without the extra
+    orjson = None
+
+if orjson is not None:
+    # Same behaviour as the stdlib for int/float dict keys
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=_OPTIONS)
+
+    loads = orjson.loads
+else:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+    loads = json.loads
+
+# orjson.JSONDecodeError subclasses this, so one except clause covers both
+JSONDecodeError = json.JSONDecodeError
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+
+def splice(encoded: bytes, key: str, raw: bytes) -> bytes:
+    """Add ``key: raw`` to the end of the JSON object *encoded*.
+
+    *raw* must already be valid JSON; it is copied in as-is.
+    """
+    if encoded == b"{}":
+        return b"{" + dumps(key) + b":" + raw + b"}"
+    return encoded[:-1] + b"," + dumps(key) + b":" + raw + b"}"
+
+
+class JSONResponse(_StarletteJSONResponse):
+    """JSON response rendered with ``dumps`` — orjson-backed when it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# Newer FastAPI serializes routes with a return annotation straight to bytes
+# through pydantic-core; naming any response class switches that path off.
+_NATIVE_JSON = "dump_json" in inspect.signature(fastapi.routing.serialize_response).parameters
+
+
+def default_response_class() -> Any:
+    """The app's ``default_response_class``: ``JSONResponse`` only where it is faster.
+
+    That is with orjson installed on a FastAPI without native JSON
+    serialization; otherwise FastAPI's own default (the placeholder, so the
+    native path stays enabled).
+    """
+    if orjson is None or _NATIVE_JSON:
+        return Default(fastapi.responses.JSONResponse)
+    return JSONResponse
@@ -1,2 +1,244 @@
-# Web crawler: httpx + BeautifulSoup4 content extraction
-# Will be implemented in Phase 4
+"""Web crawler: watch a region of a page and raise an alert when it changes.
+
+Each rule's URL is fetched conditionally (``ETag`` / ``Last-Modified``), with
+a global concurrency limit plus a per-host limit and minimum gap between hits
+to the same host. The ``selector`` region is extracted in a small thread pool
+— with selectolax when installed, otherwise BeautifulSoup on lxml or the
+stdlib parser — and its whitespace-normalized text is hashed. Only a hash
+that differs from the stored one creates an alert and runs the rule's LLM
+prompt, so CPU and LLM cost follow actual changes, not the number of rules.
+The first successful check just records a baseline.
+"""
+import asyncio
+import hashlib
+import importlib.util
+import logging
+import time
+import unicodedata
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+import httpx
+from bs4 import BeautifulSoup
+
+from dasher.config import settings
+from dasher.database import db_connect
+from dasher.http import get_client
+from dasher.services import llm_service
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:  # optional, much faster than BeautifulSoup
+    HTMLParser = None
+
+logger = logging.getLogger(__name__)
+
+_BS4_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+_STRIP_TAGS = ("script", "style", "noscript", "template")
+# Longest extracted text kept in an alert and sent to the LLM
+_SNAPSHOT_CHARS = 20_000
+
+_extract_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="crawler-extract")
+
+_RULE_COLUMNS = "id, url, selector, llm_prompt, check_interval_minutes, etag, last_modified, content_hash"
+
+
+# ── Extraction ─────────────────────────────────────────────────────────────────
+
+def normalize(text: str) -> str:
+    """Canonical form for hashing: NFKC, whitespace runs collapsed to one space."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def extract(html: bytes, selector: str | None) -> str:
+    """Normalized visible text of the elements matching *selector* (whole body if None).
+
+    Runs in the extract pool. Raises ValueError for a selector that is invalid
+    or matches nothing.
+    """
+    if HTMLParser is not None:
+        tree = HTMLParser(html)
+        for node in tree.css(", ".join(_STRIP_TAGS)):
+            node.decompose()
+        root = tree.body or tree.root
+        try:
+            nodes = tree.css(selector) if selector else [root]
+        except Exception as exc:  # selectolax reports bad selectors with its own errors
+            raise ValueError(f"invalid selector {selector!r}: {exc}") from exc
+        texts = [node.text(separator=" ") for node in nodes if node is not None]
+    else:
+        soup = BeautifulSoup(html, _BS4_PARSER)
+        for node in soup(_STRIP_TAGS):
+            node.decompose()
+        try:
+            nodes = soup.select(selector) if selector else [soup.body or soup]
+        except Exception as exc:  # soupsieve.SelectorSyntaxError
+            raise ValueError(f"invalid selector {selector!r}: {exc}") from exc
+        texts = [node.get_text(" ") for node in nodes]
+    if not texts:
+        raise ValueError(f"selector {selector!r} matched nothing")
+    return normalize(" ".join(texts))
+
+
+def validate_selector(selector: str) -> None:
+    """Raise ValueError if *selector* is not valid CSS for the active parser."""
+    try:
+        if HTMLParser is not None:
+            HTMLParser("<html></html>").css(selector)
+        else:
+            BeautifulSoup("", _BS4_PARSER).select(selector)
+    except Exception as exc:
+        raise ValueError(f"invalid selector {selector!r}: {exc}") from exc
+
+
+# ── Politeness ─────────────────────────────────────────────────────────────────
+
+# host → monotonic time before which the next request to it must not start
+_host_next_at: dict[str, float] = {}
+
+
+class _HostGates:
+    """Per-host concurrency limit and request spacing for one crawl pass."""
+
+    def __init__(self) -> None:
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        host = urlsplit(url).netloc.lower()
+        semaphore = self._semaphores.setdefault(
+            host, asyncio.Semaphore(settings.crawler_per_host_concurrency)
+        )
+        async with semaphore:
+            wait = _host_next_at.get(host, 0.0) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            _host_next_at[host] = time.monotonic() + settings.crawler_host_delay
+            yield
+
+
+# ── Checking ───────────────────────────────────────────────────────────────────
+
+async def _analyze(rule: dict, text: str, digest: str) -> str | None:
+    if not rule["llm_prompt"] or not llm_service.is_configured():
+        return None
+    try:
+        return await llm_service.generate(
+            rule["llm_prompt"], text, content_hash=digest, priority=llm_service.PRIORITY_BACKGROUND
+        )
+    except (httpx.HTTPError, llm_service.LLMError, TimeoutError, ValueError) as exc:
+        # The alert is stored without analysis rather than retried on every check
+        logger.warning("LLM analysis failed for crawler rule %s: %s", rule["id"], exc)
+        return None
+
+
+async def _record(rule_id: str, **fields) -> None:
+    assignments = ", ".join(f"{name}=?" for name in fields)
+    async with db_connect() as db:
+        await db.execute(
+            f"UPDATE crawler_rules SET {assignments} WHERE id=?", (*fields.values(), rule_id)
+        )
+        await db.commit()
+
+
+async def check_rule(rule: dict, gates: _HostGates | None = None) -> bool:
+    """Fetch and fingerprint one rule; return True if its content changed."""
+    gates = gates or _HostGates()
+    headers = {}
+    if rule["etag"]:
+        headers["If-None-Match"] = rule["etag"]
+    if rule["last_modified"]:
+        headers["If-Modified-Since"] = rule["last_modified"]
+
+    now = time.time()
+    try:
+        async with gates.slot(rule["url"]):
+            resp = await get_client("crawler").get(rule["url"], headers=headers, follow_redirects=True)
+        # 304 is the unchanged answer to our conditional GET, not an error
+        if resp.status_code != 304:
+            resp.raise_for_status()
+    except httpx.HTTPError as exc:
+        logger.warning("Crawler fetch failed for %s: %s", rule["url"], exc)
+        await _record(rule["id"], last_checked_at=now, last_error=str(exc) or type(exc).__name__)
+        return False
+    if resp.status_code == 304:
+        await _record(rule["id"], last_checked_at=now, last_error=None)
+        return False
+
+    loop = asyncio.get_running_loop()
+    try:
+        text = await loop.run_in_executor(_extract_pool, extract, resp.content, rule["selector"])
+    except ValueError as exc:
+        await _record(rule["id"], last_checked_at=now, last_error=str(exc))
+        return False
+
+    validators = {
+        "etag": resp.headers.get("etag"),
+        "last_modified": resp.headers.get("last-modified"),
+    }
+    digest = content_hash(text)
+    if digest == rule["content_hash"]:
+        await _record(rule["id"], last_checked_at=now, last_error=None, **validators)
+        return False
+    if rule["content_hash"] is None:
+        # First look at this page: remember it, nothing to compare against yet
+        await _record(
+            rule["id"], last_checked_at=now, last_error=None, content_hash=digest,
+            last_changed_at=now, **validators,
+        )
+        return False
+
+    snapshot = text[:_SNAPSHOT_CHARS]
+    analysis = await _analyze(rule, snapshot, digest)
+    async with db_connect() as db:
+        await db.execute(
+            "INSERT INTO crawler_alerts (id, rule_id, content_snapshot, llm_analysis) VALUES (?, ?, ?, ?)",
+            (str(uuid.uuid4()), rule["id"], snapshot, analysis),
+        )
+        await db.execute(
+            "UPDATE crawler_rules SET last_checked_at=?, last_changed_at=?, last_error=NULL,"
+            " content_hash=?, etag=?, last_modified=? WHERE id=?",
+            (now, now, digest, validators["etag"], validators["last_modified"], rule["id"]),
+        )
+        await db.commit()
+    logger.info("Crawler rule %s changed (%s)", rule["id"], rule["url"])
+    return True
+
+
+async def due_rules(now: float | None = None) -> list[dict]:
+    now = time.time() if now is None else now
+    async with db_connect(readonly=True) as db:
+        async with db.execute(
+            f"SELECT {_RULE_COLUMNS} FROM crawler_rules"
+            " WHERE last_checked_at IS NULL"
+            " OR last_checked_at + COALESCE(check_interval_minutes, 60) * 60 <= ?",
+            (now,),
+        ) as cursor:
+            return [dict(r) for r in await cursor.fetchall()]
+
+
+async def check_due_rules() -> int:
+    """Check every due rule, at most ``crawler_fetch_concurrency`` at a time."""
+    rules = await due_rules()
+    if not rules:
+        return 0
+    semaphore = asyncio.Semaphore(settings.crawler_fetch_concurrency)
+    gates = _HostGates()
+
+    async def bounded(rule: dict) -> bool:
+        async with semaphore:
+            try:
+                return await check_rule(rule, gates)
+            except Exception:
+                logger.exception("Crawler check of %s failed", rule["url"])
+                return False
+
+    changed = sum(await asyncio.gather(*(bounded(r) for r in rules)))
+    logger.info("Crawler: %d rules checked, %d changed", len(rules), changed)
+    return changed
@@ -1,18 +1,58 @@
+"""Gmail inbox and unread count, kept current by incremental history sync.
+
+``InboxSync`` does one full sync (profile, inbox list, metadata for the
+newest ``window`` messages, INBOX label counts) and remembers the mailbox
+``historyId``. Every later refresh asks ``users.history.list`` for changes
+since then: on a quiet inbox that single call is the whole refresh. Changes
+are applied to the local metadata cache, fetching metadata only for messages
+that newly entered the inbox and the label count only when unread/inbox
+membership moved. An expired ``historyId`` (404) falls back to a full sync.
+
+Message metadata is fetched through Gmail's multipart batch endpoint, up to
+100 messages per round trip, and the multipart response is parsed part by
+part as it streams in. Pages beyond the cached window are listed and batch-
+fetched on demand.
+
+Refreshes go through a ``ResponseCache``, so concurrent readers share one
+sync and a failing Gmail serves the last known state for a while.
+"""
 import asyncio
+import json
+import re
 import time
 import logging
-import httpx
+import uuid
+from urllib.parse import urlencode
+
+from dasher.backplane import get_backplane
+from dasher.cache import ResponseCache
 from dasher.config import settings
+from dasher.http import get_client
 
 logger = logging.getLogger(__name__)
 
 _TOKEN_URL    = "https://oauth2.googleapis.com/token"
-_LABELS_URL   = "https://gmail.googleapis.com/gmail/v1/users/me/labels/INBOX"
-_MESSAGES_URL = "https://gmail.googleapis.com/gmail/v1/users/me/messages"
+_API_URL      = "https://gmail.googleapis.com/gmail/v1/users/me"
+_PROFILE_URL  = f"{_API_URL}/profile"
+_LABELS_URL   = f"{_API_URL}/labels/INBOX"
+_MESSAGES_URL = f"{_API_URL}/messages"
+_HISTORY_URL  = f"{_API_URL}/history"
+_BATCH_URL    = "https://gmail.googleapis.com/batch/gmail/v1"
+
+# Gmail allows up to 100 calls per batch request
+_BATCH_MAX = 100
+# Deepest message reachable through get_inbox_messages(offset + limit)
+MAX_INBOX_DEPTH = 500
+_METADATA_QUERY = urlencode(
+    [("format", "metadata")] + [("metadataHeaders", h) for h in ("Subject", "From", "Date")]
+)
 
+_HISTORY_TYPES = ["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"]
 _access_token: str | None = None
 _token_expires_at: float  = 0.0
 _refresh_lock = asyncio.Lock()
+# Shared with the other workers, with a wall-clock expiry
+_TOKEN_KEY = "gmail:access_token"
 
 
 async def _get_access_token() -> str:
@@ -20,69 +60,324 @@ async def _get_access_token() -> str:
     async with _refresh_lock:
         if _access_token and time.monotonic() < _token_expires_at:
             return _access_token
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            r = await client.post(_TOKEN_URL, data={
-                "client_id":     settings.google_client_id,
-                "client_secret": settings.google_client_secret,
-                "refresh_token": settings.google_refresh_token,
-                "grant_type":    "refresh_token",
-            })
-            r.raise_for_status()
-            data = r.json()
+        shared = await get_backplane().get_state(_TOKEN_KEY)
+        if shared:
+            _access_token     = shared["token"]
+            _token_expires_at = time.monotonic() + shared["expires_at"] - time.time()
+            return _access_token
+        r = await get_client("google").post(_TOKEN_URL, data={
+            "client_id":     settings.google_client_id,
+            "client_secret": settings.google_client_secret,
+            "refresh_token": settings.google_refresh_token,
+            "grant_type":    "refresh_token",
+        })
+        r.raise_for_status()
+        data = r.json()
+        lifetime = data.get("expires_in", 3600) - 60
         _access_token     = data["access_token"]
-        _token_expires_at = time.monotonic() + data.get("expires_in", 3600) - 60
+        _token_expires_at = time.monotonic() + lifetime
+        await get_backplane().set_state(
+            _TOKEN_KEY, {"token": _access_token, "expires_at": time.time() + lifetime}, ttl=lifetime,
+        )
         return _access_token
 
 
-async def get_unread_count() -> int:
-    token = await _get_access_token()
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.get(_LABELS_URL,
-                             headers={"Authorization": f"Bearer {token}"})
+def _summary(msg: dict) -> dict:
+    header_map = {
+        h["name"]: h["value"]
+        for h in msg.get("payload", {}).get("headers", [])
+    }
+    return {
+        "id":      msg["id"],
+        "subject": header_map.get("Subject", "(no subject)"),
+        "from":    header_map.get("From", ""),
+        "date":    header_map.get("Date", ""),
+        "unread":  "UNREAD" in msg.get("labelIds", []),
+    }
+
+
+class GmailBatchError(Exception):
+    """A part of a batch request failed with something other than 404."""
+
+
+# ── Batch requests ─────────────────────────────────────────────────────────────
+
+class _MultipartReader:
+    """Incremental splitter for a ``multipart/mixed`` body.
+
+    ``feed()`` returns the parts completed by each chunk, so they can be
+    handled while the rest of the response is still arriving.
+    """
+
+    def __init__(self, boundary: str) -> None:
+        self._delimiter = b"--" + boundary.encode()
+        self._buffer = bytearray()
+        self._in_part = False
+        self.done = False
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        self._buffer += chunk
+        parts = []
+        while not self.done:
+            start = self._buffer.find(self._delimiter)
+            if start < 0:
+                break
+            line_end = self._buffer.find(b"\n", start + len(self._delimiter))
+            if line_end < 0:
+                break  # need the rest of the delimiter line
+            if self._in_part:
+                parts.append(bytes(self._buffer[:start]).removesuffix(b"\n").removesuffix(b"\r"))
+            self.done = self._buffer[start + len(self._delimiter):].startswith(b"--")
+            self._in_part = True
+            del self._buffer[:line_end + 1]
+        return parts
+
+
+_BLANK_LINE = re.compile(rb"\r?\n\r?\n")
+
+
+def _parse_part(raw: bytes) -> tuple[str, int, bytes]:
+    """Split one batch part into (Content-ID, HTTP status, body)."""
+    outer, _, inner = _split_head(raw)
+    status_line, _, body = _split_head(inner)
+    content_id = ""
+    for line in outer.decode("latin-1").splitlines():
+        name, _, value = line.partition(":")
+        if name.strip().lower() == "content-id":
+            content_id = value.strip().strip("<>")
+    status = int(status_line.split(None, 2)[1])
+    return content_id, status, body
+
+
+def _split_head(data: bytes) -> tuple[bytes, bytes, bytes]:
+    """Split headers from body at the first blank line."""
+    match = _BLANK_LINE.search(data)
+    if match is None:
+        return data, b"", b""
+    return data[:match.start()], match.group(), data[match.end():]
+
+
+async def _batch_get_metadata(auth: dict, ids: list[str]) -> list[dict]:
+    """Metadata for *ids* via batch requests; messages that no longer exist are left out."""
+    chunks = [ids[i:i + _BATCH_MAX] for i in range(0, len(ids), _BATCH_MAX)]
+    results = await asyncio.gather(*[_batch_chunk(auth, chunk) for chunk in chunks])
+    return [msg for chunk in results for msg in chunk]
+
+
+async def _batch_chunk(auth: dict, ids: list[str]) -> list[dict]:
+    boundary = f"batch_{uuid.uuid4().hex}"
+    body = b"".join(
+        (
+            f"--{boundary}\r\n"
+            "Content-Type: application/http\r\n"
+            f"Content-ID: <item-{n}>\r\n\r\n"
+            f"GET /gmail/v1/users/me/messages/{msg_id}?{_METADATA_QUERY}\r\n\r\n"
+        ).encode()
+        for n, msg_id in enumerate(ids)
+    ) + f"--{boundary}--\r\n".encode()
+
+    found: dict[int, dict] = {}
+    async with get_client("google").stream(
+        "POST", _BATCH_URL, content=body,
+        headers={**auth, "Content-Type": f"multipart/mixed; boundary={boundary}"},
+    ) as resp:
+        if resp.is_error:
+            await resp.aread()
+            resp.raise_for_status()
+        match = re.search(r'boundary="?([^";]+)"?', resp.headers.get("content-type", ""))
+        if match is None:
+            raise GmailBatchError("batch response is not multipart")
+        reader = _MultipartReader(match.group(1))
+        async for chunk in resp.aiter_bytes():
+            for raw in reader.feed(chunk):
+                content_id, status, part_body = _parse_part(raw)
+                index = int(content_id.rsplit("-", 1)[-1])
+                if status == 404:
+                    continue  # deleted since it was listed
+                if status >= 400:
+                    raise GmailBatchError(f"batch part for {ids[index]} failed with HTTP {status}")
+                found[index] = json.loads(part_body)
+    return [found[n] for n in sorted(found)]
+
+
+async def _list_inbox(auth: dict, count: int) -> list[str]:
+    """Ids of the newest *count* inbox messages, following pagination."""
+    client = get_client("google")
+    ids: list[str] = []
+    params: dict = {"labelIds": "INBOX", "maxResults": count}
+    while len(ids) < count:
+        r = await client.get(_MESSAGES_URL, headers=auth, params=params)
         r.raise_for_status()
-    return r.json().get("messagesUnread", 0)
+        data = r.json()
+        ids.extend(m["id"] for m in data.get("messages", []))
+        if not data.get("nextPageToken"):
+            break
+        params = {**params, "maxResults": count - len(ids), "pageToken": data["nextPageToken"]}
+    return ids[:count]
 
 
-async def get_inbox_messages(limit: int = 5) -> list[dict]:
-    token = await _get_access_token()
-    auth = {"Authorization": f"Bearer {token}"}
+class _HistoryExpired(Exception):
+    """The stored historyId is too old for users.history.list."""
 
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        # Fetch the list of message IDs from inbox
-        r = await client.get(
-            _MESSAGES_URL,
-            headers=auth,
-            params={"labelIds": "INBOX", "maxResults": limit},
-        )
+
+class InboxSync:
+    def __init__(self, window: int | None = None) -> None:
+        self.window = window or settings.gmail_inbox_window
+        self.history_id: str | None = None
+        self.unread = 0
+        self.full_syncs = 0
+        self.incremental_syncs = 0
+        # message id → summary, and id → internalDate (ms) for ordering
+        self._messages: dict[str, dict] = {}
+        self._dates: dict[str, int] = {}
+
+    def snapshot(self) -> dict:
+        ids = sorted(self._messages, key=lambda i: self._dates[i], reverse=True)
+        return {"unread": self.unread, "messages": [self._messages[i] for i in ids]}
+
+    async def refresh(self) -> dict:
+        token = await _get_access_token()
+        auth = {"Authorization": f"Bearer {token}"}
+        if self.history_id is None:
+            await self._full_sync(auth)
+        else:
+            try:
+                await self._apply_history(auth)
+            except _HistoryExpired:
+                logger.info("Gmail historyId %s expired; doing a full sync", self.history_id)
+                await self._full_sync(auth)
+        return self.snapshot()
+
+    # ── Full sync ──────────────────────────────────────────────────────────────
+
+    async def _full_sync(self, auth: dict) -> None:
+        client = get_client("google")
+        # Take the historyId first so nothing that lands during the sync is missed
+        r = await client.get(_PROFILE_URL, headers=auth)
         r.raise_for_status()
-        ids = [m["id"] for m in r.json().get("messages", [])]
-
-        # Fetch metadata for each message in parallel
-        async def fetch_meta(msg_id: str) -> dict:
-            resp = await client.get(
-                f"{_MESSAGES_URL}/{msg_id}",
-                headers=auth,
-                params={
-                    "format": "metadata",
-                    "metadataHeaders": ["Subject", "From", "Date"],
-                },
-            )
-            resp.raise_for_status()
-            return resp.json()
-
-        metas = await asyncio.gather(*[fetch_meta(i) for i in ids])
-
-    result = []
-    for msg in metas:
-        header_map = {
-            h["name"]: h["value"]
-            for h in msg.get("payload", {}).get("headers", [])
-        }
-        result.append({
-            "id":      msg["id"],
-            "subject": header_map.get("Subject", "(no subject)"),
-            "from":    header_map.get("From", ""),
-            "date":    header_map.get("Date", ""),
-            "unread":  "UNREAD" in msg.get("labelIds", []),
-        })
-    return result
+        history_id = r.json()["historyId"]
+
+        self._messages.clear()
+        self._dates.clear()
+        await asyncio.gather(self._fill(auth), self._fetch_unread(auth))
+        self.history_id = history_id
+        self.full_syncs += 1
+
+    async def _fill(self, auth: dict) -> None:
+        """List the newest inbox messages and fetch metadata for any not cached."""
+        ids = await _list_inbox(auth, self.window)
+        await self._fetch_metadata(auth, [i for i in ids if i not in self._messages])
+
+    async def _fetch_unread(self, auth: dict) -> None:
+        r = await get_client("google").get(_LABELS_URL, headers=auth)
+        r.raise_for_status()
+        self.unread = r.json().get("messagesUnread", 0)
+
+    async def _fetch_metadata(self, auth: dict, ids: list[str]) -> None:
+        for msg in await _batch_get_metadata(auth, ids):
+            if "INBOX" in msg.get("labelIds", []):
+                self._messages[msg["id"]] = _summary(msg)
+                self._dates[msg["id"]] = int(msg.get("internalDate", 0))
+
+    async def fetch_page(self, offset: int, limit: int) -> list[dict]:
+        """Inbox messages ``offset`` to ``offset + limit``, reusing cached metadata."""
+        token = await _get_access_token()
+        auth = {"Authorization": f"Bearer {token}"}
+        ids = (await _list_inbox(auth, offset + limit))[offset:]
+        missing = [i for i in ids if i not in self._messages]
+        fetched = {msg["id"]: _summary(msg) for msg in await _batch_get_metadata(auth, missing)}
+        return [self._messages.get(i) or fetched[i] for i in ids if i in self._messages or i in fetched]
+
+    # ── Incremental sync ───────────────────────────────────────────────────────
+
+    async def _history(self, auth: dict) -> tuple[list[dict], str]:
+        client = get_client("google")
+        records: list[dict] = []
+        latest = self.history_id
+        params: dict = {"startHistoryId": self.history_id, "historyTypes": _HISTORY_TYPES}
+        while True:
+            r = await client.get(_HISTORY_URL, headers=auth, params=params)
+            if r.status_code == 404:
+                raise _HistoryExpired
+            r.raise_for_status()
+            data = r.json()
+            records.extend(data.get("history", []))
+            latest = data.get("historyId", latest)
+            if not data.get("nextPageToken"):
+                return records, latest
+            params = {**params, "pageToken": data["nextPageToken"]}
+
+    def _drop(self, msg_id: str) -> bool:
+        self._dates.pop(msg_id, None)
+        return self._messages.pop(msg_id, None) is not None
+
+    async def _apply_history(self, auth: dict) -> None:
+        records, latest = await self._history(auth)
+        to_fetch: set[str] = set()
+        count_changed = False
+        lost = False  # a cached message left the inbox; the window may need refilling
+
+        for record in records:
+            for entry in record.get("messagesAdded", []):
+                msg = entry["message"]
+                labels = msg.get("labelIds", [])
+                if "INBOX" in labels:
+                    to_fetch.add(msg["id"])
+                    count_changed |= "UNREAD" in labels
+            for entry in record.get("messagesDeleted", []):
+                msg_id = entry["message"]["id"]
+                to_fetch.discard(msg_id)
+                lost |= self._drop(msg_id)
+                count_changed = True
+            for kind in ("labelsAdded", "labelsRemoved"):
+                for entry in record.get(kind, []):
+                    msg = entry["message"]
+                    labels = msg.get("labelIds", [])
+                    count_changed |= bool({"INBOX", "UNREAD"} & set(entry.get("labelIds", [])))
+                    if "INBOX" not in labels:
+                        to_fetch.discard(msg["id"])
+                        lost |= self._drop(msg["id"])
+                    elif msg["id"] in self._messages:
+                        self._messages[msg["id"]]["unread"] = "UNREAD" in labels
+                    else:
+                        to_fetch.add(msg["id"])
+
+        jobs = []
+        if to_fetch:
+            jobs.append(self._fetch_metadata(auth, sorted(to_fetch)))
+        if count_changed:
+            jobs.append(self._fetch_unread(auth))
+        await asyncio.gather(*jobs)
+        if lost and len(self._messages) < self.window:
+            await self._fill(auth)
+        self._trim()
+        self.history_id = latest
+        self.incremental_syncs += 1
+
+    def _trim(self) -> None:
+        ids = sorted(self._messages, key=lambda i: self._dates[i], reverse=True)
+        for msg_id in ids[self.window:]:
+            self._drop(msg_id)
+
+
+_sync = InboxSync()
+_sync_cache = ResponseCache("gmail.sync", ttl=settings.gmail_cache_ttl, stale_ttl=settings.gmail_cache_ttl)
+
+
+async def _state() -> dict:
+    return await _sync_cache.get("inbox", _sync.refresh)
+
+
+async def get_unread_count() -> int:
+    return (await _state())["unread"]
+
+
+async def get_inbox_messages(limit: int | None = None, offset: int = 0) -> list[dict]:
+    """A page of inbox messages, newest first; pages inside the cached window cost nothing."""
+    limit = limit or settings.gmail_inbox_limit
+    if offset + limit > MAX_INBOX_DEPTH:
+        raise ValueError(f"offset + limit must not exceed {MAX_INBOX_DEPTH}")
+    state = await _state()
+    if offset + limit <= _sync.window:
+        return state["messages"][offset:offset + limit]
+    return await _sync.fetch_page(offset, limit)
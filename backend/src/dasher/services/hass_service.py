@@ -1,14 +1,152 @@
-import httpx
+import asyncio
+import json
+import logging
+
+from websockets.asyncio.client import connect
+
 from dasher.config import settings
+from dasher.http import get_client
+from dasher.leader import election
+from dasher.ws_manager import manager
+
+logger = logging.getLogger(__name__)
+
+_RECONNECT_MIN = 1.0
+_RECONNECT_MAX = 60.0
 
 
 def _headers() -> dict:
     return {"Authorization": f"Bearer {settings.hass_token}"}
 
 
+def _ws_url() -> str:
+    base = settings.hass_url.rstrip("/")
+    if base.startswith("https://"):
+        base = "wss://" + base[len("https://"):]
+    elif base.startswith("http://"):
+        base = "ws://" + base[len("http://"):]
+    return f"{base}/api/websocket"
+
+
+def state_payload(state: dict | None) -> dict:
+    """Shape an HA state object the way the /hass router returns it."""
+    if state is None:
+        return {"configured": True, "state": None, "attributes": {}}
+    return {
+        "configured": True,
+        "state":      state.get("state"),
+        "attributes": state.get("attributes", {}),
+    }
+
+
+class HassStateCache:
+    """Entity-state map kept current by Home Assistant's websocket event stream.
+
+    One authenticated connection loads every state with ``get_states`` and then
+    applies ``state_changed`` events. While that connection is up the map is
+    authoritative; on cold start or disconnect ``get_state`` falls back to REST.
+    Each change is published on the ``hass:<entity_id>`` channel.
+    """
+
+    def __init__(self) -> None:
+        self.states: dict[str, dict] = {}
+        self.synced = False
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="hass-state-cache")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.synced = False
+
+    async def _run(self) -> None:
+        delay = _RECONNECT_MIN
+        while True:
+            try:
+                await self._session()
+                delay = _RECONNECT_MIN
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("Home Assistant websocket error: %s — retrying in %.0fs", exc, delay)
+            finally:
+                self.synced = False
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _RECONNECT_MAX)
+
+    async def _session(self) -> None:
+        async with connect(_ws_url(), max_size=None) as ws:
+            msg = json.loads(await ws.recv())
+            if msg.get("type") != "auth_required":
+                raise RuntimeError(f"unexpected handshake message {msg.get('type')!r}")
+            await ws.send(json.dumps({"type": "auth", "access_token": settings.hass_token}))
+            msg = json.loads(await ws.recv())
+            if msg.get("type") != "auth_ok":
+                raise RuntimeError(f"authentication failed: {msg.get('message', msg.get('type'))}")
+
+            # Subscribe before loading states so no change falls between the two
+            await ws.send(json.dumps({"id": 1, "type": "subscribe_events", "event_type": "state_changed"}))
+            await ws.send(json.dumps({"id": 2, "type": "get_states"}))
+
+            async for raw in ws:
+                msg = json.loads(raw)
+                if msg.get("type") == "event":
+                    await self._apply_event(msg["event"].get("data", {}))
+                elif msg.get("type") == "result":
+                    if not msg.get("success"):
+                        raise RuntimeError(f"command {msg.get('id')} failed: {msg.get('error')}")
+                    if msg.get("id") == 2:
+                        self.states = {s["entity_id"]: s for s in msg.get("result") or []}
+                        self.synced = True
+                        logger.info("Home Assistant state cache loaded %d entities", len(self.states))
+
+    async def _apply_event(self, data: dict) -> None:
+        entity_id = data.get("entity_id")
+        if not entity_id:
+            return
+        new_state = data.get("new_state")
+        if new_state is None:
+            self.states.pop(entity_id, None)
+        else:
+            self.states[entity_id] = new_state
+        # Every worker keeps its cache current; one pushes the change to all sockets
+        if election.is_leader:
+            await manager.publish(f"hass:{entity_id}", state_payload(new_state))
+
+
+state_cache = HassStateCache()
+
+
 async def get_state(entity_id: str) -> dict:
+    if state_cache.synced:
+        state = state_cache.states.get(entity_id)
+        if state is not None:
+            return state
     url = f"{settings.hass_url.rstrip('/')}/api/states/{entity_id}"
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        r = await client.get(url, headers=_headers())
+    r = await get_client("hass").get(url, headers=_headers())
+    r.raise_for_status()
+    return r.json()
+
+
+async def get_states(entity_ids: list[str]) -> dict[str, dict | None]:
+    """Return the state of each requested entity, or None for unknown entities.
+
+    Served from the state cache when it is synced; otherwise a single bulk
+    ``/api/states`` fetch is filtered down to the requested IDs.
+    """
+    if state_cache.synced:
+        states = state_cache.states
+    else:
+        url = f"{settings.hass_url.rstrip('/')}/api/states"
+        r = await get_client("hass").get(url, headers=_headers())
         r.raise_for_status()
-        return r.json()
+        states = {s["entity_id"]: s for s in r.json()}
+    return {entity_id: states.get(entity_id) for entity_id in entity_ids}
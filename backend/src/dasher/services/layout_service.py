@@ -0,0 +1,107 @@
+"""Materialized widget layout, rebuilt only when the layout version changes.
+
+Every write to ``widget_instances`` calls ``layout_changed()``, which bumps
+the version, drops the cached document and publishes the new layout on the
+``layout`` websocket channel. Reads in between are served from memory with a
+pre-serialized body and an ETag derived from the version. Other workers get
+a ``layout`` backplane signal and drop their cached document too.
+
+Widget configs are stored as compact JSON written by ``create_instance`` and
+checked with ``json_valid`` in the query, so the body is assembled from the
+stored text directly; the configs are only parsed when the layout has to be
+published as a Python payload.
+"""
+import uuid
+from dataclasses import dataclass
+from functools import cached_property
+
+from dasher import serialization
+from dasher.database import db_connect, db_path
+from dasher.ws_manager import manager
+
+CHANNEL = "layout"
+
+# Distinguishes ETags across restarts, since the version counter starts over
+_BOOT_ID = uuid.uuid4().hex[:8]
+
+
+@dataclass(frozen=True)
+class LayoutDocument:
+    version: int
+    path: str  # database file it was built from
+    body: bytes  # JSON for GET /widgets/instances
+    etag: str
+
+    @cached_property
+    def widgets(self) -> list[dict]:
+        return serialization.loads(self.body)["widgets"]
+
+
+_version = 1
+_document: LayoutDocument | None = None
+
+
+_FIELDS = ("id", "widget_type", "name", "grid_x", "grid_y", "grid_w", "grid_h", "background_color")
+
+
+async def _load_body() -> bytes:
+    async with db_connect(readonly=True) as db:
+        async with db.execute(
+            "SELECT id, widget_type, name, grid_x, grid_y, grid_w, grid_h, background_color,"
+            " CASE WHEN json_valid(config) THEN config ELSE '{}' END AS config"
+            " FROM widget_instances ORDER BY grid_y, grid_x"
+        ) as cursor:
+            rows = await cursor.fetchall()
+    widgets = [
+        serialization.splice(serialization.dumps({f: r[f] for f in _FIELDS}), "config", r["config"].encode())
+        for r in rows
+    ]
+    return b'{"widgets":[' + b",".join(widgets) + b"]}"
+
+
+async def get_layout() -> LayoutDocument:
+    """Return the current layout document, querying SQLite only after a change."""
+    global _document
+    document = _document
+    path = db_path()
+    if document is not None and document.version == _version and document.path == path:
+        return document
+    version = _version
+    document = LayoutDocument(
+        version=version,
+        path=path,
+        body=await _load_body(),
+        etag=f'"{_BOOT_ID}-{version}"',
+    )
+    # A write may have landed while we were reading; don't cache a stale build
+    if version == _version:
+        _document = document
+    return document
+
+
+def invalidate() -> None:
+    global _version, _document
+    _version += 1
+    _document = None
+
+
+async def publish() -> None:
+    """Push the current layout to ``layout`` subscribers, if there are any."""
+    if manager.is_active(CHANNEL):
+        document = await get_layout()
+        await manager.publish(CHANNEL, layout_payload(document))
+
+
+def layout_payload(document: LayoutDocument) -> dict:
+    return {"version": document.version, "widgets": document.widgets}
+
+
+async def layout_changed() -> None:
+    """Call after committing any change to widget_instances."""
+    invalidate()
+    await manager.backplane.signal(CHANNEL)
+    await publish()
+
+
+# The worker that made the change publishes it; the others only rebuild on their next read
+manager.backplane.on_signal(CHANNEL, invalidate)
@@ -1,2 +1,263 @@
-# Ollama client: httpx async calls to /api/generate
-# Will be implemented in Phase 4
+"""Ollama client: streamed ``/api/generate`` behind a priority gate and a persistent cache.
+
+Local generation is by far the slowest thing the backend does, so:
+
+* at most ``ollama_concurrency`` generations run at once; waiters are served
+  by priority (lower first), FIFO within a priority;
+* results are stored in ``llm_cache`` keyed by (model, prompt, content hash),
+  so re-analysing unchanged content never reaches Ollama;
+* responses are streamed, which keeps the read timeout per token rather than
+  per response, and an overall ``ollama_timeout`` cancels the request —
+  closing the stream makes Ollama stop generating;
+* ``keep_alive`` keeps the model loaded between calls.
+
+``stats()`` reports queue wait and generation time.
+"""
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from dasher import metrics
+from dasher.config import settings
+from dasher.database import db_connect
+from dasher.http import get_client
+
+logger = logging.getLogger(__name__)
+
+# Priorities for generate(); interactive requests should overtake background work
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 10
+PRIORITY_BACKGROUND = 20
+
+
+class LLMError(Exception):
+    """Ollama returned an error or an unusable response."""
+
+
+def is_configured() -> bool:
+    return bool(settings.ollama_url)
+
+
+# ── Priority gate ──────────────────────────────────────────────────────────────
+
+class _PriorityGate:
+    """A semaphore whose waiters are woken in (priority, arrival) order."""
+
+    def __init__(self) -> None:
+        self.active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for *_, fut in self._waiters if not fut.done())
+
+    async def acquire(self, priority: int) -> None:
+        if self.active < settings.ollama_concurrency and not self.waiting:
+            self.active += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), fut))
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # the slot was handed over just as we were cancelled
+            raise
+
+    def release(self) -> None:
+        # Hand the slot straight to the next live waiter, if any
+        while self._waiters:
+            *_, fut = heapq.heappop(self._waiters)
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: int):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_gate = _PriorityGate()
+
+
+# ── Metrics ────────────────────────────────────────────────────────────────────
+
+@dataclass
+class _Metrics:
+    requests: int = 0
+    cache_hits: int = 0
+    generations: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    cancelled: int = 0
+    queue_wait_seconds: float = 0.0
+    generation_seconds: float = 0.0
+    max_queue_wait_seconds: float = 0.0
+    max_generation_seconds: float = 0.0
+
+
+_metrics = _Metrics()
+
+
+def stats() -> dict:
+    m = _metrics
+    started = m.generations + m.errors + m.timeouts + m.cancelled
+    return {
+        "requests": m.requests,
+        "cache_hits": m.cache_hits,
+        "hit_ratio": m.cache_hits / m.requests if m.requests else 0.0,
+        "generations": m.generations,
+        "errors": m.errors,
+        "timeouts": m.timeouts,
+        "cancelled": m.cancelled,
+        "active": _gate.active,
+        "queued": _gate.waiting,
+        "queue_wait_seconds_total": m.queue_wait_seconds,
+        "queue_wait_seconds_max": m.max_queue_wait_seconds,
+        "queue_wait_seconds_avg": m.queue_wait_seconds / started if started else 0.0,
+        "generation_seconds_total": m.generation_seconds,
+        "generation_seconds_max": m.max_generation_seconds,
+        "generation_seconds_avg": m.generation_seconds / m.generations if m.generations else 0.0,
+    }
+
+
+metrics.Callback(
+    "dasher_llm_requests_total", "LLM generate() calls, by outcome.",
+    lambda: [
+        ({"outcome": outcome}, getattr(_metrics, attr))
+        for outcome, attr in (
+            ("cache_hit", "cache_hits"), ("generated", "generations"), ("error", "errors"),
+            ("timeout", "timeouts"), ("cancelled", "cancelled"),
+        )
+    ],
+    kind="counter",
+)
+metrics.Callback(
+    "dasher_llm_queue_wait_seconds_total", "Time generations spent waiting for a slot.",
+    lambda: [({}, _metrics.queue_wait_seconds)], kind="counter",
+)
+metrics.Callback(
+    "dasher_llm_generation_seconds_total", "Time spent generating.",
+    lambda: [({}, _metrics.generation_seconds)], kind="counter",
+)
+metrics.Callback(
+    "dasher_llm_queued", "Generations waiting for a slot.", lambda: [({}, _gate.waiting)],
+)
+
+
+# ── Cache ──────────────────────────────────────────────────────────────────────
+
+def cache_key(model: str, prompt: str, content_hash: str) -> str:
+    return hashlib.sha256(f"{model}\0{prompt}\0{content_hash}".encode()).hexdigest()
+
+
+async def _cached(key: str) -> str | None:
+    async with db_connect(readonly=True) as db:
+        async with db.execute("SELECT response FROM llm_cache WHERE key=?", (key,)) as cursor:
+            row = await cursor.fetchone()
+    return row["response"] if row else None
+
+
+async def _store(key: str, model: str, response: str) -> None:
+    async with db_connect() as db:
+        await db.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at) VALUES (?, ?, ?, ?)",
+            (key, model, response, time.time()),
+        )
+        await db.commit()
+
+
+# ── Generation ─────────────────────────────────────────────────────────────────
+
+async def _stream_generate(model: str, prompt: str) -> str:
+    body = {"model": model, "prompt": prompt, "stream": True, "keep_alive": settings.ollama_keep_alive}
+    parts: list[str] = []
+    async with get_client("ollama").stream(
+        "POST", f"{settings.ollama_url.rstrip('/')}/api/generate", json=body
+    ) as resp:
+        if resp.is_error:
+            await resp.aread()
+            resp.raise_for_status()
+        async for line in resp.aiter_lines():
+            if not line:
+                continue
+            try:
+                chunk = json.loads(line)
+            except ValueError as exc:
+                raise LLMError(f"malformed stream line from Ollama: {line[:200]!r}") from exc
+            if not isinstance(chunk, dict):
+                raise LLMError(f"unexpected stream line from Ollama: {line[:200]!r}")
+            if "error" in chunk:
+                raise LLMError(chunk["error"])
+            parts.append(chunk.get("response", ""))
+            if chunk.get("done"):
+                break
+    return "".join(parts)
+
+
+async def generate(
+    prompt: str,
+    content: str = "",
+    *,
+    content_hash: str | None = None,
+    model: str | None = None,
+    priority: int = PRIORITY_NORMAL,
+    timeout: float | None = None,
+) -> str:
+    """Run *prompt* (followed by *content*, if any) through Ollama and return the text.
+
+    Cached by (model, prompt, content hash); pass *content_hash* when the
+    caller already has one. *timeout* (default ``ollama_timeout``) bounds the
+    generation itself, not the time spent queued. Raises ``httpx.HTTPError``,
+    ``LLMError`` or ``TimeoutError``.
+    """
+    model = model or settings.ollama_model
+    if content_hash is None:
+        content_hash = hashlib.sha256(content.encode()).hexdigest()
+    key = cache_key(model, prompt, content_hash)
+
+    _metrics.requests += 1
+    cached = await _cached(key)
+    if cached is not None:
+        _metrics.cache_hits += 1
+        return cached
+
+    full_prompt = f"{prompt}\n\n---\n{content}" if content else prompt
+    queued_at = time.monotonic()
+    async with _gate.slot(priority):
+        started = time.monotonic()
+        wait = started - queued_at
+        _metrics.queue_wait_seconds += wait
+        _metrics.max_queue_wait_seconds = max(_metrics.max_queue_wait_seconds, wait)
+        try:
+            async with asyncio.timeout(timeout or settings.ollama_timeout):
+                response = await _stream_generate(model, full_prompt)
+        except TimeoutError:
+            _metrics.timeouts += 1
+            logger.warning("Ollama generation timed out after %.0fs", time.monotonic() - started)
+            raise
+        except asyncio.CancelledError:
+            _metrics.cancelled += 1
+            raise
+        except Exception:
+            _metrics.errors += 1
+            raise
+        elapsed = time.monotonic() - started
+        _metrics.generations += 1
+        _metrics.generation_seconds += elapsed
+        _metrics.max_generation_seconds = max(_metrics.max_generation_seconds, elapsed)
+
+    await _store(key, model, response)
+    return response
@@ -1,2 +1,337 @@
-# RSS feed fetching, polling, and caching service
-# Will be implemented in Phase 2
+"""RSS ingestion: fetch due feeds concurrently, store new items in ``rss_items``.
+
+Requests are conditional (``ETag`` / ``Last-Modified``), so unchanged feeds
+cost a 304 and no parsing. feedparser is CPU-bound pure Python, so parsing
+runs in a small dedicated thread pool instead of on the event loop. Items are
+keyed by a hash of feed id + GUID (or link), which makes re-ingestion a no-op.
+The HTTP API reads from the table and never fetches on the request path.
+
+Each feed's refresh interval adapts to what it actually does: it shrinks
+towards the observed gap between items when new items keep arriving, grows
+on 304s and unchanged bodies, and backs off exponentially on errors. The
+feed's own hints (``<ttl>``, ``Cache-Control: max-age``, ``Retry-After``)
+are a floor. Due feeds come off a heap ordered by next fetch time, so a
+refresh never scans the whole table.
+
+Only the leader worker runs the refresh, so a feed added or deleted through
+another worker is announced with an ``rss:feeds`` backplane signal. The
+leader then reloads its heap from ``rss_feeds``.
+"""
+import asyncio
+import calendar
+import email.utils
+import hashlib
+import heapq
+import logging
+import re
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import feedparser
+import httpx
+
+from dasher.config import settings
+from dasher.database import db_connect, db_path
+from dasher.http import get_client
+from dasher.ws_manager import manager
+
+logger = logging.getLogger(__name__)
+
+MIN_INTERVAL = 60.0
+MAX_INTERVAL = 24 * 3600.0
+# Interval growth on a fetch with nothing new, and shrink when items arrive
+# without enough timestamps to estimate a cadence
+_SKIP_FACTOR = 1.25
+_HIT_FACTOR = 0.75
+
+_parse_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rss-parse")
+
+_FEED_COLUMNS = (
+    "id, url, etag, last_modified, refresh_interval_minutes, interval_seconds, error_count"
+)
+
+
+def _item_id(feed_id: str, entry: dict) -> str | None:
+    key = entry.get("id") or entry.get("link") or entry.get("title")
+    if not key:
+        return None
+    return hashlib.sha1(f"{feed_id}\0{key}".encode()).hexdigest()
+
+
+def _timestamp(entry: dict) -> float | None:
+    parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+    return float(calendar.timegm(parsed)) if parsed else None
+
+
+def _parse(content: bytes, feed_id: str, fetched_at: float) -> tuple[list[tuple], float | None]:
+    """Parse a feed body into ``rss_items`` rows plus its ``<ttl>`` in seconds.
+
+    Runs in the parse pool.
+    """
+    parsed = feedparser.parse(content)
+    rows = []
+    for entry in parsed.entries:
+        item_id = _item_id(feed_id, entry)
+        if item_id is None:
+            continue
+        rows.append((
+            item_id,
+            feed_id,
+            entry.get("title", ""),
+            entry.get("link"),
+            entry.get("summary"),
+            _timestamp(entry),
+            fetched_at,
+        ))
+    try:
+        ttl = float(parsed.feed.get("ttl")) * 60
+    except (TypeError, ValueError):
+        ttl = None
+    return rows, ttl
+
+
+# ── Scheduling policy ──────────────────────────────────────────────────────────
+
+def _header_hint(headers: httpx.Headers, now: float) -> float | None:
+    """Seconds the server asked us to wait, from Retry-After or Cache-Control."""
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        if retry_after.strip().isdigit():
+            return float(retry_after)
+        try:
+            return max(0.0, email.utils.parsedate_to_datetime(retry_after).timestamp() - now)
+        except (TypeError, ValueError):
+            pass
+    match = re.search(r"max-age=(\d+)", headers.get("cache-control", ""))
+    return float(match.group(1)) if match else None
+
+
+def _observed_gap(published: list[float]) -> float | None:
+    """Median gap between consecutive item timestamps, if there are enough."""
+    stamps = sorted(set(published))
+    if len(stamps) < 3:
+        return None
+    return statistics.median(b - a for a, b in zip(stamps, stamps[1:]))
+
+
+def plan_next(
+    interval: float,
+    outcome: str,
+    error_count: int = 0,
+    observed_gap: float | None = None,
+    hint: float | None = None,
+) -> tuple[float, float]:
+    """Return ``(new_interval, delay_until_next_fetch)`` for a fetch outcome.
+
+    *outcome* is ``"hit"`` (new items), ``"skip"`` (304 / nothing new) or
+    ``"error"``. *error_count* counts consecutive errors including this one.
+    """
+    if outcome == "error":
+        delay = min(interval * 2 ** error_count, MAX_INTERVAL)
+        return interval, max(delay, hint or 0.0)
+    if outcome == "hit":
+        # Aim to poll about twice per observed item gap
+        target = observed_gap / 2 if observed_gap else interval * _HIT_FACTOR
+        interval = (interval + target) / 2
+    else:
+        interval *= _SKIP_FACTOR
+    interval = min(max(interval, MIN_INTERVAL), MAX_INTERVAL)
+    return interval, max(interval, hint or 0.0)
+
+
+class FeedQueue:
+    """Min-heap of ``(next_fetch_at, feed_id)``, loaded once per database
+    and again after ``invalidate``.
+
+    Superseded heap entries are skipped lazily using ``_next_at``.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, str]] = []
+        self._next_at: dict[str, float] = {}
+        self._path: str | None = None
+
+    async def _ensure_loaded(self) -> None:
+        path = db_path()
+        if self._path == path:
+            return
+        async with db_connect(readonly=True) as db:
+            async with db.execute("SELECT id, COALESCE(next_fetch_at, 0) FROM rss_feeds") as cursor:
+                rows = await cursor.fetchall()
+        self._path = path
+        self._next_at = {feed_id: at for feed_id, at in rows}
+        self._heap = [(at, feed_id) for feed_id, at in rows]
+        heapq.heapify(self._heap)
+
+    def invalidate(self) -> None:
+        """Reload from ``rss_feeds`` on the next ``pop_due``."""
+        self._path = None
+
+    def schedule(self, feed_id: str, at: float) -> None:
+        if self._path != db_path():
+            return  # not loaded for this database; the next load reads next_fetch_at
+        self._next_at[feed_id] = at
+        heapq.heappush(self._heap, (at, feed_id))
+
+    def remove(self, feed_id: str) -> None:
+        self._next_at.pop(feed_id, None)
+
+    async def pop_due(self, now: float) -> list[str]:
+        await self._ensure_loaded()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            at, feed_id = heapq.heappop(self._heap)
+            if self._next_at.get(feed_id) == at:
+                del self._next_at[feed_id]
+                due.append(feed_id)
+        return due
+
+
+queue = FeedQueue()
+
+FEEDS_SIGNAL = "rss:feeds"
+manager.backplane.on_signal(FEEDS_SIGNAL, queue.invalidate)
+
+
+async def feed_added(feed_id: str) -> None:
+    """Call after committing a new feed: fetch it on the leader's next refresh."""
+    queue.schedule(feed_id, 0.0)
+    await manager.backplane.signal(FEEDS_SIGNAL)
+
+
+async def feed_removed(feed_id: str) -> None:
+    """Call after committing a feed's deletion."""
+    queue.remove(feed_id)
+    await manager.backplane.signal(FEEDS_SIGNAL)
+
+
+# ── Fetching ───────────────────────────────────────────────────────────────────
+
+@dataclass
+class _Outcome:
+    kind: str  # "hit" | "skip" | "error"
+    added: int = 0
+    hint: float | None = None
+    gap: float | None = None
+    error: str | None = None
+
+
+async def _fetch(feed: dict, now: float) -> tuple[_Outcome, httpx.Response | None]:
+    headers = {}
+    if feed["etag"]:
+        headers["If-None-Match"] = feed["etag"]
+    if feed["last_modified"]:
+        headers["If-Modified-Since"] = feed["last_modified"]
+
+    try:
+        resp = await get_client("rss").get(feed["url"], headers=headers, follow_redirects=True)
+    except httpx.HTTPError as exc:
+        return _Outcome("error", error=str(exc)), None
+    hint = _header_hint(resp.headers, now)
+    if resp.status_code == 304:
+        return _Outcome("skip", hint=hint), resp
+    if resp.is_error:
+        return _Outcome("error", hint=hint, error=f"HTTP {resp.status_code}"), resp
+
+    loop = asyncio.get_running_loop()
+    rows, ttl = await loop.run_in_executor(_parse_pool, _parse, resp.content, feed["id"], now)
+    if ttl is not None:
+        hint = max(hint or 0.0, ttl)
+
+    async with db_connect() as db:
+        before = db.total_changes
+        await db.executemany(
+            "INSERT OR IGNORE INTO rss_items (id, feed_id, title, link, summary, published_at, fetched_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        added = db.total_changes - before
+        await db.commit()
+    gap = _observed_gap([r[5] for r in rows if r[5] is not None])
+    return _Outcome("hit" if added else "skip", added=added, hint=hint, gap=gap), resp
+
+
+async def fetch_feed(feed: dict) -> int:
+    """Fetch one feed, store its new items and schedule its next fetch.
+
+    Returns how many items were new.
+    """
+    now = time.time()
+    outcome, resp = await _fetch(feed, now)
+    if outcome.error:
+        logger.warning("RSS fetch failed for %s: %s", feed["url"], outcome.error)
+
+    error_count = feed["error_count"] + 1 if outcome.kind == "error" else 0
+    interval = feed["interval_seconds"] or feed["refresh_interval_minutes"] * 60.0
+    interval, delay = plan_next(interval, outcome.kind, error_count, outcome.gap, outcome.hint)
+    next_at = now + delay
+
+    etag, last_modified = feed["etag"], feed["last_modified"]
+    if resp is not None and outcome.kind != "error":
+        etag = resp.headers.get("etag", etag)
+        last_modified = resp.headers.get("last-modified", last_modified)
+
+    async with db_connect() as db:
+        await db.execute(
+            "UPDATE rss_feeds SET etag=?, last_modified=?, last_fetched_at=?, last_error=?,"
+            " next_fetch_at=?, interval_seconds=?, error_count=?,"
+            " hit_count = hit_count + ?, skip_count = skip_count + ?, backoff_count = backoff_count + ?"
+            " WHERE id=?",
+            (
+                etag, last_modified, now, outcome.error, next_at, interval, error_count,
+                outcome.kind == "hit", outcome.kind == "skip", outcome.kind == "error",
+                feed["id"],
+            ),
+        )
+        await db.commit()
+    queue.schedule(feed["id"], next_at)
+    return outcome.added
+
+
+async def get_feeds(feed_ids: list[str]) -> list[dict]:
+    placeholders = ",".join("?" * len(feed_ids))
+    async with db_connect(readonly=True) as db:
+        async with db.execute(
+            f"SELECT {_FEED_COLUMNS} FROM rss_feeds WHERE id IN ({placeholders})", feed_ids
+        ) as cursor:
+            return [dict(r) for r in await cursor.fetchall()]
+
+
+async def refresh_due_feeds() -> int:
+    """Fetch every due feed, at most ``rss_fetch_concurrency`` at a time."""
+    due = await queue.pop_due(time.time())
+    if not due:
+        return 0
+    feeds = await get_feeds(due)
+    semaphore = asyncio.Semaphore(settings.rss_fetch_concurrency)
+
+    async def bounded(feed: dict) -> int:
+        async with semaphore:
+            try:
+                return await fetch_feed(feed)
+            except Exception:
+                logger.exception("RSS refresh of %s failed", feed["url"])
+                queue.schedule(feed["id"], time.time() + MIN_INTERVAL)
+                return 0
+
+    added = sum(await asyncio.gather(*(bounded(f) for f in feeds)))
+    logger.info("RSS refresh: %d feeds fetched, %d new items", len(feeds), added)
+    return added
+
+
+async def list_items(limit: int = 20, offset: int = 0, feed_id: str | None = None) -> list[dict]:
+    query = (
+        "SELECT i.id, i.feed_id, f.label AS source, i.title, i.link, i.summary, i.published_at"
+        " FROM rss_items i JOIN rss_feeds f ON f.id = i.feed_id"
+    )
+    params: list = []
+    if feed_id is not None:
+        query += " WHERE i.feed_id = ?"
+        params.append(feed_id)
+    query += " ORDER BY i.published_at DESC LIMIT ? OFFSET ?"
+    params += [limit, offset]
+    async with db_connect(readonly=True) as db:
+        async with db.execute(query, params) as cursor:
+            return [dict(r) for r in await cursor.fetchall()]
@@ -0,0 +1,202 @@
+"""SABnzbd queue and history, tracked incrementally in memory.
+
+Each poll asks ``mode=queue`` only for the slots that are actively
+downloading (``nzo_ids=``), or for a single slot when none are, which still
+returns the queue-wide header (speed, size left, slot count). The full slot
+list is fetched only when the header shows that the slot set changed, or
+when the last full fetch is older than ``_FULL_REFRESH_SECONDS``.
+``mode=history`` is read newest first, only until the last completion seen
+before, and only after a slot has left the queue or ``_HISTORY_REFRESH_SECONDS``
+have passed. Speed and ETA go into a fixed-size ring buffer for sparklines.
+"""
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from dasher.cache import ResponseCache
+from dasher.config import settings
+from dasher.http import get_client
+
+_FULL_REFRESH_SECONDS = 60.0
+_HISTORY_REFRESH_SECONDS = 60.0
+_HISTORY_PAGE = 20
+# Completed jobs kept in memory
+HISTORY_KEEP = 200
+_ACTIVE_STATUSES = {"Downloading", "Fetching", "Grabbing"}
+
+
+def _seconds(timeleft: str) -> int:
+    """'1:02:03' (or 'd:h:m:s') → seconds."""
+    parts = [int(p) if p.isdigit() else 0 for p in (timeleft or "0").split(":")]
+    days = parts.pop(0) if len(parts) == 4 else 0
+    total = 0
+    for part in parts:
+        total = total * 60 + part
+    return days * 86400 + total
+
+
+def _slot(s: dict) -> dict:
+    return {
+        "id": s.get("nzo_id"),
+        "filename": s.get("filename"),
+        "status": s.get("status"),
+        "mb": s.get("mb"),
+        "mbleft": s.get("mbleft"),
+        "percentage": s.get("percentage"),
+        "timeleft": s.get("timeleft"),
+        "cat": s.get("cat"),
+    }
+
+
+def _history_item(s: dict) -> dict:
+    return {
+        "id": s.get("nzo_id"),
+        "name": s.get("name"),
+        "status": s.get("status"),
+        "size": s.get("size"),
+        "cat": s.get("category"),
+        "completed": s.get("completed", 0),
+        "fail_message": s.get("fail_message") or None,
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class Sample:
+    at: float
+    kbpersec: float
+    timeleft_seconds: int
+
+
+class QueueTracker:
+    def __init__(self, series_size: int | None = None) -> None:
+        self.header: dict = {}
+        self.slots: dict[str, dict] = {}  # nzo_id → slot, in queue order
+        self.series: deque[Sample] = deque(maxlen=series_size or settings.sabnzbd_series_size)
+        self.full_fetches = 0
+        self.history: dict[str, dict] = {}  # nzo_id → item, newest first
+        self._full_at = 0.0
+        self._history_at = 0.0
+        self._history_loaded = False
+
+    # ── Queue ──────────────────────────────────────────────────────────────────
+
+    async def _api(self, **params) -> dict:
+        resp = await get_client("sabnzbd").get(
+            f"{settings.sabnzbd_url.rstrip('/')}/api",
+            params={"output": "json", "apikey": settings.sabnzbd_api_key, **params},
+        )
+        resp.raise_for_status()
+        return resp.json()
+
+    def _active_ids(self) -> list[str]:
+        return [i for i, s in self.slots.items() if s["status"] in _ACTIVE_STATUSES]
+
+    async def poll(self) -> None:
+        now = time.monotonic()
+        active = self._active_ids()
+        if active:
+            queue = (await self._api(mode="queue", nzo_ids=",".join(active))).get("queue", {})
+        else:
+            queue = (await self._api(mode="queue", start=0, limit=1)).get("queue", {})
+        partial = [_slot(s) for s in queue.get("slots", [])]
+
+        count = int(queue.get("noofslots_total", 0))
+        known = {s["id"] for s in partial} <= self.slots.keys()
+        left_queue = count < len(self.slots)
+        if count != len(self.slots) or not known or now - self._full_at > _FULL_REFRESH_SECONDS:
+            await self._full_fetch()
+        else:
+            for slot in partial:
+                self.slots[slot["id"]] = slot
+        self.header = {
+            "speed": queue.get("speed", ""),
+            "sizeleft": queue.get("sizeleft", ""),
+            "timeleft": queue.get("timeleft", ""),
+            "noofslots": count,
+            "paused": queue.get("paused", False),
+        }
+        self.series.append(Sample(
+            at=time.time(),
+            kbpersec=float(queue.get("kbpersec") or 0),
+            timeleft_seconds=_seconds(queue.get("timeleft", "")),
+        ))
+
+        if left_queue or not self._history_loaded or now - self._history_at > _HISTORY_REFRESH_SECONDS:
+            await self._update_history()
+
+    async def _full_fetch(self) -> None:
+        queue = (await self._api(mode="queue", start=0, limit=0)).get("queue", {})
+        self.slots = {slot["id"]: slot for slot in map(_slot, queue.get("slots", []))}
+        self._full_at = time.monotonic()
+        self.full_fetches += 1
+
+    # ── History ────────────────────────────────────────────────────────────────
+
+    async def _update_history(self) -> None:
+        """Read history pages newest first until reaching jobs already seen."""
+        newest_seen = max((item["completed"] for item in self.history.values()), default=0)
+        fresh: dict[str, dict] = {}
+        start = 0
+        while start < HISTORY_KEEP:
+            history = (await self._api(mode="history", start=start, limit=_HISTORY_PAGE)).get("history", {})
+            page = [_history_item(s) for s in history.get("slots", [])]
+            for item in page:
+                fresh[item["id"]] = item
+            if len(page) < _HISTORY_PAGE or (page and page[-1]["completed"] <= newest_seen):
+                break
+            start += _HISTORY_PAGE
+        # Re-read entries replace old ones (a job may move from Extracting to Completed)
+        merged = {**fresh, **{k: v for k, v in self.history.items() if k not in fresh}}
+        ordered = sorted(merged.values(), key=lambda item: item["completed"], reverse=True)
+        self.history = {item["id"]: item for item in ordered[:HISTORY_KEEP]}
+        self._history_at = time.monotonic()
+        self._history_loaded = True
+
+    # ── Views ──────────────────────────────────────────────────────────────────
+
+    def queue_page(self, limit: int, offset: int) -> dict:
+        slots = list(self.slots.values())[offset:offset + limit]
+        return {"configured": True, "slots": slots, **self.header, "limit": limit, "offset": offset}
+
+    def history_page(self, limit: int, offset: int) -> dict:
+        items = list(self.history.values())[offset:offset + limit]
+        return {"configured": True, "items": items, "total": len(self.history), "limit": limit, "offset": offset}
+
+    def series_payload(self) -> dict:
+        return {
+            "configured": True,
+            "samples": [
+                {"at": s.at, "kbpersec": s.kbpersec, "timeleft_seconds": s.timeleft_seconds}
+                for s in self.series
+            ],
+        }
+
+
+tracker = QueueTracker()
+_poll_cache = ResponseCache("sabnzbd.queue", ttl=settings.sabnzbd_cache_ttl, stale_ttl=settings.sabnzbd_cache_ttl)
+
+
+async def _poll() -> bool:
+    await tracker.poll()
+    return True
+
+
+async def _ensure_fresh() -> None:
+    # The cache only coalesces polls; the data itself lives on the tracker
+    await _poll_cache.get("poll", _poll)
+
+
+async def get_queue(limit: int = 5, offset: int = 0) -> dict:
+    """Queue header plus a page of slots, polled at most every ``sabnzbd_cache_ttl``."""
+    await _ensure_fresh()
+    return tracker.queue_page(limit, offset)
+
+
+async def get_history(limit: int = 20, offset: int = 0) -> dict:
+    await _ensure_fresh()
+    return tracker.history_page(limit, offset)
+
+
+async def get_series() -> dict:
+    await _ensure_fresh()
+    return tracker.series_payload()
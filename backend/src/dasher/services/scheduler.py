@@ -1,2 +1,220 @@
-# APScheduler background job definitions
-# Will be implemented in Phase 2+
+"""APScheduler jobs that poll upstreams and push the results over /ws.
+
+Each poller owns a channel (or a channel prefix such as ``hass:``) and runs on
+its own interval, but only fetches while at least one websocket is subscribed
+to a matching channel. Results go out through ``manager.publish``, which
+skips unchanged payloads and sends deltas when they are smaller.
+
+Every worker schedules the jobs, but they only do anything in the worker
+holding the leader lease (``dasher.leader``); the backplane carries what it
+publishes to the other workers' sockets. A newly elected leader runs every
+job right away instead of waiting out their intervals. The UniFi table refresh
+is the exception: each worker serves /unifi/devices from its own tables, so it
+runs everywhere.
+"""
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from datetime import datetime
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from fastapi import WebSocket
+
+from dasher.config import settings
+from dasher.integrations import gmail_configured, hass_configured, sabnzbd_configured, unifi_configured
+from dasher.leader import election
+from dasher.services import crawler_service, layout_service, rss_service
+from dasher.ws_manager import manager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Poller:
+    # Exact channel name, or a prefix ending in ":" for per-entity channels
+    channel: str
+    interval: float
+    # Given the subscribed channels this poller matches, return channel → payload
+    fetch: Callable[[list[str]], Awaitable[dict[str, dict]]]
+    configured: Callable[[], bool]
+
+    def matches(self, channel: str) -> bool:
+        if self.channel.endswith(":"):
+            return channel.startswith(self.channel)
+        return channel == self.channel
+
+
+def _single(channel: str, fetch: Callable[[], Awaitable[dict]]) -> Callable[[list[str]], Awaitable[dict[str, dict]]]:
+    async def fetch_channel(_channels: list[str]) -> dict[str, dict]:
+        return {channel: await fetch()}
+    return fetch_channel
+
+
+# Integration services are imported inside their fetchers, which only run
+# once the integration is configured (see dasher.integrations)
+
+async def _sabnzbd_queue() -> dict:
+    from dasher.services import sabnzbd_service
+
+    return await sabnzbd_service.get_queue()
+
+
+async def _unifi_devices() -> dict:
+    from dasher.services import unifi_service
+
+    devices, _ = await unifi_service.list_devices()
+    return {"configured": True, "devices": devices}
+
+
+async def _unifi_refresh() -> None:
+    from dasher.services import unifi_service
+
+    await unifi_service.refresh()
+
+
+async def _gmail_unread() -> dict:
+    from dasher.services import gmail_service
+
+    return {"unread": await gmail_service.get_unread_count()}
+
+
+async def _gmail_inbox() -> dict:
+    from dasher.services import gmail_service
+
+    return {"configured": True, "messages": await gmail_service.get_inbox_messages(limit=settings.gmail_inbox_limit)}
+
+
+async def _layout() -> dict:
+    return layout_service.layout_payload(await layout_service.get_layout())
+
+
+async def _rss_items() -> dict:
+    return {"items": await rss_service.list_items(limit=20)}
+
+
+async def _hass_states(channels: list[str]) -> dict[str, dict]:
+    from dasher.services import hass_service
+
+    entity_ids = [c.removeprefix("hass:") for c in channels]
+    states = await hass_service.get_states(entity_ids)
+    return {f"hass:{entity_id}": hass_service.state_payload(state) for entity_id, state in states.items()}
+
+
+POLLERS: list[Poller] = [
+    Poller("sabnzbd:queue", 5.0,  _single("sabnzbd:queue", _sabnzbd_queue),           sabnzbd_configured),
+    Poller("unifi:devices", 30.0, _single("unifi:devices", _unifi_devices),            unifi_configured),
+    Poller("gmail:unread",  60.0, _single("gmail:unread", _gmail_unread),              gmail_configured),
+    Poller("gmail:inbox",   60.0, _single("gmail:inbox", _gmail_inbox),                gmail_configured),
+    # Normally a no-op: the HA websocket cache pushes changes itself, so these
+    # reads come from memory and match what was last sent.
+    Poller("hass:",         30.0, _hass_states,                                        hass_configured),
+    Poller("rss:items",     60.0, _single("rss:items", _rss_items),                   lambda: True),
+    # Layout writes publish themselves; this only serves first subscribers
+    Poller("layout",        300.0, _single("layout", _layout),                         lambda: True),
+]
+
+_scheduler: AsyncIOScheduler | None = None
+
+
+def _poller_for(channel: str) -> Poller | None:
+    return next((p for p in POLLERS if p.matches(channel)), None)
+
+
+def _subscribed(poller: Poller) -> list[str]:
+    return [c for c in manager.active_channels() if poller.matches(c)]
+
+
+async def run_poller(poller: Poller) -> None:
+    """Fetch and broadcast one poller's channels, if anyone is listening."""
+    channels = _subscribed(poller)
+    if not channels or not poller.configured():
+        return
+    try:
+        payloads = await poller.fetch(channels)
+    except Exception as exc:
+        logger.warning("Poller %s failed: %s", poller.channel, exc)
+        return
+    for channel, payload in payloads.items():
+        await manager.publish(channel, payload)
+
+
+async def publish_now(channels: list[str], ws: WebSocket | None = None) -> None:
+    """Fetch and publish channels that have no data yet, e.g. on first subscribe.
+
+    Fetches go through the services' caches, so this stays cheap when many
+    screens subscribe at once. On a follower, the payloads only go to *ws*, as
+    snapshots with ``seq`` 0: seqs belong to the leader's publishes, and those
+    reach this worker through the backplane.
+    """
+    follower = not election.is_leader and manager.backplane.shared
+    if follower and ws is None:
+        return
+    for poller in POLLERS:
+        matched = [c for c in channels if poller.matches(c)]
+        if not matched or not poller.configured():
+            continue
+        try:
+            payloads = await poller.fetch(matched)
+        except Exception as exc:
+            logger.warning("Fetch for %s failed: %s", ", ".join(matched), exc)
+            for channel in matched:
+                error = {"channel": channel, "error": "upstream error"}
+                await (manager.send(ws, error) if follower else manager.broadcast(channel, error))
+            continue
+        for channel, payload in payloads.items():
+            if follower:
+                await manager.send(ws, {"channel": channel, "seq": 0, "data": payload})
+            else:
+                await manager.publish(channel, payload)
+
+
+async def _as_leader(job: Callable[..., Awaitable[object]], *args: object) -> None:
+    if election.is_leader:
+        await job(*args)
+
+
+def _add_job(
+    job: Callable[..., Awaitable[object]], seconds: float, id: str, *args: object,
+    leader_only: bool = True, **kwargs,
+) -> None:
+    func, args = (_as_leader, [job, *args]) if leader_only else (job, list(args))
+    _scheduler.add_job(
+        func, "interval", args=args, seconds=seconds,
+        id=id, name=id, max_instances=1, coalesce=True, **kwargs,
+    )
+
+
+def _run_all_now() -> None:
+    if _scheduler is not None:
+        for job in _scheduler.get_jobs():
+            job.modify(next_run_time=datetime.now())
+
+
+election.on_elected(_run_all_now)
+
+
+def start() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        return
+    _scheduler = AsyncIOScheduler()
+    for poller in POLLERS:
+        _add_job(run_poller, poller.interval, f"poll:{poller.channel}", poller)
+    # Ingestion runs whether or not anyone is watching, so /rss/items stays current
+    _add_job(rss_service.refresh_due_feeds, 60, "rss:refresh", next_run_time=datetime.now())
+    # Keeps the UniFi client tables warm so /unifi/devices never waits on the controller.
+    # The tables are per worker, so followers refresh theirs too.
+    if unifi_configured():
+        _add_job(
+            _unifi_refresh, settings.unifi_cache_ttl, "unifi:refresh",
+            leader_only=False, next_run_time=datetime.now(),
+        )
+    _add_job(crawler_service.check_due_rules, 60, "crawler:check", next_run_time=datetime.now())
+    _scheduler.start()
+
+
+def shutdown() -> None:
+    global _scheduler
+    if _scheduler is not None:
+        _scheduler.shutdown(wait=False)
+        _scheduler = None
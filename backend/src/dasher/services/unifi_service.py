@@ -0,0 +1,179 @@
+"""UniFi connected clients, kept as a compact MAC-indexed table per site.
+
+One shared client holds the controller session (login is rate-limited, so
+the cookie is reused until a 401, and shared with the other workers through
+the backplane). The scheduler's ``unifi:refresh`` job runs on every worker
+and re-downloads ``stat/sta`` for every site that worker read recently, so
+readers are normally served from memory. Only the fields we render are kept, and each
+table carries a name-sorted index, so ``?q=`` prefix search is a bisect
+rather than a scan and results come out already ordered.
+"""
+import asyncio
+import bisect
+import logging
+import re
+import time
+from dataclasses import dataclass
+
+import httpx
+
+from dasher.backplane import get_backplane
+from dasher.cache import ResponseCache
+from dasher.config import settings
+from dasher.http import get_client
+
+logger = logging.getLogger(__name__)
+
+# UniFi site ids ("default", or short generated names such as "ab12cd34")
+SITE_PATTERN = r"^[A-Za-z0-9_-]{1,64}$"
+_SITE_RE = re.compile(SITE_PATTERN)
+# Sites not read for this long drop out of background refresh
+_SITE_IDLE_SECONDS = 600.0
+
+# Cached cookies from last successful login — avoids re-logging in on every request
+# (controller rate-limits login attempts).
+_cookies: dict[str, str] = {}
+_login_lock = asyncio.Lock()
+_SESSION_KEY = "unifi:cookies"
+
+_tables = ResponseCache("unifi.devices", ttl=settings.unifi_cache_ttl, stale_ttl=settings.unifi_cache_ttl)
+# site → monotonic time it was last read
+_site_reads: dict[str, float] = {}
+
+
+@dataclass(frozen=True, slots=True)
+class ClientRow:
+    mac: str
+    name: str
+    ip: str | None
+    is_wired: bool
+
+    def as_dict(self) -> dict:
+        return {"mac": self.mac, "name": self.name, "ip": self.ip, "is_wired": self.is_wired, "online": True}
+
+
+class ClientTable:
+    """Clients of one site: rows by MAC plus a (lowercase name, mac) sorted index."""
+
+    def __init__(self, rows: list[ClientRow]) -> None:
+        self.by_mac = {row.mac: row for row in rows}
+        self._index = sorted((row.name.lower(), row.mac) for row in self.by_mac.values())
+
+    def __len__(self) -> int:
+        return len(self.by_mac)
+
+    def query(self, q: str | None = None, wired: bool | None = None) -> list[ClientRow]:
+        """Rows ordered by name, optionally limited to a name prefix and wired/wireless."""
+        if q:
+            prefix = q.lower()
+            start = bisect.bisect_left(self._index, (prefix,))
+            end = bisect.bisect_left(self._index, (prefix + "\uffff",))
+            entries = self._index[start:end]
+        else:
+            entries = self._index
+        rows = (self.by_mac[mac] for _, mac in entries)
+        if wired is None:
+            return list(rows)
+        return [row for row in rows if row.is_wired == wired]
+
+
+def _compact(raw: dict) -> ClientRow:
+    mac = raw.get("mac", "")
+    return ClientRow(
+        mac=mac,
+        name=raw.get("hostname") or raw.get("name") or mac or "unknown",
+        ip=raw.get("ip"),
+        is_wired=bool(raw.get("is_wired", False)),
+    )
+
+
+async def _do_login(client: httpx.AsyncClient, base: str) -> None:
+    global _cookies
+    login = await client.post(
+        f"{base}/api/auth/login",
+        json={"username": settings.unifi_user, "password": settings.unifi_pass},
+    )
+    login.raise_for_status()
+    _cookies = dict(client.cookies)
+    logger.debug("UniFi login OK, session cached")
+
+
+async def _login(client: httpx.AsyncClient, base: str, rejected: dict | None = None) -> None:
+    """Adopt the session another worker logged in with, unless it is *rejected*; else log in."""
+    global _cookies
+    shared = await get_backplane().get_state(_SESSION_KEY)
+    if shared and shared != rejected:
+        _cookies = shared
+        return
+    await _do_login(client, base)
+    await get_backplane().set_state(_SESSION_KEY, _cookies)
+
+
+async def _fetch_table(site: str) -> ClientTable:
+    base = settings.unifi_url.rstrip("/")
+    url = f"{base}/proxy/network/api/s/{site}/stat/sta"
+
+    # Shared client: the session cookie lives in its jar between requests
+    client = get_client("unifi")
+    # Login on first call (no cached session yet)
+    if not _cookies:
+        async with _login_lock:
+            if not _cookies:
+                await _login(client, base)
+
+    client.cookies.update(_cookies)
+    resp = await client.get(url)
+
+    if resp.status_code == 401:
+        # Session expired — re-login once, then retry
+        rejected = dict(_cookies)
+        async with _login_lock:
+            _cookies.clear()
+            await _login(client, base, rejected)
+        client.cookies.update(_cookies)
+        resp = await client.get(url)
+
+    resp.raise_for_status()
+    return ClientTable([_compact(c) for c in resp.json().get("data", [])])
+
+
+def _check_site(site: str | None) -> str:
+    site = site or settings.unifi_site
+    if not _SITE_RE.match(site):
+        raise ValueError(f"invalid UniFi site {site!r}")
+    return site
+
+
+async def get_table(site: str | None = None) -> ClientTable:
+    """The site's client table, shared between concurrent callers and cached briefly."""
+    site = _check_site(site)
+    _site_reads[site] = time.monotonic()
+    return await _tables.get(site, lambda: _fetch_table(site))
+
+
+async def list_devices(
+    site: str | None = None,
+    q: str | None = None,
+    wired: bool | None = None,
+    limit: int | None = None,
+    offset: int = 0,
+) -> tuple[list[dict], int]:
+    """A page of connected clients ordered by name, and the total matching count."""
+    rows = (await get_table(site)).query(q=q, wired=wired)
+    page = rows[offset:offset + limit] if limit is not None else rows[offset:]
+    return [row.as_dict() for row in page], len(rows)
+
+
+async def refresh() -> None:
+    """Re-fetch every recently read site (the default site always) into the cache."""
+    now = time.monotonic()
+    for site, read_at in list(_site_reads.items()):
+        if now - read_at > _SITE_IDLE_SECONDS:
+            del _site_reads[site]
+    sites = {settings.unifi_site, *_site_reads}
+    for site in sorted(sites):
+        try:
+            _tables.set(site, await _fetch_table(site))
+        except (httpx.HTTPError, ValueError, KeyError) as exc:
+            # One bad site (or a garbled response) doesn't stop the others
+            logger.warning("UniFi refresh of site %s failed: %s", site, exc)
@@ -1,50 +1,297 @@
-import json
-from collections import defaultdict
+import asyncio
+import logging
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any
 
 from fastapi import WebSocket
 
+from dasher import delta, metrics, serialization
+from dasher.backplane import Backplane, LocalBackplane, Message, get_backplane
+from dasher.config import settings
+
+logger = logging.getLogger(__name__)
+
+# One encoded message, shared by every socket it is queued on: bytes when
+# ``ws_binary_frames`` is set, otherwise text
+Frame = str | bytes
+
+
+def _frame(encoded: bytes) -> Frame:
+    """Wire form of an encoded message, converted once per message, not per socket."""
+    return encoded if settings.ws_binary_frames else encoded.decode()
+
+
+class _Client:
+    """One websocket plus its bounded outbound queue, drained by a writer task.
+
+    Queue items are ``(channel, frame)``; a full queue first drops an older
+    frame for the same channel (the newer one supersedes it), otherwise the
+    oldest frame. Too many drops before the writer catches up means the
+    client is hopelessly behind and it is disconnected.
+    """
+
+    def __init__(self, ws: WebSocket) -> None:
+        self.ws = ws
+        self.channels: set[str] = set()
+        self.queue: deque[tuple[str | None, Frame]] = deque()
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.writer: asyncio.Task | None = None
+
+    def enqueue(self, channel: str | None, frame: Frame) -> bool:
+        """Queue a frame; return False if the client has fallen too far behind."""
+        if len(self.queue) >= settings.ws_send_queue_size:
+            self._drop_one(channel)
+            self.dropped += 1
+            if self.dropped > settings.ws_max_dropped:
+                return False
+        self.queue.append((channel, frame))
+        self.ready.set()
+        return True
+
+    def _drop_one(self, channel: str | None) -> None:
+        if channel is not None:
+            for i, (queued_channel, _) in enumerate(self.queue):
+                if queued_channel == channel:
+                    del self.queue[i]
+                    return
+        self.queue.popleft()
+
+    async def drain(self) -> None:
+        while True:
+            await self.ready.wait()
+            while self.queue:
+                _, frame = self.queue.popleft()
+                if isinstance(frame, bytes):
+                    await self.ws.send_bytes(frame)
+                else:
+                    await self.ws.send_text(frame)
+            self.ready.clear()
+            self.dropped = 0
+
+
+@dataclass
+class _ChannelState:
+    """Last payload published on a channel, encoded too, and its sequence number."""
+    seq: int = 0
+    data: Any = None
+    encoded: bytes = b"null"
+    deltas_since_snapshot: int = 0
+
 
 class ConnectionManager:
-    def __init__(self) -> None:
+    """This worker's websockets and channel state.
+
+    Messages published here are fanned out locally and handed to the
+    backplane for the other workers; theirs arrive through ``_receive``.
+    """
+
+    def __init__(self, backplane: Backplane | None = None) -> None:
         # channel → set of websockets subscribed to that channel
         self._subscriptions: dict[str, set[WebSocket]] = defaultdict(set)
-        # websocket → set of channels it subscribed to
-        self._connections: dict[WebSocket, set[str]] = {}
+        # websocket → its client state (channels, send queue, writer task)
+        self._connections: dict[WebSocket, _Client] = {}
+        # channel → last published payload, for deltas and snapshots
+        self._channels: dict[str, _ChannelState] = {}
+        # Closes of slow clients in flight; the loop only keeps weak references to tasks
+        self._closing: set[asyncio.Task] = set()
+        self.backplane = backplane or LocalBackplane()
+        self.backplane.bind(self._receive)
+
+    async def start(self) -> None:
+        await self.backplane.start()
+
+    async def stop(self) -> None:
+        await self.backplane.stop()
 
     async def connect(self, ws: WebSocket) -> None:
         await ws.accept()
-        self._connections[ws] = set()
+        client = _Client(ws)
+        client.writer = asyncio.create_task(self._write(client))
+        self._connections[ws] = client
 
     def disconnect(self, ws: WebSocket) -> None:
-        channels = self._connections.pop(ws, set())
-        for channel in channels:
+        client = self._connections.pop(ws, None)
+        if client is None:
+            return
+        for channel in client.channels:
             self._subscriptions[channel].discard(ws)
+            if not self.is_active(channel):
+                self._channels.pop(channel, None)
+        self._share_channels()
+        if client.writer is not None and client.writer is not asyncio.current_task():
+            client.writer.cancel()
 
     def subscribe(self, ws: WebSocket, channels: list[str]) -> None:
         for channel in channels:
             self._subscriptions[channel].add(ws)
             if ws in self._connections:
-                self._connections[ws].add(channel)
+                self._connections[ws].channels.add(channel)
+        self._share_channels()
+
+    def _share_channels(self) -> None:
+        if self.backplane.shared:
+            self.backplane.set_channels({channel for channel, sockets in self._subscriptions.items() if sockets})
+
+    def subscriber_count(self, channel: str) -> int:
+        return len(self._subscriptions.get(channel, ()))
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self._connections),
+            "channels": len(self.active_channels()),
+            "remote_channels": len(self.backplane.remote_channels()),
+            "subscriptions": sum(len(sockets) for sockets in self._subscriptions.values()),
+            "queued_frames": sum(len(client.queue) for client in self._connections.values()),
+        }
+
+    def active_channels(self) -> list[str]:
+        """Channels with at least one subscriber, on this worker or another."""
+        local = [channel for channel, sockets in self._subscriptions.items() if sockets]
+        remote = self.backplane.remote_channels()
+        return local + sorted(remote.difference(local)) if remote else local
+
+    def is_active(self, channel: str) -> bool:
+        return bool(self._subscriptions.get(channel)) or channel in self.backplane.remote_channels()
+
+    async def send(self, ws: WebSocket, message: dict) -> None:
+        """Queue a message for one socket, in order with its broadcasts."""
+        client = self._connections.get(ws)
+        if client is not None:
+            self._enqueue(client, None, _frame(serialization.dumps(message)))
+
+    async def publish(self, channel: str, data: Any) -> None:
+        """Publish a channel's new payload as a snapshot or, when smaller, a delta.
+
+        Messages carry a per-channel ``seq``. Snapshots are ``{"channel", "seq",
+        "data"}``; deltas are ``{"channel", "seq", "delta"}`` against ``seq - 1``
+        (see ``dasher.delta``). Unchanged payloads are not sent at all. A client
+        that sees a gap in ``seq`` sends ``{"action": "resync"}`` for a snapshot.
+
+        Seqs come from the backplane, so they are unique across workers. A
+        delta is only sent when its seq directly follows the one this worker
+        holds, and a publish overtaken by a newer seq is dropped.
+        """
+        if not self.is_active(channel):
+            self._channels.pop(channel, None)
+            return
+        state = self._channels.setdefault(channel, _ChannelState())
+        if state.seq and state.data == data:
+            return
+        seq = await self.backplane.next_seq(channel, state.seq)
+        # The state may have moved on (or been dropped) while the seq was allocated
+        state = self._channels.setdefault(channel, _ChannelState())
+        if seq <= state.seq:
+            return
+        encoded_data = serialization.dumps(data)
+        encoded = self._snapshot(channel, seq, encoded_data)
+        is_delta = False
+        if state.seq and seq == state.seq + 1 and state.deltas_since_snapshot < settings.ws_snapshot_every:
+            changes = delta.diff(state.data, data)
+            if changes is not None:
+                encoded_delta = serialization.dumps({"channel": channel, "seq": seq, "delta": changes})
+                if len(encoded_delta) < len(encoded):
+                    encoded, is_delta = encoded_delta, True
+        state.deltas_since_snapshot = state.deltas_since_snapshot + 1 if is_delta else 0
+        state.seq, state.data, state.encoded = seq, data, encoded_data
+        self._fanout(channel, _frame(encoded))
+        if self.backplane.shared:
+            await self.backplane.publish(Message(channel, encoded, seq, encoded_data))
+
+    async def send_snapshot(self, ws: WebSocket, channel: str) -> bool:
+        """Queue the last published payload of *channel* for one socket; False if none yet."""
+        state = self._channels.get(channel)
+        client = self._connections.get(ws)
+        if state is None or client is None:
+            return False
+        self._enqueue(client, channel, _frame(self._snapshot(channel, state.seq, state.encoded)))
+        return True
+
+    @staticmethod
+    def _snapshot(channel: str, seq: int, encoded_data: bytes) -> bytes:
+        return serialization.splice(serialization.dumps({"channel": channel, "seq": seq}), "data", encoded_data)
 
     async def broadcast(self, channel: str, message: dict) -> None:
-        dead: list[WebSocket] = []
+        encoded = serialization.dumps(message)
+        self._fanout(channel, _frame(encoded))
+        if self.backplane.shared:
+            await self.backplane.publish(Message(channel, encoded))
+
+    def _fanout(self, channel: str, frame: Frame) -> None:
+        # Serialized once; each socket's writer task does the actual send, so
+        # a slow client never holds up the others.
         for ws in list(self._subscriptions.get(channel, [])):
-            try:
-                await ws.send_text(json.dumps(message))
-            except Exception:
-                dead.append(ws)
-        for ws in dead:
-            self.disconnect(ws)
+            client = self._connections.get(ws)
+            if client is not None:
+                self._enqueue(client, channel, frame)
 
     async def broadcast_all(self, message: dict) -> None:
-        dead: list[WebSocket] = []
-        for ws in list(self._connections):
-            try:
-                await ws.send_text(json.dumps(message))
-            except Exception:
-                dead.append(ws)
-        for ws in dead:
-            self.disconnect(ws)
+        encoded = serialization.dumps(message)
+        self._fanout_all(_frame(encoded))
+        if self.backplane.shared:
+            await self.backplane.publish(Message(None, encoded))
+
+    def _fanout_all(self, frame: Frame) -> None:
+        for client in list(self._connections.values()):
+            self._enqueue(client, None, frame)
+
+    def _receive(self, message: Message) -> None:
+        """Fan out a message from another worker, taking over its channel state."""
+        if message.channel is None:
+            self._fanout_all(_frame(message.frame))
+            return
+        if message.seq is not None:
+            state = self._channels.setdefault(message.channel, _ChannelState())
+            if message.seq <= state.seq:
+                return  # overtaken by a newer publish; its clients already moved on
+            state.seq, state.encoded = message.seq, message.data
+            state.data = serialization.loads(message.data)
+            # Whichever worker publishes next diffs against this payload
+            state.deltas_since_snapshot = 0
+        self._fanout(message.channel, _frame(message.frame))
+
+    def _enqueue(self, client: _Client, channel: str | None, frame: Frame) -> None:
+        if not client.enqueue(channel, frame):
+            logger.warning("Disconnecting slow websocket client (%d frames dropped)", client.dropped)
+            self.disconnect(client.ws)
+            task = asyncio.create_task(self._close(client.ws))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    async def _write(self, client: _Client) -> None:
+        try:
+            await client.drain()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.disconnect(client.ws)
+
+    @staticmethod
+    async def _close(ws: WebSocket) -> None:
+        try:
+            await ws.close(code=1013)  # "try again later"
+        except Exception:
+            pass
+
 
+manager = ConnectionManager(get_backplane())
 
-manager = ConnectionManager()
+metrics.Callback(
+    "dasher_ws_connections", "Open websocket connections.", lambda: [({}, manager.stats()["connections"])],
+)
+metrics.Callback(
+    "dasher_ws_channels", "Channels with at least one subscriber.", lambda: [({}, manager.stats()["channels"])],
+)
+metrics.Callback(
+    "dasher_ws_remote_channels", "Channels with subscribers on other workers.",
+    lambda: [({}, manager.stats()["remote_channels"])],
+)
+metrics.Callback(
+    "dasher_ws_subscriptions", "Channel subscriptions across all sockets.",
+    lambda: [({}, manager.stats()["subscriptions"])],
+)
+metrics.Callback(
+    "dasher_ws_queued_frames", "Frames waiting in per-socket send queues.",
+    lambda: [({}, manager.stats()["queued_frames"])],
+)
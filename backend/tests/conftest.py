@@ -4,6 +4,7 @@ Shared fixtures for the Dasher backend test suite.
 SECRET_KEY must be set before any dasher module is imported, because
 config.py raises RuntimeError at module load time if it equals "changeme".
 """
+import asyncio
 import os
 import tempfile
 
@@ -15,10 +16,17 @@ import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
 
 from dasher.config import settings
-from dasher.database import init_db
+from dasher.database import close_db, init_db
 from dasher.main import app
 
 
+async def wait_until(predicate, timeout: float = 2.0) -> None:
+    """Poll *predicate* until it holds, e.g. for another worker's backplane message."""
+    async with asyncio.timeout(timeout):
+        while not predicate():
+            await asyncio.sleep(0.005)
+
+
 @pytest_asyncio.fixture
 async def client(tmp_path, monkeypatch):
     """
@@ -34,3 +42,6 @@ async def client(tmp_path, monkeypatch):
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://test") as ac:
         yield ac
+
+    # Pooled connections hold worker threads open; release them per test
+    await close_db()
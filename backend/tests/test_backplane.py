@@ -0,0 +1,123 @@
+"""
+Tests for backplane.py: two ConnectionManagers standing in for two uvicorn
+workers, sharing one SQLite broker file.
+"""
+import asyncio
+
+import pytest
+
+from dasher.backplane import LocalBackplane, SQLiteBackplane
+from dasher.ws_manager import ConnectionManager
+from tests.conftest import wait_until
+from tests.test_ws_manager import FakeWebSocket
+
+
+@pytest.fixture
+async def workers(tmp_path):
+    path = str(tmp_path / "backplane.db")
+    managers = [ConnectionManager(SQLiteBackplane(path, poll_interval=0.005)) for _ in range(2)]
+    for manager in managers:
+        await manager.start()
+    yield managers
+    for manager in managers:
+        await manager.stop()
+
+
+async def test_publish_reaches_sockets_on_other_worker(workers):
+    a, b = workers
+    ws_a, ws_b = FakeWebSocket(), FakeWebSocket()
+    await a.connect(ws_a)
+    await b.connect(ws_b)
+    a.subscribe(ws_a, ["x"])
+    b.subscribe(ws_b, ["x"])
+
+    await a.publish("x", {"n": 1})
+    await wait_until(lambda: ws_b.sent)
+
+    assert ws_a.sent == ws_b.sent == [{"channel": "x", "seq": 1, "data": {"n": 1}}]
+
+
+async def test_channel_interest_and_state_follow_other_worker(workers):
+    a, b = workers
+    ws_b = FakeWebSocket()
+    await b.connect(ws_b)
+    b.subscribe(ws_b, ["x"])
+
+    # a has no sockets of its own on "x", but still publishes for b's
+    await wait_until(lambda: a.is_active("x"))
+    assert a.active_channels() == ["x"]
+    await a.publish("x", {"n": 1})
+    await wait_until(lambda: ws_b.sent)
+
+    # b took over the channel state: snapshots and the next seq continue from it
+    assert await b.send_snapshot(ws_b, "x")
+    await b.publish("x", {"n": 2})
+    await wait_until(lambda: len(ws_b.sent) == 3)
+    assert ws_b.sent[1] == {"channel": "x", "seq": 1, "data": {"n": 1}}
+    assert ws_b.sent[2]["seq"] == 2
+
+    b.disconnect(ws_b)
+    await wait_until(lambda: not a.is_active("x"))
+
+
+async def test_concurrent_publishes_agree_on_seq(workers):
+    a, b = workers
+    ws_a, ws_b = FakeWebSocket(), FakeWebSocket()
+    await a.connect(ws_a)
+    await b.connect(ws_b)
+    a.subscribe(ws_a, ["x"])
+    b.subscribe(ws_b, ["x"])
+    await wait_until(lambda: a.is_active("x") and b.is_active("x"))
+
+    async def publish(manager, name):
+        for n in range(10):
+            await manager.publish("x", {"from": name, "n": n})
+
+    await asyncio.gather(publish(a, "a"), publish(b, "b"))
+    # Every publish took a seq from the backplane, so the last one is 20
+    await wait_until(lambda: a._channels["x"].seq == b._channels["x"].seq == 20)
+    assert a._channels["x"].data == b._channels["x"].data
+
+    for ws in (ws_a, ws_b):
+        seqs = [frame["seq"] for frame in ws.sent]
+        assert seqs == sorted(set(seqs))
+        assert seqs[-1] == 20
+
+
+async def test_broadcast_all_and_signals(workers):
+    a, b = workers
+    ws_b = FakeWebSocket()
+    await b.connect(ws_b)
+    signalled = []
+    b.backplane.on_signal("layout", lambda: signalled.append(True))
+
+    await a.broadcast_all({"action": "reload"})
+    await a.backplane.signal("layout")
+    await wait_until(lambda: ws_b.sent and signalled)
+
+    assert ws_b.sent == [{"action": "reload"}]
+
+
+async def test_shared_state_round_trips_and_expires(workers):
+    a, b = workers
+    await a.backplane.set_state("unifi:cookies", {"TOKEN": "abc"})
+    await a.backplane.set_state("gone", 1, ttl=-1)
+
+    assert await b.backplane.get_state("unifi:cookies") == {"TOKEN": "abc"}
+    assert await b.backplane.get_state("gone") is None
+    await b.backplane.delete_state("unifi:cookies")
+    assert await a.backplane.get_state("unifi:cookies") is None
+
+
+async def test_local_backplane_keeps_everything_in_process():
+    manager = ConnectionManager(LocalBackplane())
+    ws = FakeWebSocket()
+    await manager.connect(ws)
+    manager.subscribe(ws, ["x"])
+
+    await manager.publish("x", {"n": 1})
+    await asyncio.sleep(0)
+
+    assert ws.sent == [{"channel": "x", "seq": 1, "data": {"n": 1}}]
+    assert manager.backplane.remote_channels() == set()
+    assert await manager.backplane.get_state("anything") is None
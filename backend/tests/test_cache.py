@@ -0,0 +1,102 @@
+"""
+Tests for cache.py: single-flight coalescing, TTL, stale-while-revalidate,
+stale-on-error and LRU eviction.
+"""
+import asyncio
+
+import pytest
+
+from dasher.cache import ResponseCache
+
+
+class Upstream:
+    """Counts calls; each call returns the next integer after an optional delay."""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.calls = 0
+        self.delay = delay
+        self.fail = False
+
+    async def __call__(self) -> int:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return self.calls
+
+
+async def test_concurrent_requests_share_one_fetch():
+    cache = ResponseCache("test.coalesce", ttl=10)
+    upstream = Upstream(delay=0.05)
+
+    results = await asyncio.gather(*[cache.get("k", upstream) for _ in range(10)])
+
+    assert results == [1] * 10
+    assert upstream.calls == 1
+    assert cache.coalesced == 9
+
+
+async def test_fresh_entry_is_reused():
+    cache = ResponseCache("test.fresh", ttl=10)
+    upstream = Upstream()
+
+    assert await cache.get("k", upstream) == 1
+    assert await cache.get("k", upstream) == 1
+    assert upstream.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+async def test_expired_entry_is_refetched():
+    cache = ResponseCache("test.expired", ttl=0)
+    upstream = Upstream()
+
+    await cache.get("k", upstream)
+    assert await cache.get("k", upstream) == 2
+
+
+async def test_stale_while_revalidate():
+    cache = ResponseCache("test.swr", ttl=0, stale_ttl=10)
+    upstream = Upstream()
+
+    await cache.get("k", upstream)
+    # Stale value comes back immediately; the refresh happens in the background
+    assert await cache.get("k", upstream) == 1
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert upstream.calls == 2
+    assert cache.stale_hits == 1
+
+
+async def test_stale_served_on_error():
+    cache = ResponseCache("test.stale_error", ttl=0, stale_if_error=60)
+    upstream = Upstream()
+
+    await cache.get("k", upstream)
+    upstream.fail = True
+    assert await cache.get("k", upstream) == 1
+    assert cache.errors == 1
+
+
+async def test_error_without_entry_propagates():
+    cache = ResponseCache("test.error", ttl=10)
+    upstream = Upstream()
+    upstream.fail = True
+
+    with pytest.raises(RuntimeError):
+        await cache.get("k", upstream)
+
+
+async def test_lru_eviction():
+    cache = ResponseCache("test.lru", ttl=10, max_entries=2)
+    upstream = Upstream()
+
+    await cache.get("a", upstream)
+    await cache.get("b", upstream)
+    await cache.get("a", upstream)  # touch "a" so "b" is least recently used
+    await cache.get("c", upstream)
+
+    assert cache.stats()["entries"] == 2
+    await cache.get("a", upstream)
+    assert upstream.calls == 3  # "a" still cached
+    await cache.get("b", upstream)
+    assert upstream.calls == 4  # "b" was evicted
@@ -0,0 +1,194 @@
+"""
+Tests for the crawler engine (services/crawler_service.py) and the /crawler router.
+Pages and Ollama are served by httpx MockTransports.
+"""
+import json
+import logging
+import time
+
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from dasher import http
+from dasher.config import settings
+from dasher.services import crawler_service
+
+PAGE = """<html><head><style>.x{}</style></head><body>
+  <nav>Menu</nav>
+  <div id="price">  Price:
+     <b>10 EUR</b> </div>
+  <script>var t = {ts};</script>
+</body></html>"""
+
+
+@pytest.fixture
+def site(monkeypatch):
+    """A page whose #price region and script timestamp can be changed by the test."""
+    state = {"price": "10 EUR", "ts": 0, "requests": []}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        state["requests"].append(request)
+        if request.headers.get("if-none-match") == f'"{state["price"]}"':
+            return httpx.Response(304)
+        state["ts"] += 1
+        body = PAGE.replace("10 EUR", state["price"]).replace("{ts}", str(state["ts"]))
+        return httpx.Response(200, text=body, headers={"ETag": f'"{state["price"]}"'})
+
+    monkeypatch.setattr(settings, "crawler_host_delay", 0.0)
+    monkeypatch.setitem(http._clients, "crawler", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return state
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    prompts: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        prompts.append(json.loads(request.content)["prompt"])
+        return httpx.Response(200, json={"response": "Price went up"})
+
+    monkeypatch.setitem(http._clients, "ollama", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return prompts
+
+
+async def _add_rule(client: AsyncClient, **extra) -> str:
+    body = {"url": "http://shop.test/item", "selector": "#price", "llm_prompt": "Summarize", **extra}
+    r = await client.post("/crawler/rules", json=body)
+    assert r.status_code == 201
+    return r.json()["id"]
+
+
+# ── Extraction ─────────────────────────────────────────────────────────────────
+
+def test_extract_normalizes_selected_text():
+    assert crawler_service.extract(PAGE.encode(), "#price") == "Price: 10 EUR"
+
+
+def test_extract_ignores_scripts_and_styles():
+    text = crawler_service.extract(PAGE.replace("{ts}", "1").encode(), None)
+    assert "var t" not in text and ".x" not in text
+    assert text == crawler_service.extract(PAGE.replace("{ts}", "2").encode(), None)
+
+
+def test_extract_rejects_selector_without_match():
+    with pytest.raises(ValueError):
+        crawler_service.extract(PAGE.encode(), "#missing")
+
+
+async def test_invalid_selector_is_rejected_at_create(client: AsyncClient):
+    r = await client.post("/crawler/rules", json={"url": "http://shop.test/item", "selector": "p[class="})
+    assert r.status_code == 422
+    assert "invalid selector" in r.text
+    assert (await client.get("/crawler/rules")).json()["rules"] == []
+
+
+# ── Checking ───────────────────────────────────────────────────────────────────
+
+async def test_first_check_records_baseline_without_alert(client: AsyncClient, site, ollama):
+    await _add_rule(client)
+    assert await crawler_service.check_due_rules() == 0
+
+    rule = (await client.get("/crawler/rules")).json()["rules"][0]
+    assert rule["last_checked_at"] is not None and rule["last_error"] is None
+    assert (await client.get("/crawler/alerts")).json()["alerts"] == []
+    assert ollama == []
+
+
+async def test_llm_runs_only_when_content_changes(client: AsyncClient, site, ollama):
+    rule_id = await _add_rule(client)
+    (rule,) = await crawler_service.due_rules()
+    await crawler_service.check_rule(rule)
+
+    # Unchanged region (only the script differs) with a stale validator: no alert
+    (rule,) = await crawler_service.due_rules(now=float("inf"))
+    rule["etag"] = None
+    assert await crawler_service.check_rule(rule) is False
+    assert ollama == []
+
+    site["price"] = "12 EUR"
+    (rule,) = await crawler_service.due_rules(now=float("inf"))
+    assert await crawler_service.check_rule(rule) is True
+    assert len(ollama) == 1 and "Price: 12 EUR" in ollama[0]
+
+    (alert,) = (await client.get("/crawler/alerts")).json()["alerts"]
+    assert alert["rule_id"] == rule_id
+    assert alert["content_snapshot"] == "Price: 12 EUR"
+    assert alert["llm_analysis"] == "Price went up"
+
+
+async def test_bad_llm_response_still_stores_alert(client: AsyncClient, site, monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=b"<html>not ndjson</html>\n")
+
+    monkeypatch.setitem(http._clients, "ollama", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    await _add_rule(client)
+    await crawler_service.check_due_rules()
+
+    site["price"] = "12 EUR"
+    (rule,) = await crawler_service.due_rules(now=float("inf"))
+    assert await crawler_service.check_rule(rule) is True
+    (alert,) = (await client.get("/crawler/alerts")).json()["alerts"]
+    assert alert["llm_analysis"] is None
+    # The new content is the baseline now, so the page isn't re-analysed next time
+    (rule,) = await crawler_service.due_rules(now=float("inf"))
+    rule["etag"] = None
+    assert await crawler_service.check_rule(rule) is False
+
+
+async def test_conditional_get_uses_stored_etag(client: AsyncClient, site, ollama, caplog):
+    await _add_rule(client)
+    await crawler_service.check_due_rules()
+    (rule,) = await crawler_service.due_rules(now=float("inf"))
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="dasher.services.crawler_service"):
+        assert await crawler_service.check_rule(rule) is False
+    assert site["requests"][-1].headers["if-none-match"] == '"10 EUR"'
+    # The 304 counts as a successful check
+    assert not [r for r in caplog.records if r.levelno >= logging.WARNING]
+    rule = (await client.get("/crawler/rules")).json()["rules"][0]
+    assert rule["last_error"] is None
+
+
+async def test_rules_not_due_are_skipped(client: AsyncClient, site, ollama):
+    await _add_rule(client)
+    await crawler_service.check_due_rules()
+    await crawler_service.check_due_rules()
+    assert len(site["requests"]) == 1
+
+
+async def test_fetch_error_is_recorded(client: AsyncClient, monkeypatch):
+    monkeypatch.setitem(
+        http._clients, "crawler",
+        httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(500))),
+    )
+    await _add_rule(client)
+    await crawler_service.check_due_rules()
+    rule = (await client.get("/crawler/rules")).json()["rules"][0]
+    assert "500" in rule["last_error"]
+
+
+async def test_same_host_requests_are_spaced(client: AsyncClient, site, ollama, monkeypatch):
+    monkeypatch.setattr(settings, "crawler_host_delay", 0.05)
+    crawler_service._host_next_at.clear()
+    for path in ("a", "b", "c"):
+        await _add_rule(client, url=f"http://shop.test/{path}")
+    start = time.monotonic()
+    await crawler_service.check_due_rules()
+    assert time.monotonic() - start >= 0.1
+
+
+# ── Alerts ─────────────────────────────────────────────────────────────────────
+
+async def test_dismiss_alert(client: AsyncClient, site, ollama):
+    await _add_rule(client)
+    await crawler_service.check_due_rules()
+    site["price"] = "12 EUR"
+    (rule,) = await crawler_service.due_rules(now=float("inf"))
+    await crawler_service.check_rule(rule)
+
+    (alert,) = (await client.get("/crawler/alerts")).json()["alerts"]
+    r = await client.post(f"/crawler/alerts/{alert['id']}/dismiss")
+    assert r.status_code == 200
+    assert (await client.get("/crawler/alerts")).json()["alerts"] == []
+    assert (await client.post("/crawler/alerts/nope/dismiss")).status_code == 404
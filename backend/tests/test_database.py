@@ -6,8 +6,9 @@ import os
 import aiosqlite
 import pytest
 
+from dasher import database
 from dasher.config import settings
-from dasher.database import init_db
+from dasher.database import SCHEMA_VERSION, close_db, db_connect, init_db
 
 
 async def _table_names(db_path: str) -> set[str]:
@@ -62,3 +63,101 @@ async def test_init_db_idempotent(tmp_path, monkeypatch):
 
     count = await _count(str(db_file), "widget_instances")
     assert count == 11
+
+
+# ── Schema versions ────────────────────────────────────────────────────────────
+
+async def _versions(db_path: str) -> list[int]:
+    async with aiosqlite.connect(db_path) as db:
+        async with db.execute("SELECT version FROM schema_version ORDER BY version") as cur:
+            return [r[0] for r in await cur.fetchall()]
+
+
+async def test_migrations_are_recorded_and_run_once(tmp_path, monkeypatch):
+    db_file = tmp_path / "test.db"
+    monkeypatch.setattr(settings, "database_url", f"sqlite+aiosqlite:///{db_file}")
+    await init_db()
+    assert await _versions(str(db_file)) == list(range(1, SCHEMA_VERSION + 1))
+
+    # A current database is not reseeded: a deleted default widget stays deleted
+    async with aiosqlite.connect(str(db_file)) as db:
+        await db.execute("DELETE FROM widget_instances WHERE widget_type='clock'")
+        await db.commit()
+    await init_db()
+    assert await _count(str(db_file), "widget_instances") == 10
+
+
+async def test_unversioned_database_is_upgraded(tmp_path, monkeypatch):
+    """A database from before schema versioning gains the later columns and keeps its rows."""
+    db_file = tmp_path / "test.db"
+    monkeypatch.setattr(settings, "database_url", f"sqlite+aiosqlite:///{db_file}")
+    async with aiosqlite.connect(str(db_file)) as db:
+        await db.execute(
+            "CREATE TABLE widget_instances (id TEXT PRIMARY KEY, widget_type TEXT NOT NULL,"
+            " config JSON NOT NULL DEFAULT '{}', grid_x INT DEFAULT 0, grid_y INT DEFAULT 0,"
+            " grid_w INT DEFAULT 2, grid_h INT DEFAULT 2, created_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        )
+        await db.execute("CREATE TABLE rss_feeds (id TEXT PRIMARY KEY, url TEXT NOT NULL, label TEXT,"
+                         " refresh_interval_minutes INT DEFAULT 15)")
+        await db.execute("INSERT INTO widget_instances (id, widget_type) VALUES ('mine', 'clock')")
+        await db.commit()
+
+    await init_db()
+
+    async with aiosqlite.connect(str(db_file)) as db:
+        async with db.execute("SELECT name, background_color FROM widget_instances WHERE id='mine'") as cur:
+            assert tuple(await cur.fetchone()) == ("", None)
+        async with db.execute("PRAGMA table_info(rss_feeds)") as cur:
+            assert "backoff_count" in {r[1] for r in await cur.fetchall()}
+    assert await _count(str(db_file), "widget_instances") == 12
+    assert await _versions(str(db_file)) == list(range(1, SCHEMA_VERSION + 1))
+
+
+async def test_failed_migration_is_rolled_back_and_retried(tmp_path, monkeypatch):
+    db_file = tmp_path / "test.db"
+    monkeypatch.setattr(settings, "database_url", f"sqlite+aiosqlite:///{db_file}")
+
+    async def broken(db: aiosqlite.Connection) -> None:
+        await db.execute("CREATE TABLE half_done (id INT)")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(database, "MIGRATIONS", [*database.MIGRATIONS, (99, "broken", broken)])
+    monkeypatch.setattr(database, "SCHEMA_VERSION", 99)
+    with pytest.raises(RuntimeError):
+        await init_db()
+    assert await _versions(str(db_file)) == list(range(1, SCHEMA_VERSION + 1))
+    assert "half_done" not in await _table_names(str(db_file))
+
+
+# ── Connection pool ────────────────────────────────────────────────────────────
+
+async def test_pool_connections_are_preconfigured(tmp_path, monkeypatch):
+    db_file = tmp_path / "test.db"
+    monkeypatch.setattr(settings, "database_url", f"sqlite+aiosqlite:///{db_file}")
+    await init_db()
+
+    try:
+        async with db_connect(readonly=True) as db:
+            async with db.execute("PRAGMA journal_mode") as cur:
+                assert (await cur.fetchone())[0] == "wal"
+            async with db.execute("PRAGMA foreign_keys") as cur:
+                assert (await cur.fetchone())[0] == 1
+            with pytest.raises(aiosqlite.OperationalError):
+                await db.execute("DELETE FROM widget_instances")
+    finally:
+        await close_db()
+
+
+async def test_pool_writer_rolls_back_uncommitted_work(tmp_path, monkeypatch):
+    db_file = tmp_path / "test.db"
+    monkeypatch.setattr(settings, "database_url", f"sqlite+aiosqlite:///{db_file}")
+    await init_db()
+
+    try:
+        with pytest.raises(RuntimeError):
+            async with db_connect() as db:
+                await db.execute("DELETE FROM widget_instances")
+                raise RuntimeError("boom")
+        assert await _count(str(db_file), "widget_instances") == 11
+    finally:
+        await close_db()
@@ -0,0 +1,52 @@
+"""
+Tests for delta.py: keyed list diffs round-trip through apply().
+"""
+from dasher.delta import apply, diff
+
+
+def _slot(nzo_id: str, pct: str = "0") -> dict:
+    return {"id": nzo_id, "filename": f"{nzo_id}.nzb", "percentage": pct}
+
+
+def test_scalar_fields_set_and_unset():
+    old = {"speed": "1 MB/s", "error": "x"}
+    new = {"speed": "2 MB/s"}
+    d = diff(old, new)
+    assert d == {"set": {"speed": "2 MB/s"}, "unset": ["error"]}
+    assert apply(old, d) == new
+
+
+def test_keyed_list_upsert_and_remove():
+    old = {"slots": [_slot("a"), _slot("b"), _slot("c")]}
+    new = {"slots": [_slot("a", "50"), _slot("c"), _slot("d")]}
+    d = diff(old, new)
+    assert d == {"lists": {"slots": {
+        "key": "id",
+        "upsert": [_slot("a", "50"), _slot("d")],
+        "remove": ["b"],
+    }}}
+    assert apply(old, d) == new
+
+
+def test_keyed_list_reorder():
+    old = {"slots": [_slot("a"), _slot("b")]}
+    new = {"slots": [_slot("b"), _slot("a")]}
+    d = diff(old, new)
+    assert d == {"lists": {"slots": {"key": "id", "order": ["b", "a"]}}}
+    assert apply(old, d) == new
+
+
+def test_unkeyed_list_is_sent_whole():
+    old = {"values": [1, 2, 3]}
+    new = {"values": [1, 2, 4]}
+    assert diff(old, new) == {"set": {"values": [1, 2, 4]}}
+
+
+def test_list_with_unhashable_keys_is_sent_whole():
+    old = {"items": [{"id": [1], "v": 1}]}
+    new = {"items": [{"id": [1], "v": 2}]}
+    assert diff(old, new) == {"set": {"items": [{"id": [1], "v": 2}]}}
+
+
+def test_non_dict_payload_needs_snapshot():
+    assert diff([1], [2]) is None
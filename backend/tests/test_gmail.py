@@ -0,0 +1,236 @@
+"""
+Tests for Gmail incremental sync (services/gmail_service.py) and the /gmail
+router, against a MockTransport stub of the Gmail REST endpoints.
+"""
+import json
+import re
+
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from dasher import http
+from dasher.cache import ResponseCache
+from dasher.config import settings
+from dasher.services import gmail_service
+
+
+class FakeGmail:
+    """In-memory mailbox with a history log, served like the Gmail v1 API."""
+
+    def __init__(self) -> None:
+        self.messages: dict[str, dict] = {}
+        self.history: list[dict] = []
+        self.history_id = 100
+        self.expired = False
+        self.calls: list[str] = []
+        self.batched: list[int] = []  # parts per batch request
+        self.page_size = 500
+        self.chunked = False
+        for n in range(1, 4):
+            self.add(f"m{n}", unread=(n == 3), record=False)
+
+    def _record(self, **change) -> None:
+        self.history_id += 1
+        self.history.append({"id": str(self.history_id), **change})
+
+    def add(self, msg_id: str, unread: bool = True, record: bool = True) -> None:
+        labels = ["INBOX"] + (["UNREAD"] if unread else [])
+        self.messages[msg_id] = {"id": msg_id, "labelIds": labels, "internalDate": str(len(self.messages) + 1)}
+        if record:
+            self._record(messagesAdded=[{"message": {"id": msg_id, "labelIds": labels}}])
+
+    def mark_read(self, msg_id: str) -> None:
+        self.messages[msg_id]["labelIds"].remove("UNREAD")
+        self._record(labelsRemoved=[{"message": self.messages[msg_id], "labelIds": ["UNREAD"]}])
+
+    def archive(self, msg_id: str) -> None:
+        self.messages[msg_id]["labelIds"].remove("INBOX")
+        self._record(labelsRemoved=[{"message": self.messages[msg_id], "labelIds": ["INBOX"]}])
+
+    def _inbox(self) -> list[dict]:
+        inbox = [m for m in self.messages.values() if "INBOX" in m["labelIds"]]
+        return sorted(inbox, key=lambda m: int(m["internalDate"]), reverse=True)
+
+    def _metadata(self, msg_id: str) -> tuple[int, dict]:
+        msg = self.messages.get(msg_id)
+        if msg is None:
+            return 404, {"error": {"code": 404}}
+        headers = [{"name": "Subject", "value": f"Subject {msg_id}"}, {"name": "From", "value": "a@b"}]
+        return 200, {**msg, "payload": {"headers": headers}}
+
+    def _batch(self, request: httpx.Request) -> httpx.Response:
+        boundary = re.search(r"boundary=(\S+)", request.headers["content-type"]).group(1)
+        parts = request.content.decode().split(f"--{boundary}")[1:-1]
+        assert len(parts) <= 100
+        self.batched.append(len(parts))
+        out = []
+        for part in parts:
+            content_id = re.search(r"Content-ID: <(.+)>", part).group(1)
+            msg_id = re.search(r"GET /gmail/v1/users/me/messages/([^?]+)\?format=metadata", part).group(1)
+            status, body = self._metadata(msg_id)
+            out.append(
+                f"--resp\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\n\r\n{json.dumps(body)}\r\n"
+            )
+        content = ("".join(out) + "--resp--\r\n").encode()
+        # Split into small chunks so parts straddle chunk boundaries
+        stream = httpx.ByteStream(content) if not self.chunked else _Chunks(content)
+        return httpx.Response(200, headers={"Content-Type": "multipart/mixed; boundary=resp"}, stream=stream)
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        self.calls.append(path.rsplit("/", 1)[-1] if "/messages/" in path else path)
+        if path == "/batch/gmail/v1":
+            return self._batch(request)
+        if request.url.host == "oauth2.googleapis.com":
+            return httpx.Response(200, json={"access_token": "tok", "expires_in": 3600})
+        assert request.headers["authorization"] == "Bearer tok"
+        if path.endswith("/profile"):
+            return httpx.Response(200, json={"historyId": str(self.history_id)})
+        if path.endswith("/labels/INBOX"):
+            unread = sum("UNREAD" in m["labelIds"] for m in self._inbox())
+            return httpx.Response(200, json={"messagesUnread": unread})
+        if path.endswith("/history"):
+            if self.expired:
+                return httpx.Response(404, json={"error": {"code": 404}})
+            start = int(request.url.params["startHistoryId"])
+            records = [h for h in self.history if int(h["id"]) > start]
+            body = {"historyId": str(self.history_id)}
+            if records:
+                body["history"] = records
+            return httpx.Response(200, json=body)
+        if path.endswith("/messages"):
+            start = int(request.url.params.get("pageToken", 0))
+            limit = min(int(request.url.params["maxResults"]), self.page_size)
+            inbox = self._inbox()
+            body = {"messages": [{"id": m["id"]} for m in inbox[start:start + limit]]}
+            if start + limit < len(inbox):
+                body["nextPageToken"] = str(start + limit)
+            return httpx.Response(200, json=body)
+        status, body = self._metadata(path.rsplit("/", 1)[-1])
+        return httpx.Response(status, json=body)
+
+
+class _Chunks(httpx.AsyncByteStream):
+    def __init__(self, content: bytes, size: int = 7) -> None:
+        self._content = content
+        self._size = size
+
+    async def __aiter__(self):
+        for i in range(0, len(self._content), self._size):
+            yield self._content[i:i + self._size]
+
+
+@pytest.fixture
+def gmail(monkeypatch):
+    fake = FakeGmail()
+    monkeypatch.setattr(settings, "google_client_id", "id")
+    monkeypatch.setattr(settings, "google_refresh_token", "refresh")
+    monkeypatch.setattr(gmail_service, "_access_token", None)
+    monkeypatch.setattr(settings, "gmail_inbox_limit", 3)
+    monkeypatch.setattr(gmail_service, "_sync", gmail_service.InboxSync(window=3))
+    # ttl=0: every read refreshes, so each test controls when syncs happen
+    monkeypatch.setattr(gmail_service, "_sync_cache", ResponseCache("gmail.sync.test", ttl=0))
+    monkeypatch.setitem(http._clients, "google", httpx.AsyncClient(transport=httpx.MockTransport(fake.handler)))
+    return fake
+
+
+async def test_first_refresh_is_a_full_sync(client: AsyncClient, gmail):
+    r = await client.get("/gmail/inbox")
+    assert r.status_code == 200
+    assert [m["id"] for m in r.json()["messages"]] == ["m3", "m2", "m1"]
+    assert r.json()["messages"][0] == {
+        "id": "m3", "subject": "Subject m3", "from": "a@b", "date": "", "unread": True,
+    }
+    assert gmail_service._sync.full_syncs == 1
+
+
+async def test_quiet_inbox_costs_one_history_call(client: AsyncClient, gmail):
+    await gmail_service.get_inbox_messages()
+    gmail.calls.clear()
+
+    assert (await client.get("/gmail/unread")).json() == {"unread": 1}
+    assert gmail.calls == ["/gmail/v1/users/me/history"]
+
+
+async def test_new_message_fetches_only_its_metadata(client: AsyncClient, gmail):
+    await gmail_service.get_inbox_messages()
+    gmail.calls.clear()
+    gmail.add("m4")
+
+    messages = await gmail_service.get_inbox_messages()
+    assert [m["id"] for m in messages] == ["m4", "m3", "m2"]  # window of 3
+    assert sorted(gmail.calls) == sorted([
+        "/gmail/v1/users/me/history", "/batch/gmail/v1", "/gmail/v1/users/me/labels/INBOX",
+    ])
+    assert gmail.batched == [3, 1]
+    assert await gmail_service.get_unread_count() == 2
+
+
+async def test_mark_read_updates_cache_without_metadata_fetch(client: AsyncClient, gmail):
+    await gmail_service.get_inbox_messages()
+    gmail.calls.clear()
+    gmail.mark_read("m3")
+
+    messages = await gmail_service.get_inbox_messages()
+    assert messages[0]["unread"] is False
+    assert "/batch/gmail/v1" not in gmail.calls
+    assert await gmail_service.get_unread_count() == 0
+
+
+async def test_archive_refills_window(client: AsyncClient, gmail):
+    gmail.add("m0", unread=False, record=False)  # older than the window
+    gmail.messages["m0"]["internalDate"] = "0"
+    await gmail_service.get_inbox_messages()
+    gmail.archive("m2")
+
+    messages = await gmail_service.get_inbox_messages()
+    assert [m["id"] for m in messages] == ["m3", "m1", "m0"]
+
+
+async def test_expired_history_falls_back_to_full_sync(client: AsyncClient, gmail):
+    await gmail_service.get_inbox_messages()
+    gmail.expired = True
+    gmail.add("m4")
+
+    assert [m["id"] for m in await gmail_service.get_inbox_messages()][0] == "m4"
+    assert gmail_service._sync.full_syncs == 2
+
+
+async def test_streamed_batch_parts_are_parsed(client: AsyncClient, gmail):
+    gmail.chunked = True
+    gmail.add("gone", record=False)
+    del gmail.messages["gone"]  # listed, then 404 inside the batch
+    messages = await gmail_service.get_inbox_messages()
+    assert [m["subject"] for m in messages] == ["Subject m3", "Subject m2", "Subject m1"]
+
+
+async def test_batches_hold_at_most_100_messages(client: AsyncClient, gmail):
+    for n in range(4, 151):
+        gmail.add(f"m{n}", record=False)
+    gmail.page_size = 60  # list pagination is followed too
+
+    r = await client.get("/gmail/inbox", params={"limit": 100, "offset": 20})
+    body = r.json()
+    assert (body["limit"], body["offset"]) == (100, 20)
+    assert [m["id"] for m in body["messages"]][:2] == ["m130", "m129"]
+    assert len(body["messages"]) == 100
+    assert max(gmail.batched) <= 100
+
+
+async def test_page_inside_window_is_served_from_cache(client: AsyncClient, gmail):
+    await gmail_service.get_inbox_messages()
+    gmail.calls.clear()
+    r = await client.get("/gmail/inbox", params={"limit": 2, "offset": 1})
+    assert [m["id"] for m in r.json()["messages"]] == ["m2", "m1"]
+    assert gmail.calls == ["/gmail/v1/users/me/history"]
+
+
+async def test_inbox_limit_is_bounded(client: AsyncClient, gmail):
+    assert (await client.get("/gmail/inbox", params={"limit": 101})).status_code == 422
+
+
+async def test_unconfigured_inbox(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(settings, "google_client_id", "")
+    assert (await client.get("/gmail/inbox")).json() == {"configured": False, "messages": []}
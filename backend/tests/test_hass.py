@@ -0,0 +1,162 @@
+"""
+Tests for the Home Assistant state cache (run against a local fake HA
+websocket server) and the /hass router.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from websockets.asyncio.server import serve
+
+from dasher import http
+from dasher.config import settings
+from dasher.services import hass_service
+from dasher.ws_manager import manager
+from tests.conftest import wait_until
+
+TOKEN = "test-token"
+INITIAL = [
+    {"entity_id": "sensor.power", "state": "123.4", "attributes": {"unit_of_measurement": "W"}},
+    {"entity_id": "light.hall", "state": "off", "attributes": {}},
+]
+
+
+class FakeHass:
+    """Minimal HA websocket API: auth, get_states, subscribe_events."""
+
+    def __init__(self) -> None:
+        self.clients: list = []
+        self.subscription_id: int | None = None
+        self.subscribed = asyncio.Event()
+
+    async def handler(self, ws) -> None:
+        await ws.send(json.dumps({"type": "auth_required"}))
+        auth = json.loads(await ws.recv())
+        if auth.get("access_token") != TOKEN:
+            await ws.send(json.dumps({"type": "auth_invalid", "message": "bad token"}))
+            return
+        await ws.send(json.dumps({"type": "auth_ok"}))
+        self.clients.append(ws)
+        async for raw in ws:
+            msg = json.loads(raw)
+            if msg["type"] == "get_states":
+                await ws.send(json.dumps({"id": msg["id"], "type": "result", "success": True, "result": INITIAL}))
+            elif msg["type"] == "subscribe_events":
+                self.subscription_id = msg["id"]
+                await ws.send(json.dumps({"id": msg["id"], "type": "result", "success": True, "result": None}))
+                self.subscribed.set()
+
+    async def push_state(self, entity_id: str, new_state: dict | None) -> None:
+        event = {
+            "id": self.subscription_id,
+            "type": "event",
+            "event": {"event_type": "state_changed",
+                      "data": {"entity_id": entity_id, "old_state": None, "new_state": new_state}},
+        }
+        for ws in self.clients:
+            await ws.send(json.dumps(event))
+
+
+@pytest_asyncio.fixture
+async def fake_hass(monkeypatch):
+    fake = FakeHass()
+    async with serve(fake.handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(settings, "hass_url", f"http://127.0.0.1:{port}")
+        monkeypatch.setattr(settings, "hass_token", TOKEN)
+        cache = hass_service.HassStateCache()
+        monkeypatch.setattr(hass_service, "state_cache", cache)
+        cache.start()
+        try:
+            await wait_until(lambda: cache.synced)
+            yield fake
+        finally:
+            await cache.stop()
+
+
+async def test_get_state_served_from_cache(fake_hass, client: AsyncClient):
+    r = await client.get("/hass/state/sensor.power")
+    assert r.status_code == 200
+    assert r.json() == {"configured": True, "state": "123.4", "attributes": {"unit_of_measurement": "W"}}
+
+
+async def test_state_changed_updates_cache_and_publishes(fake_hass, monkeypatch):
+    sent: list[tuple[str, dict]] = []
+
+    async def fake_publish(channel: str, data: dict) -> None:
+        sent.append((channel, data))
+
+    monkeypatch.setattr(manager, "publish", fake_publish)
+    # Only the leader worker pushes changes
+    monkeypatch.setattr(hass_service.election, "_expires_at", float("inf"))
+    await fake_hass.subscribed.wait()
+    await fake_hass.push_state("light.hall", {"entity_id": "light.hall", "state": "on", "attributes": {}})
+
+    await wait_until(lambda: sent)
+    assert hass_service.state_cache.states["light.hall"]["state"] == "on"
+    assert sent == [("hass:light.hall", {"configured": True, "state": "on", "attributes": {}})]
+
+
+async def test_bad_token_never_syncs(monkeypatch):
+    fake = FakeHass()
+    async with serve(fake.handler, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        monkeypatch.setattr(settings, "hass_url", f"http://127.0.0.1:{port}")
+        monkeypatch.setattr(settings, "hass_token", "wrong")
+        cache = hass_service.HassStateCache()
+        cache.start()
+        await asyncio.sleep(0.1)
+        assert not cache.synced
+        await cache.stop()
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("http://ha.local:8123/", "ws://ha.local:8123/api/websocket"),
+    ("https://ha.example.com", "wss://ha.example.com/api/websocket"),
+])
+def test_ws_url(monkeypatch, url, expected):
+    monkeypatch.setattr(settings, "hass_url", url)
+    assert hass_service._ws_url() == expected
+
+
+# ── Batch endpoint ─────────────────────────────────────────────────────────────
+
+async def test_batch_states_from_cache(fake_hass, client: AsyncClient):
+    r = await client.post("/hass/states", json={"entity_ids": ["sensor.power", "light.nope"]})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["configured"] is True
+    assert body["states"]["sensor.power"]["state"] == "123.4"
+    assert body["states"]["light.nope"] == {
+        "configured": True, "state": None, "attributes": {},
+        "error": "Entity 'light.nope' not found",
+    }
+
+
+async def test_batch_states_uses_one_bulk_fetch(client: AsyncClient, monkeypatch):
+    requests: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        return httpx.Response(200, json=INITIAL)
+
+    monkeypatch.setattr(settings, "hass_url", "http://ha.test")
+    monkeypatch.setattr(settings, "hass_token", TOKEN)
+    monkeypatch.setitem(http._clients, "hass", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    r = await client.post("/hass/states", json={"entity_ids": ["sensor.power", "light.hall"]})
+    assert r.status_code == 200
+    assert r.json()["states"]["light.hall"]["state"] == "off"
+    assert requests == ["/api/states"]
+
+
+async def test_batch_states_not_configured(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(settings, "hass_url", "")
+    r = await client.post("/hass/states", json={"entity_ids": ["sensor.power"]})
+    assert r.json() == {
+        "configured": False,
+        "states": {"sensor.power": {"configured": False, "state": None, "attributes": {}}},
+    }
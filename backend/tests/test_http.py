@@ -0,0 +1,38 @@
+"""
+Tests for http.py: the shared per-upstream client registry.
+"""
+import httpx
+
+from dasher import http
+
+
+async def test_get_client_reuses_instance():
+    try:
+        assert http.get_client("hass") is http.get_client("hass")
+        assert http.get_client("hass") is not http.get_client("sabnzbd")
+    finally:
+        await http.close_clients()
+
+
+async def test_get_client_applies_upstream_settings():
+    try:
+        client = http.get_client("sabnzbd")
+        assert client.timeout == httpx.Timeout(http.UPSTREAMS["sabnzbd"].timeout)
+        assert _log_hooks_installed(client)
+    finally:
+        await http.close_clients()
+
+
+async def test_close_clients_closes_and_recreates():
+    client = http.get_client("unifi")
+    await http.close_clients()
+    assert client.is_closed
+    # A closed registry hands out a fresh client on next use
+    fresh = http.get_client("unifi")
+    assert fresh is not client and not fresh.is_closed
+    await http.close_clients()
+
+
+def _log_hooks_installed(client: httpx.AsyncClient) -> bool:
+    hooks = client.event_hooks
+    return http._log_request in hooks["request"] and http._log_response in hooks["response"]
@@ -0,0 +1,31 @@
+"""
+Tests for integrations.py: unconfigured integration routers are mounted on
+first use instead of at import.
+"""
+import httpx
+from fastapi import FastAPI
+
+from dasher import integrations
+from dasher.config import settings
+
+
+async def test_unconfigured_router_is_mounted_on_first_request(monkeypatch):
+    monkeypatch.setattr(settings, "unifi_url", "")
+    monkeypatch.setattr(settings, "sabnzbd_url", "http://sab.test")
+    monkeypatch.setattr(settings, "sabnzbd_api_key", "key")
+    app = FastAPI()
+    pending = integrations.mount_configured(app)
+    app.add_middleware(integrations.LazyRouters, target=app, pending=pending)
+
+    paths = app.openapi()["paths"]
+    assert "/sabnzbd/queue" in paths
+    assert "/unifi/devices" not in paths
+    assert "/unifi" in {i.prefix for i in pending}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        r = await client.get("/unifi/devices")
+        assert r.status_code == 200
+        assert r.json()["configured"] is False
+        assert (await client.get("/unifiX")).status_code == 404
+
+    assert "/unifi/devices" in app.openapi()["paths"]
@@ -4,6 +4,9 @@ Tests for the layout router: GET/POST/PATCH/DELETE /widgets/instances
 import pytest
 from httpx import AsyncClient
 
+from dasher.database import db_connect
+from dasher.services import layout_service
+
 
 # ── Helpers ────────────────────────────────────────────────────────────────────
 
@@ -174,3 +177,112 @@ async def test_delete_idempotent(client: AsyncClient):
     """Deleting a non-existent widget still returns 204 (no body expected)."""
     r = await client.delete("/widgets/instances/no-such-id")
     assert r.status_code == 204
+
+
+# ── Bulk patch ─────────────────────────────────────────────────────────────────
+
+async def test_bulk_patch(client: AsyncClient):
+    a = await _create(client, name="A", background_color="#111111")
+    b = await _create(client, name="B", background_color="#222222")
+    r = await client.patch("/widgets/instances", json=[
+        {"id": a, "grid_x": 1, "grid_y": 2, "grid_w": 3, "grid_h": 4},
+        {"id": b, "grid_x": 5, "grid_y": 6, "grid_w": 2, "grid_h": 2, "name": "Bee", "background_color": None},
+    ])
+    assert r.status_code == 200
+    assert r.json() == {"ok": True, "results": [{"id": a, "ok": True}, {"id": b, "ok": True}]}
+
+    instances = {w["id"]: w for w in (await client.get("/widgets/instances")).json()["widgets"]}
+    assert (instances[a]["grid_x"], instances[a]["grid_y"], instances[a]["grid_w"], instances[a]["grid_h"]) == (1, 2, 3, 4)
+    assert instances[a]["name"] == "A"                      # name omitted → unchanged
+    assert instances[a]["background_color"] == "#111111"    # color omitted → unchanged
+    assert instances[b]["name"] == "Bee"
+    assert instances[b]["background_color"] is None         # explicit null clears
+
+
+async def test_bulk_patch_is_all_or_nothing(client: AsyncClient):
+    a = await _create(client, grid_x=0)
+    r = await client.patch("/widgets/instances", json=[
+        {"id": a, "grid_x": 7, "grid_y": 0, "grid_w": 2, "grid_h": 2},
+        {"id": "no-such-id", "grid_x": 0, "grid_y": 0, "grid_w": 2, "grid_h": 2},
+    ])
+    assert r.status_code == 404
+    assert r.json()["detail"]["results"] == [{"id": a, "ok": True}, {"id": "no-such-id", "ok": False}]
+
+    instances = {w["id"]: w for w in (await client.get("/widgets/instances")).json()["widgets"]}
+    assert instances[a]["grid_x"] == 0
+
+
+async def test_empty_bulk_patch_changes_nothing(client: AsyncClient):
+    etag = (await client.get("/widgets/instances")).headers["etag"]
+    r = await client.patch("/widgets/instances", json=[])
+    assert r.status_code == 200
+    assert r.json() == {"ok": True, "results": []}
+    assert (await client.get("/widgets/instances")).headers["etag"] == etag
+
+
+async def test_bulk_patch_validates_each_item(client: AsyncClient):
+    a = await _create(client)
+    r = await client.patch("/widgets/instances", json=[
+        {"id": a, "grid_x": 0, "grid_y": 0, "grid_w": 13, "grid_h": 2},
+    ])
+    assert r.status_code == 422
+
+
+# ── Caching / ETag ─────────────────────────────────────────────────────────────
+
+async def test_list_etag_304(client: AsyncClient):
+    r = await client.get("/widgets/instances")
+    etag = r.headers["etag"]
+
+    r = await client.get("/widgets/instances", headers={"If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+
+
+async def test_list_etag_changes_on_write(client: AsyncClient):
+    etag = (await client.get("/widgets/instances")).headers["etag"]
+    widget_id = await _create(client)
+
+    r = await client.get("/widgets/instances", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+    assert any(w["id"] == widget_id for w in r.json()["widgets"])
+
+
+async def test_write_publishes_layout(client: AsyncClient, monkeypatch):
+    published: list[tuple[str, dict]] = []
+
+    async def fake_publish(channel: str, data: dict) -> None:
+        published.append((channel, data))
+
+    monkeypatch.setattr(layout_service.manager, "is_active", lambda channel: True)
+    monkeypatch.setattr(layout_service.manager, "publish", fake_publish)
+
+    widget_id = await _create(client)
+    channel, data = published[-1]
+    assert channel == "layout"
+    assert any(w["id"] == widget_id for w in data["widgets"])
+
+
+# ── Stored config ──────────────────────────────────────────────────────────────
+
+async def test_config_is_served_as_stored(client: AsyncClient):
+    config = {"feeds": ["https://example.com/rss"], "title": "Päivän uutiset", "limit": 5, "nested": {"a": None}}
+    widget_id = await _create(client, config=config)
+
+    r = await client.get("/widgets/instances")
+    widget = next(w for w in r.json()["widgets"] if w["id"] == widget_id)
+    assert widget["config"] == config
+    assert widget["name"] == "" and widget["grid_w"] == 2
+
+
+async def test_invalid_stored_config_is_served_empty(client: AsyncClient):
+    widget_id = await _create(client, config={"a": 1})
+    async with db_connect() as db:
+        await db.execute("UPDATE widget_instances SET config='{not json' WHERE id=?", (widget_id,))
+        await db.commit()
+    layout_service.invalidate()
+
+    r = await client.get("/widgets/instances")
+    widget = next(w for w in r.json()["widgets"] if w["id"] == widget_id)
+    assert widget["config"] == {}
@@ -0,0 +1,63 @@
+"""
+Tests for leader.py: one lease holder at a time, takeover after expiry or
+release, and scheduler jobs that only run on the leader.
+"""
+import asyncio
+
+import pytest
+
+from dasher.config import settings
+from dasher.database import close_db, init_db
+from dasher.leader import LeaderElection
+from dasher.services import scheduler
+
+
+@pytest.fixture
+async def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "database_url", f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    await init_db()
+    yield
+    await close_db()
+
+
+async def test_single_holder_until_released(db):
+    a, b = LeaderElection("test"), LeaderElection("test")
+    await a.start()
+    await b.start()
+    assert a.is_leader and not b.is_leader
+
+    # Renewing keeps the lease with its holder
+    assert await a.renew()
+    assert not await b.renew()
+
+    await a.stop()
+    assert not a.is_leader
+    assert await b.renew() and b.is_leader
+    await b.stop()
+
+
+async def test_expired_lease_is_taken_over(db, monkeypatch):
+    monkeypatch.setattr(settings, "leader_lease_ttl", 0.05)
+    a, b = LeaderElection("test"), LeaderElection("test")
+    elected = []
+    b.on_elected(lambda: elected.append(True))
+    assert await a.renew()
+
+    await asyncio.sleep(0.1)  # a stopped heartbeating, e.g. its process died
+    assert not a.is_leader
+    assert await b.renew()
+    assert elected == [True]
+    assert not await a.renew()
+
+
+async def test_jobs_run_only_on_the_leader(monkeypatch):
+    calls = []
+
+    async def job(value: int) -> None:
+        calls.append(value)
+
+    monkeypatch.setattr(scheduler.election, "_expires_at", 0.0)
+    await scheduler._as_leader(job, 1)
+    monkeypatch.setattr(scheduler.election, "_expires_at", float("inf"))
+    await scheduler._as_leader(job, 2)
+    assert calls == [2]
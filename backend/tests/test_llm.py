@@ -0,0 +1,161 @@
+"""
+Tests for the Ollama client (services/llm_service.py), run against a local
+fake Ollama HTTP server that streams NDJSON like ``/api/generate`` does.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+from dasher import http
+from dasher.config import settings
+from dasher.services import llm_service
+
+
+class FakeOllama:
+    """Bare-bones HTTP/1.1 server: POST /api/generate streams chunked NDJSON."""
+
+    def __init__(self) -> None:
+        self.requests: list[dict] = []
+        self.token_delay = 0.0
+        self.error: str | None = None
+        self.disconnected = asyncio.Event()
+        self.server: asyncio.Server | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                headers = dict(
+                    line.split(": ", 1) for line in head.decode().split("\r\n")[1:] if ": " in line
+                )
+                length = int({k.lower(): v for k, v in headers.items()}.get("content-length", 0))
+                body = json.loads(await reader.readexactly(length))
+                self.requests.append(body)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                    b"Transfer-Encoding: chunked\r\n\r\n"
+                )
+                for chunk in self._chunks(body["prompt"]):
+                    data = (json.dumps(chunk) + "\n").encode()
+                    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    await writer.drain()
+                    if self.token_delay:
+                        await asyncio.sleep(self.token_delay)
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.disconnected.set()
+        finally:
+            writer.close()
+
+    def _chunks(self, prompt: str):
+        if self.error:
+            yield {"error": self.error}
+            return
+        for word in ["echo:", *prompt.split()]:
+            yield {"response": word + " ", "done": False}
+        yield {"response": "", "done": True}
+
+
+@pytest_asyncio.fixture
+async def ollama(monkeypatch):
+    fake = FakeOllama()
+    fake.server = await asyncio.start_server(fake.handle, "127.0.0.1", 0)
+    monkeypatch.setattr(settings, "ollama_url", fake.url)
+    monkeypatch.setattr(llm_service, "_gate", llm_service._PriorityGate())
+    monkeypatch.setattr(llm_service, "_metrics", llm_service._Metrics())
+    http._clients.pop("ollama", None)
+    yield fake
+    await http._clients.pop("ollama").aclose()
+    fake.server.close()
+
+
+async def test_streamed_response_is_assembled(client: AsyncClient, ollama):
+    text = await llm_service.generate("summarize", "a b")
+    assert text == "echo: summarize --- a b "
+    (request,) = ollama.requests
+    assert request["stream"] is True
+    assert request["keep_alive"] == settings.ollama_keep_alive
+    assert request["model"] == settings.ollama_model
+
+
+async def test_results_are_cached_by_prompt_and_content(client: AsyncClient, ollama):
+    first = await llm_service.generate("summarize", "a b")
+    assert await llm_service.generate("summarize", "a b") == first
+    assert len(ollama.requests) == 1
+
+    await llm_service.generate("summarize", "a c")
+    await llm_service.generate("other prompt", "a b")
+    assert len(ollama.requests) == 3
+
+    stats = llm_service.stats()
+    assert stats["requests"] == 4 and stats["cache_hits"] == 1 and stats["generations"] == 3
+
+
+async def test_error_chunk_raises(client: AsyncClient, ollama):
+    ollama.error = "model 'nope' not found"
+    with pytest.raises(llm_service.LLMError, match="not found"):
+        await llm_service.generate("hi", model="nope")
+    assert llm_service.stats()["errors"] == 1
+
+
+async def test_malformed_stream_line_raises(client: AsyncClient, monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, content=b'{"response": "a", "done": false}\n{"respo\n')
+
+    monkeypatch.setattr(llm_service, "_metrics", llm_service._Metrics())
+    monkeypatch.setitem(http._clients, "ollama", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    with pytest.raises(llm_service.LLMError, match="malformed"):
+        await llm_service.generate("hi")
+    assert llm_service.stats()["errors"] == 1
+
+
+async def test_timeout_cancels_generation(client: AsyncClient, ollama):
+    ollama.token_delay = 0.2
+    with pytest.raises(TimeoutError):
+        await llm_service.generate("one two three four", timeout=0.1)
+    await asyncio.wait_for(ollama.disconnected.wait(), 2)
+    stats = llm_service.stats()
+    assert stats["timeouts"] == 1 and stats["active"] == 0
+
+
+async def test_priority_order_under_concurrency_limit(client: AsyncClient, ollama, monkeypatch):
+    monkeypatch.setattr(settings, "ollama_concurrency", 1)
+    ollama.token_delay = 0.02
+
+    first = asyncio.create_task(llm_service.generate("first"))
+    await asyncio.sleep(0.01)  # first holds the only slot
+    background = asyncio.create_task(
+        llm_service.generate("background", priority=llm_service.PRIORITY_BACKGROUND)
+    )
+    await asyncio.sleep(0)
+    interactive = asyncio.create_task(
+        llm_service.generate("interactive", priority=llm_service.PRIORITY_INTERACTIVE)
+    )
+    await asyncio.gather(first, background, interactive)
+
+    assert [r["prompt"] for r in ollama.requests] == ["first", "interactive", "background"]
+    assert llm_service.stats()["queue_wait_seconds_max"] > 0
+
+
+async def test_cancelled_waiter_gives_up_its_place(client: AsyncClient, ollama, monkeypatch):
+    monkeypatch.setattr(settings, "ollama_concurrency", 1)
+    ollama.token_delay = 0.02
+    first = asyncio.create_task(llm_service.generate("first"))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(llm_service.generate("never"))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await first
+    assert await llm_service.generate("after") == "echo: after "
+    assert [r["prompt"] for r in ollama.requests] == ["first", "after"]
+    assert llm_service.stats()["active"] == 0
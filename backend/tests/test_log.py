@@ -0,0 +1,75 @@
+"""
+Tests for the logging pipeline (dasher/log.py).
+"""
+import json
+import logging
+import queue
+
+import httpx
+
+from dasher import http, log
+
+
+def _record(name: str = "dasher.http", level: int = logging.ERROR, msg: str = "← %s", args=(502,)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+
+def test_rate_limit_allows_burst_then_reports_suppressed(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(log.time, "monotonic", lambda: clock[0])
+    limiter = log.RateLimitFilter(per_minute=6, burst=2)
+
+    assert [limiter.filter(_record()) for _ in range(5)] == [True, True, False, False, False]
+    clock[0] += 10  # one token refilled
+    passed = _record()
+    assert limiter.filter(passed)
+    assert passed.suppressed == 3
+
+
+def test_rate_limit_is_per_template_and_skips_other_loggers():
+    limiter = log.RateLimitFilter(per_minute=0.001, burst=1)
+    assert limiter.filter(_record())
+    assert not limiter.filter(_record())
+    assert limiter.filter(_record(msg="other %s"))
+    assert limiter.filter(_record(name="dasher.routers.layout"))
+    assert limiter.filter(_record(level=logging.INFO))
+
+
+def test_formatting_is_deferred_to_the_listener():
+    calls = []
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = log._DeferredQueueHandler(records)
+    logger = logging.getLogger("dasher.test.deferred")
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        logger.setLevel(logging.INFO)
+        logger.debug("%s", log.Lazy(lambda: calls.append("debug")))
+        logger.info("body %s", log.Lazy(lambda: calls.append("info") or "x"))
+        assert calls == []  # nothing formatted on the calling thread
+
+        record = records.get_nowait()
+        assert records.empty()
+        assert json.loads(log.JsonFormatter().format(record))["msg"] == "body x"
+        assert calls == ["info"]
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+
+
+def test_json_formatter_fields():
+    record = _record()
+    record.suppressed = 4
+    entry = json.loads(log.JsonFormatter().format(record))
+    assert entry["level"] == "ERROR" and entry["logger"] == "dasher.http"
+    assert entry["msg"] == "← 502" and entry["suppressed"] == 4
+
+
+def test_log_response_error_defers_body(caplog):
+    response = httpx.Response(500, text="x" * 5000, request=httpx.Request("GET", "http://up.test/"))
+    exc = httpx.HTTPStatusError("boom", request=response.request, response=response)
+    with caplog.at_level(logging.ERROR, logger="dasher.http"):
+        http.log_response_error(exc)
+    (record,) = caplog.records
+    assert isinstance(record.args[2], log.Lazy)
+    assert record.getMessage().endswith("x" * 2000)
@@ -0,0 +1,67 @@
+"""
+Tests for the metrics registry (dasher/metrics.py) and GET /metrics.
+"""
+import httpx
+from httpx import AsyncClient
+
+from dasher import http, metrics
+
+
+def _sample(text: str, line_prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"no sample {line_prefix!r}")
+
+
+def test_histogram_buckets_are_cumulative():
+    h = metrics.Histogram("test_hist_seconds", "test", ("op",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        h.observe(value, "x")
+    text = metrics.render()
+    assert _sample(text, 'test_hist_seconds_bucket{op="x",le="0.1"}') == 1
+    assert _sample(text, 'test_hist_seconds_bucket{op="x",le="1"}') == 3
+    assert _sample(text, 'test_hist_seconds_bucket{op="x",le="+Inf"}') == 4
+    assert _sample(text, 'test_hist_seconds_count{op="x"}') == 4
+    assert _sample(text, 'test_hist_seconds_sum{op="x"}') == 6.05
+    assert "# TYPE test_hist_seconds histogram" in text
+
+
+def test_counter_and_label_escaping():
+    c = metrics.Counter("test_events_total", "test", ("kind",))
+    c.inc('say "hi"')
+    c.inc('say "hi"', amount=2)
+    assert _sample(metrics.render(), 'test_events_total{kind="say \\"hi\\""}') == 3
+
+
+async def test_route_metrics_use_path_templates(client: AsyncClient):
+    route = "/widgets/instances/{widget_id}"
+    before = metrics.http_request_seconds.count("DELETE", route)
+    await client.delete("/widgets/instances/does-not-exist")
+    await client.get("/no/such/path")
+
+    assert metrics.http_request_seconds.count("DELETE", route) == before + 1
+    text = (await client.get("/metrics")).text
+    assert f'dasher_http_requests_total{{method="DELETE",route="{route}",status="' in text
+    assert 'route="<unmatched>",status="404"' in text
+
+
+async def test_db_and_ws_and_cache_metrics_exposed(client: AsyncClient):
+    r = await client.get("/metrics")
+    assert r.headers["content-type"].startswith("text/plain")
+    for name in (
+        "dasher_db_acquire_duration_seconds_count{mode=\"read\"}",
+        "dasher_db_connection_hold_seconds_count{mode=\"write\"}",
+        "dasher_ws_connections ",
+        "# TYPE dasher_cache_hit_ratio gauge",
+    ):
+        assert name in r.text
+
+
+async def test_upstream_hooks_record_latency_and_status():
+    client = http.make_client("testup", transport=httpx.MockTransport(lambda request: httpx.Response(503)))
+    async with client:
+        await client.get("http://up.test/x")
+    assert metrics.upstream_requests.value("testup") == 1
+    assert metrics.upstream_responses.value("testup", "503") == 1
+    assert metrics.upstream_seconds.count("testup") == 1
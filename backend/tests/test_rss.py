@@ -0,0 +1,162 @@
+"""
+Tests for RSS ingestion (services/rss_service.py) and the /rss router.
+Feeds are served by an httpx MockTransport standing in for the feed hosts.
+"""
+import time
+
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from dasher import http
+from dasher.backplane import SQLiteBackplane
+from dasher.services import rss_service
+from dasher.ws_manager import ConnectionManager
+from tests.conftest import wait_until
+
+FEED_XML = b"""<?xml version="1.0"?>
+<rss version="2.0"><channel><title>Test</title>
+  <item><guid>a</guid><title>First</title><link>http://x/a</link>
+        <pubDate>Mon, 01 Jan 2024 10:00:00 GMT</pubDate></item>
+  <item><guid>b</guid><title>Second</title><link>http://x/b</link>
+        <pubDate>Tue, 02 Jan 2024 10:00:00 GMT</pubDate></item>
+</channel></rss>"""
+
+
+@pytest.fixture
+def feed_host(monkeypatch):
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=FEED_XML, headers={"ETag": '"v1"'})
+
+    monkeypatch.setitem(http._clients, "rss", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return requests
+
+
+async def _add_feed(client: AsyncClient) -> str:
+    r = await client.post("/rss/feeds", json={"url": "http://feeds.test/rss", "label": "Test"})
+    assert r.status_code == 201
+    return r.json()["id"]
+
+
+async def test_refresh_ingests_items(client: AsyncClient, feed_host):
+    await _add_feed(client)
+
+    assert await rss_service.refresh_due_feeds() == 2
+
+    r = await client.get("/rss/items")
+    titles = [i["title"] for i in r.json()["items"]]
+    assert titles == ["Second", "First"]  # newest first
+
+
+async def test_refresh_skips_feeds_not_due(client: AsyncClient, feed_host):
+    await _add_feed(client)
+    await rss_service.refresh_due_feeds()
+    await rss_service.refresh_due_feeds()
+    assert len(feed_host) == 1
+
+
+async def test_conditional_get_and_dedup(client: AsyncClient, feed_host):
+    feed_id = await _add_feed(client)
+    (feed,) = await rss_service.get_feeds([feed_id])
+    assert await rss_service.fetch_feed(feed) == 2
+    # Same body again: nothing new is stored
+    assert await rss_service.fetch_feed(feed) == 0
+
+    (stored,) = await rss_service.get_feeds([feed_id])
+    assert stored["etag"] == '"v1"'
+    assert await rss_service.fetch_feed(stored) == 0
+    assert feed_host[-1].headers["if-none-match"] == '"v1"'
+
+    stats = (await client.get("/rss/feeds")).json()["feeds"][0]["stats"]
+    assert (stats["hits"], stats["skips"], stats["backoffs"]) == (1, 2, 0)
+
+
+async def test_items_pagination(client: AsyncClient, feed_host):
+    await _add_feed(client)
+    await rss_service.refresh_due_feeds()
+
+    r = await client.get("/rss/items", params={"limit": 1, "offset": 1})
+    assert [i["title"] for i in r.json()["items"]] == ["First"]
+
+
+async def test_feeds_crud(client: AsyncClient):
+    feed_id = await _add_feed(client)
+    feeds = (await client.get("/rss/feeds")).json()["feeds"]
+    assert [f["id"] for f in feeds] == [feed_id]
+
+    r = await client.delete(f"/rss/feeds/{feed_id}")
+    assert r.status_code == 204
+    assert (await client.get("/rss/feeds")).json()["feeds"] == []
+
+
+# ── Adaptive scheduling ────────────────────────────────────────────────────────
+
+def test_plan_next_grows_on_skip_and_shrinks_on_hit():
+    interval, delay = rss_service.plan_next(600.0, "skip")
+    assert interval == delay == 750.0
+    interval, _ = rss_service.plan_next(600.0, "hit", observed_gap=120.0)
+    assert interval == 330.0  # halfway towards half the observed gap
+
+
+def test_plan_next_backs_off_exponentially_on_errors():
+    delays = [rss_service.plan_next(600.0, "error", n)[1] for n in (1, 2, 3)]
+    assert delays == [1200.0, 2400.0, 4800.0]
+    assert rss_service.plan_next(600.0, "error", 20)[1] == rss_service.MAX_INTERVAL
+
+
+def test_plan_next_honors_server_hint():
+    _, delay = rss_service.plan_next(600.0, "skip", hint=3600.0)
+    assert delay == 3600.0
+
+
+def test_header_hint():
+    assert rss_service._header_hint(httpx.Headers({"Retry-After": "120"}), 0) == 120.0
+    assert rss_service._header_hint(httpx.Headers({"Cache-Control": "public, max-age=900"}), 0) == 900.0
+    assert rss_service._header_hint(httpx.Headers({}), 0) is None
+
+
+async def test_error_backs_off_and_is_counted(client: AsyncClient, monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503, headers={"Retry-After": "7200"})
+
+    monkeypatch.setitem(http._clients, "rss", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    feed_id = await _add_feed(client)
+    await rss_service.refresh_due_feeds()
+
+    feed = (await client.get("/rss/feeds")).json()["feeds"][0]
+    assert feed["last_error"] == "HTTP 503"
+    assert feed["stats"]["backoffs"] == 1
+    assert feed["stats"]["next_fetch_at"] - feed["last_fetched_at"] == pytest.approx(7200.0)
+    # Not due again yet
+    assert await rss_service.queue.pop_due(feed["last_fetched_at"] + 60) == []
+
+
+async def test_feed_changes_on_a_follower_reach_the_leader(client: AsyncClient, monkeypatch, tmp_path):
+    path = str(tmp_path / "backplane.db")
+    leader, follower = SQLiteBackplane(path, poll_interval=0.005), SQLiteBackplane(path, poll_interval=0.005)
+    leader_queue = rss_service.FeedQueue()
+    leader.on_signal(rss_service.FEEDS_SIGNAL, leader_queue.invalidate)
+    # Requests are served by the follower, which has a queue of its own
+    monkeypatch.setattr(rss_service, "manager", ConnectionManager(follower))
+    monkeypatch.setattr(rss_service, "queue", rss_service.FeedQueue())
+    await leader.start()
+    await follower.start()
+    try:
+        assert await leader_queue.pop_due(time.time()) == []
+
+        feed_id = await _add_feed(client)
+        await wait_until(lambda: leader_queue._path is None)
+        assert await leader_queue.pop_due(time.time()) == [feed_id]
+
+        leader_queue.schedule(feed_id, 0.0)
+        assert (await client.delete(f"/rss/feeds/{feed_id}")).status_code == 204
+        await wait_until(lambda: leader_queue._path is None)
+        assert await leader_queue.pop_due(time.time()) == []
+    finally:
+        await leader.stop()
+        await follower.stop()
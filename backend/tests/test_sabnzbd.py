@@ -0,0 +1,125 @@
+"""
+Tests for incremental SABnzbd tracking (services/sabnzbd_service.py) and the
+/sabnzbd router, against a MockTransport stub of the SABnzbd API.
+"""
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from dasher import http
+from dasher.cache import ResponseCache
+from dasher.config import settings
+from dasher.services import sabnzbd_service
+
+
+class FakeSab:
+    def __init__(self) -> None:
+        self.queue = [
+            {"nzo_id": "n1", "filename": "one", "status": "Downloading", "percentage": "10"},
+            {"nzo_id": "n2", "filename": "two", "status": "Queued", "percentage": "0"},
+            {"nzo_id": "n3", "filename": "three", "status": "Queued", "percentage": "0"},
+        ]
+        self.history = [
+            {"nzo_id": f"h{n}", "name": f"done {n}", "status": "Completed", "completed": 1000 + n}
+            for n in range(30)
+        ][::-1]
+        self.requests: list[dict] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        params = dict(request.url.params)
+        assert params["apikey"] == "key"
+        self.requests.append(params)
+        start, limit = int(params.get("start", 0)), int(params.get("limit", 0))
+        if params["mode"] == "history":
+            return httpx.Response(200, json={"history": {"slots": self.history[start:start + limit]}})
+        slots = self.queue
+        if "nzo_ids" in params:
+            ids = params["nzo_ids"].split(",")
+            slots = [s for s in slots if s["nzo_id"] in ids]
+        elif limit:
+            slots = slots[start:start + limit]
+        return httpx.Response(200, json={"queue": {
+            "slots": slots, "noofslots_total": len(self.queue), "kbpersec": "2048.0",
+            "speed": "2.0 M", "timeleft": "0:05:00", "sizeleft": "1 GB", "paused": False,
+        }})
+
+    def modes(self) -> list[str]:
+        return [
+            "history" if r["mode"] == "history"
+            else "nzo_ids" if "nzo_ids" in r
+            else f"queue limit={r.get('limit')}"
+            for r in self.requests
+        ]
+
+
+@pytest.fixture
+def sab(monkeypatch):
+    fake = FakeSab()
+    monkeypatch.setattr(settings, "sabnzbd_url", "http://sab.test")
+    monkeypatch.setattr(settings, "sabnzbd_api_key", "key")
+    monkeypatch.setattr(sabnzbd_service, "tracker", sabnzbd_service.QueueTracker(series_size=3))
+    monkeypatch.setattr(sabnzbd_service, "_poll_cache", ResponseCache("sabnzbd.test", ttl=0))
+    monkeypatch.setitem(http._clients, "sabnzbd", httpx.AsyncClient(transport=httpx.MockTransport(fake.handler)))
+    return fake
+
+
+async def test_first_poll_fetches_everything(client: AsyncClient, sab):
+    body = (await client.get("/sabnzbd/queue")).json()
+    assert [s["id"] for s in body["slots"]] == ["n1", "n2", "n3"]
+    assert body["noofslots"] == 3 and body["speed"] == "2.0 M"
+    assert sab.modes() == ["queue limit=1", "queue limit=0", "history", "history"]
+
+
+async def test_steady_poll_only_asks_for_active_slots(client: AsyncClient, sab):
+    await sabnzbd_service.tracker.poll()
+    sab.requests.clear()
+    sab.queue[0]["percentage"] = "55"
+
+    body = await sabnzbd_service.get_queue()
+    assert body["slots"][0]["percentage"] == "55"
+    assert sab.modes() == ["nzo_ids"]
+    assert sab.requests[0]["nzo_ids"] == "n1"
+
+
+async def test_slot_set_change_triggers_full_fetch_and_history(client: AsyncClient, sab):
+    await sabnzbd_service.tracker.poll()
+    sab.requests.clear()
+    finished = sab.queue.pop(0)
+    sab.queue[0]["status"] = "Downloading"
+    sab.history.insert(0, {"nzo_id": finished["nzo_id"], "name": "one", "status": "Completed", "completed": 2000})
+
+    await sabnzbd_service.tracker.poll()
+    assert sab.modes() == ["nzo_ids", "queue limit=0", "history"]
+    history = (await client.get("/sabnzbd/history", params={"limit": 2})).json()
+    assert [i["id"] for i in history["items"]] == ["n1", "h29"]
+    assert history["total"] == 31
+
+
+async def test_history_pagination(client: AsyncClient, sab):
+    body = (await client.get("/sabnzbd/history", params={"limit": 5, "offset": 25})).json()
+    assert [i["id"] for i in body["items"]] == ["h4", "h3", "h2", "h1", "h0"]
+    assert (body["limit"], body["offset"], body["total"]) == (5, 25, 30)
+
+
+async def test_queue_pagination(client: AsyncClient, sab):
+    body = (await client.get("/sabnzbd/queue", params={"limit": 1, "offset": 2})).json()
+    assert [s["id"] for s in body["slots"]] == ["n3"]
+
+
+async def test_series_is_a_ring_buffer(client: AsyncClient, sab):
+    for _ in range(5):
+        await sabnzbd_service.tracker.poll()
+    samples = (await client.get("/sabnzbd/series")).json()["samples"]
+    assert len(samples) == 3
+    assert samples[-1]["kbpersec"] == 2048.0 and samples[-1]["timeleft_seconds"] == 300
+
+
+def test_timeleft_parsing():
+    assert sabnzbd_service._seconds("1:02:03") == 3723
+    assert sabnzbd_service._seconds("1:00:00:00") == 86400
+    assert sabnzbd_service._seconds("") == 0
+
+
+async def test_unconfigured(client: AsyncClient, monkeypatch):
+    monkeypatch.setattr(settings, "sabnzbd_url", "")
+    assert (await client.get("/sabnzbd/history")).json() == {"configured": False, "items": []}
@@ -0,0 +1,93 @@
+"""
+Tests for services/scheduler.py: pollers only run for subscribed channels
+and only publish changes; first subscribers trigger an immediate fetch.
+"""
+import asyncio
+
+import pytest
+
+from dasher.services import scheduler
+from dasher.ws_manager import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(text)
+
+
+@pytest.fixture
+def fake_poller(monkeypatch):
+    manager = ConnectionManager()
+    monkeypatch.setattr(scheduler, "manager", manager)
+
+    state = {"calls": 0, "value": 1}
+
+    async def fetch(channels: list[str]) -> dict[str, dict]:
+        state["calls"] += 1
+        return {c: {"value": state["value"]} for c in channels}
+
+    poller = scheduler.Poller("test:", 1.0, fetch, lambda: True)
+    monkeypatch.setattr(scheduler, "POLLERS", [poller])
+    return manager, poller, state
+
+
+async def test_poller_skips_without_subscribers(fake_poller):
+    manager, poller, state = fake_poller
+    await scheduler.run_poller(poller)
+    assert state["calls"] == 0
+
+
+async def test_poller_broadcasts_only_changes(fake_poller):
+    manager, poller, state = fake_poller
+    ws = FakeWebSocket()
+    await manager.connect(ws)
+    manager.subscribe(ws, ["test:a"])
+
+    await scheduler.run_poller(poller)
+    await scheduler.run_poller(poller)
+    await asyncio.sleep(0)
+    assert len(ws.sent) == 1
+
+    state["value"] = 2
+    await scheduler.run_poller(poller)
+    await asyncio.sleep(0)
+    assert len(ws.sent) == 2
+    assert state["calls"] == 3
+
+
+async def test_publish_now_fetches_matching_channels(fake_poller):
+    manager, poller, state = fake_poller
+    ws = FakeWebSocket()
+    await manager.connect(ws)
+    manager.subscribe(ws, ["test:a", "other"])
+
+    await scheduler.publish_now(["test:a", "other"])
+    await asyncio.sleep(0)
+
+    assert ws.sent == ['{"channel":"test:a","seq":1,"data":{"value":1}}']
+
+
+async def test_publish_now_on_a_follower_only_answers_the_subscriber(fake_poller, monkeypatch):
+    manager, poller, state = fake_poller
+    monkeypatch.setattr(manager.backplane, "shared", True)
+    monkeypatch.setattr(scheduler.election, "_expires_at", 0.0)
+    ws, other = FakeWebSocket(), FakeWebSocket()
+    for socket in (ws, other):
+        await manager.connect(socket)
+        manager.subscribe(socket, ["test:a"])
+
+    await scheduler.publish_now(["test:a"], ws)
+    await asyncio.sleep(0)
+
+    # Not a publish: no seq is taken and the channel has no state of its own
+    assert ws.sent == ['{"channel":"test:a","seq":0,"data":{"value":1}}']
+    assert other.sent == []
+    assert not await manager.send_snapshot(ws, "test:a")
+    await scheduler.publish_now(["test:a"])
+    assert state["calls"] == 1
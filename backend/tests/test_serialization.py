@@ -0,0 +1,28 @@
+"""
+Tests for serialization.py: the JSON layer shared by responses and websocket frames.
+"""
+import json
+
+from dasher import serialization
+
+
+def test_dumps_is_compact_utf8():
+    encoded = serialization.dumps({"a": [1, 2], "b": "ä", 3: None})
+    assert isinstance(encoded, bytes)
+    assert encoded == '{"a":[1,2],"b":"ä","3":null}'.encode()
+    assert serialization.loads(encoded) == {"a": [1, 2], "b": "ä", "3": None}
+
+
+def test_splice_appends_raw_value():
+    assert serialization.splice(b'{"id":"x"}', "config", b'{"k":[1]}') == b'{"id":"x","config":{"k":[1]}}'
+    assert serialization.splice(b"{}", "config", b"null") == b'{"config":null}'
+    assert json.loads(serialization.splice(serialization.dumps({"n": 1}), 'q"', b"2")) == {"n": 1, 'q"': 2}
+
+
+def test_decode_error_is_stdlib_compatible():
+    try:
+        serialization.loads("{nope")
+    except serialization.JSONDecodeError:
+        pass
+    else:
+        raise AssertionError("expected JSONDecodeError")
@@ -0,0 +1,119 @@
+"""
+Tests for the UniFi client table (services/unifi_service.py) and the /unifi
+router, against a MockTransport stub of the controller.
+"""
+import httpx
+import pytest
+from httpx import AsyncClient
+
+from dasher import backplane, http
+from dasher.backplane import SQLiteBackplane
+from dasher.cache import ResponseCache
+from dasher.config import settings
+from dasher.services import unifi_service
+
+CLIENTS = {
+    "default": [
+        {"mac": "aa:01", "hostname": "Laptop", "ip": "10.0.0.2", "is_wired": False, "tx_bytes": 1},
+        {"mac": "aa:02", "name": "lamp", "ip": "10.0.0.3", "is_wired": False},
+        {"mac": "aa:03", "hostname": "NAS", "ip": "10.0.0.4", "is_wired": True},
+        {"mac": "aa:04", "hostname": "Lab switch", "ip": "10.0.0.5", "is_wired": True},
+    ],
+    "guest": [{"mac": "bb:01", "hostname": "Phone", "ip": "10.1.0.2"}],
+}
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    calls: list[str] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path == "/api/auth/login":
+            return httpx.Response(200, headers={"Set-Cookie": "TOKEN=t; Path=/"})
+        site = request.url.path.split("/")[5]
+        if site == "broken":
+            return httpx.Response(200, content=b"<html>maintenance</html>")
+        if site not in CLIENTS:
+            return httpx.Response(400, json={"meta": {"rc": "error", "msg": "api.err.NoSiteContext"}})
+        return httpx.Response(200, json={"data": CLIENTS[site]})
+
+    monkeypatch.setattr(settings, "unifi_url", "https://unifi.test")
+    monkeypatch.setattr(settings, "unifi_user", "u")
+    monkeypatch.setattr(settings, "unifi_pass", "p")
+    monkeypatch.setattr(unifi_service, "_cookies", {})
+    monkeypatch.setattr(unifi_service, "_site_reads", {})
+    monkeypatch.setattr(unifi_service, "_tables", ResponseCache("unifi.test", ttl=60))
+    monkeypatch.setitem(
+        http._clients, "unifi",
+        httpx.AsyncClient(base_url="https://unifi.test", transport=httpx.MockTransport(handler)),
+    )
+    return calls
+
+
+def _names(body: dict) -> list[str]:
+    return [d["name"] for d in body["devices"]]
+
+
+async def test_devices_sorted_and_compact(client: AsyncClient, controller):
+    body = (await client.get("/unifi/devices")).json()
+    assert _names(body) == ["Lab switch", "lamp", "Laptop", "NAS"]
+    assert body["total"] == 4 and body["site"] == "default"
+    assert body["devices"][2] == {"mac": "aa:01", "name": "Laptop", "ip": "10.0.0.2", "is_wired": False, "online": True}
+
+
+async def test_prefix_search_and_wired_filter(client: AsyncClient, controller):
+    assert _names((await client.get("/unifi/devices", params={"q": "la"})).json()) == ["Lab switch", "lamp", "Laptop"]
+    assert _names((await client.get("/unifi/devices", params={"q": "LAP"})).json()) == ["Laptop"]
+    body = (await client.get("/unifi/devices", params={"q": "la", "wired": "true"})).json()
+    assert _names(body) == ["Lab switch"] and body["total"] == 1
+    assert _names((await client.get("/unifi/devices", params={"wired": "false"})).json()) == ["lamp", "Laptop"]
+
+
+async def test_pagination(client: AsyncClient, controller):
+    body = (await client.get("/unifi/devices", params={"limit": 2, "offset": 1})).json()
+    assert _names(body) == ["lamp", "Laptop"]
+    assert (body["total"], body["limit"], body["offset"]) == (4, 2, 1)
+
+
+async def test_reads_are_served_from_the_table(client: AsyncClient, controller):
+    for q in ("la", "n", None):
+        await client.get("/unifi/devices", params={"q": q} if q else {})
+    assert controller.count("/proxy/network/api/s/default/stat/sta") == 1
+    assert controller.count("/api/auth/login") == 1
+
+
+async def test_site_parameter(client: AsyncClient, controller):
+    body = (await client.get("/unifi/devices", params={"site": "guest"})).json()
+    assert _names(body) == ["Phone"] and body["site"] == "guest"
+    assert (await client.get("/unifi/devices", params={"site": "../x"})).status_code == 422
+    assert (await client.get("/unifi/devices", params={"site": "nope"})).status_code == 502
+
+
+async def test_background_refresh_covers_recent_sites(client: AsyncClient, controller):
+    await client.get("/unifi/devices", params={"site": "guest"})
+    controller.clear()
+    await unifi_service.refresh()
+    assert sorted(controller) == [
+        "/proxy/network/api/s/default/stat/sta", "/proxy/network/api/s/guest/stat/sta",
+    ]
+
+
+async def test_refresh_survives_a_garbled_site(client: AsyncClient, controller):
+    unifi_service._site_reads["broken"] = float("inf")
+    await unifi_service.refresh()
+    # "broken" sorts first; "default" is refreshed anyway
+    assert controller[-1] == "/proxy/network/api/s/default/stat/sta"
+    assert "default" in unifi_service._tables._entries
+
+
+async def test_session_shared_through_backplane(client: AsyncClient, controller, monkeypatch, tmp_path):
+    shared = SQLiteBackplane(str(tmp_path / "backplane.db"))
+    monkeypatch.setattr(backplane, "_backplane", shared)
+    # Another worker already logged in
+    await shared.set_state("unifi:cookies", {"TOKEN": "t"})
+    try:
+        assert (await client.get("/unifi/devices")).status_code == 200
+        assert controller.count("/api/auth/login") == 0
+    finally:
+        await shared.stop()
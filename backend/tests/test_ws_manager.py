@@ -0,0 +1,204 @@
+"""
+Tests for ws_manager.py: queued fan-out, slow-client coalescing and
+disconnection.
+"""
+import asyncio
+import json
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+from dasher.config import settings
+from dasher.routers import websocket
+from dasher.ws_manager import ConnectionManager
+
+
+class FakeWebSocket:
+    def __init__(self, blocked: bool = False) -> None:
+        self.sent: list[dict] = []
+        self.closed = False
+        self.unblock = asyncio.Event()
+        if not blocked:
+            self.unblock.set()
+
+    async def accept(self) -> None:
+        pass
+
+    async def send_text(self, text: str) -> None:
+        await self.unblock.wait()
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data: bytes) -> None:
+        await self.unblock.wait()
+        self.sent.append(("binary", json.loads(data)))
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed = True
+
+
+async def _settle() -> None:
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    monkeypatch.setattr(settings, "ws_send_queue_size", 4)
+    monkeypatch.setattr(settings, "ws_max_dropped", 8)
+    return ConnectionManager()
+
+
+async def test_broadcast_reaches_subscribers_only(manager):
+    a, b = FakeWebSocket(), FakeWebSocket()
+    await manager.connect(a)
+    await manager.connect(b)
+    manager.subscribe(a, ["x"])
+
+    await manager.broadcast("x", {"n": 1})
+    await _settle()
+
+    assert a.sent == [{"n": 1}]
+    assert b.sent == []
+
+
+async def test_slow_client_does_not_block_others(manager):
+    slow, fast = FakeWebSocket(blocked=True), FakeWebSocket()
+    for ws in (slow, fast):
+        await manager.connect(ws)
+        manager.subscribe(ws, ["x"])
+
+    await manager.broadcast("x", {"n": 1})
+    await _settle()
+
+    assert fast.sent == [{"n": 1}]
+    assert slow.sent == []
+
+
+async def test_full_queue_coalesces_same_channel(manager):
+    slow = FakeWebSocket(blocked=True)
+    await manager.connect(slow)
+    manager.subscribe(slow, ["x", "y"])
+
+    await manager.broadcast("y", {"y": 1})
+    for n in range(6):
+        await manager.broadcast("x", {"x": n})
+    slow.unblock.set()
+    await _settle()
+
+    # The first frame was already handed to the (blocked) writer; of the
+    # rest, older "x" frames were superseded but "y" survived.
+    assert {"y": 1} in slow.sent
+    assert slow.sent[-1] == {"x": 5}
+    assert len(slow.sent) <= 1 + settings.ws_send_queue_size
+
+
+async def test_hopelessly_slow_client_is_disconnected(manager):
+    slow = FakeWebSocket(blocked=True)
+    await manager.connect(slow)
+    manager.subscribe(slow, ["x"])
+
+    for n in range(settings.ws_send_queue_size + settings.ws_max_dropped + 2):
+        await manager.broadcast("x", {"x": n})
+    await _settle()
+
+    assert slow.closed
+    assert manager.subscriber_count("x") == 0
+    assert not manager._closing
+
+
+async def test_binary_frames(manager, monkeypatch):
+    monkeypatch.setattr(settings, "ws_binary_frames", True)
+    ws = FakeWebSocket()
+    await manager.connect(ws)
+    manager.subscribe(ws, ["x"])
+
+    await manager.broadcast("x", {"n": "ä"})
+    await _settle()
+
+    assert ws.sent == [("binary", {"n": "ä"})]
+
+
+# ── Channel publish / deltas ───────────────────────────────────────────────────
+
+async def test_publish_sends_snapshot_then_delta(manager):
+    ws = FakeWebSocket()
+    await manager.connect(ws)
+    manager.subscribe(ws, ["unifi:devices"])
+    devices = [{"mac": f"aa:{i:02d}", "name": f"host-{i}", "ip": f"10.0.0.{i}"} for i in range(10)]
+
+    await manager.publish("unifi:devices", {"devices": devices})
+    devices = [*devices]  # publish() keeps a reference, so publish a new list
+    devices[3] = {**devices[3], "ip": "10.0.0.99"}
+    await manager.publish("unifi:devices", {"devices": devices})
+    await manager.publish("unifi:devices", {"devices": devices})  # unchanged → not sent
+    await _settle()
+
+    assert [m["seq"] for m in ws.sent] == [1, 2]
+    assert "data" in ws.sent[0]
+    assert ws.sent[1]["delta"] == {
+        "lists": {"devices": {"key": "mac", "upsert": [devices[3]]}},
+    }
+
+
+async def test_publish_forces_periodic_snapshot(manager, monkeypatch):
+    monkeypatch.setattr(settings, "ws_snapshot_every", 2)
+    ws = FakeWebSocket()
+    await manager.connect(ws)
+    manager.subscribe(ws, ["c"])
+
+    for n in range(5):
+        await manager.publish("c", {"items": [{"id": i, "n": n if i == 0 else 0} for i in range(20)]})
+        await _settle()
+
+    kinds = ["data" if "data" in m else "delta" for m in ws.sent]
+    assert kinds == ["data", "delta", "delta", "data", "delta"]
+
+
+async def test_send_snapshot_for_resync(manager):
+    a, b = FakeWebSocket(), FakeWebSocket()
+    for ws in (a, b):
+        await manager.connect(ws)
+        manager.subscribe(ws, ["c"])
+    await manager.publish("c", {"v": 1})
+    await manager.publish("c", {"v": 2})
+
+    assert await manager.send_snapshot(b, "c")
+    assert not await manager.send_snapshot(b, "unknown")
+    await _settle()
+
+    assert b.sent[-1] == {"channel": "c", "seq": 2, "data": {"v": 2}}
+
+
+class ScriptedClient(FakeWebSocket):
+    """Receives *messages* in order, then fails with *error*."""
+
+    def __init__(self, messages: list[str], error: Exception) -> None:
+        super().__init__()
+        self.messages = list(messages)
+        self.error = error
+
+    async def receive_text(self) -> str:
+        await _settle()  # lets the writer task flush what was queued so far
+        if not self.messages:
+            raise self.error
+        return self.messages.pop(0)
+
+
+async def test_endpoint_skips_messages_that_are_not_objects(manager, monkeypatch):
+    monkeypatch.setattr(websocket, "manager", manager)
+    subscribe = json.dumps({"action": "subscribe", "channels": ["c"]})
+    ws = ScriptedClient(["[1]", '"subscribe"', "nope", subscribe], WebSocketDisconnect())
+    await websocket.websocket_endpoint(ws)
+
+    assert ws.sent == [{"action": "subscribed", "channels": ["c"]}]
+    assert manager.stats()["connections"] == 0
+
+
+async def test_endpoint_error_still_disconnects(manager, monkeypatch):
+    monkeypatch.setattr(websocket, "manager", manager)
+    # Starlette raises RuntimeError when the socket goes away mid-receive
+    ws = ScriptedClient([json.dumps({"action": "subscribe", "channels": ["c"]})], RuntimeError("not connected"))
+    with pytest.raises(RuntimeError):
+        await websocket.websocket_endpoint(ws)
+
+    assert manager.stats()["connections"] == 0
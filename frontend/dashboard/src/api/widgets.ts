@@ -23,18 +23,17 @@ export async function patchWidgetColor(id: string, color: string | null): Promis
 }
 
 export async function saveLayout(layout: Layout[]): Promise<void> {
-  const results = await Promise.allSettled(
-    layout.map((item) =>
-      fetch(`${BASE}/widgets/instances/${item.i}`, {
-        method: 'PATCH',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ grid_x: item.x, grid_y: item.y, grid_w: item.w, grid_h: item.h }),
-      })
-    )
-  )
-  results.forEach((result, idx) => {
-    if (result.status === 'rejected') {
-      console.error(`Failed to save layout for widget ${layout[idx].i}:`, result.reason)
-    }
-  })
+  // One bulk PATCH, applied server-side in a single transaction
+  try {
+    const res = await fetch(`${BASE}/widgets/instances`, {
+      method: 'PATCH',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(
+        layout.map((item) => ({ id: item.i, grid_x: item.x, grid_y: item.y, grid_w: item.w, grid_h: item.h }))
+      ),
+    })
+    if (!res.ok) console.error(`Failed to save layout: HTTP ${res.status}`)
+  } catch (err) {
+    console.error('Failed to save layout:', err)
+  }
 }